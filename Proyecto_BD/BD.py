@@ -5,23 +5,37 @@ Admin Password for deletion operations: admin123
 
 import sqlite3
 from sqlite3 import Error
-from flask import g
+from pool import get_db, close_db, DB_PATH
+from storage import configure_connection, queued, writer_for
+from metrics import connection_factory
+import querylog
+from migrations import migrate
+from stats import zone_object_count
+from history_store import list_history
+import bulk_ops
+import records
+from records import Zone, Category, Status, Object, ZoneItem
 from datetime import datetime
 
+querylog.install()
+
 
 ## CONEXION A LA BASE DE DATOS
 def create_connection():
     """
     Creates a connection to the SQLite database.
     If the database doesn't exist, it will be created.
+    Opens INVENTORY_DB (pool.DB_PATH), the same file as the web API.
+    Writers given this connection are queued on the shared writer
+    thread (storage.queued) instead of committing here.
     
     Returns:
         sqlite3.Connection: Database connection object if successful
         None: If connection fails
     """
     try:
-        conn = sqlite3.connect('inventory.db')
-        return conn
+        conn = sqlite3.connect(DB_PATH, factory=connection_factory())
+        return configure_connection(conn)
     except Error as e:
         print(f"Error connecting to database: {e}")
         return None
@@ -103,10 +117,14 @@ def create_table(conn):
         
         conn.commit()
         
+        # Bring older databases up to the common schema and indexes
+        migrate(conn)
+        
     except Error as e:
         print(f"Error creating tables: {e}")
 
 ## INSERTAR UN OBJETO
+@queued
 def add_object(conn, data):
     """Add a new object to the database"""
     try:
@@ -149,6 +167,7 @@ def add_object(conn, data):
         conn.rollback()
         raise Exception(f"Database error: {str(e)}")
 ## ELIMINAR UN OBJETO
+@queued
 def delete_object(conn, object_id, deletion_user):
     """
     Soft delete an object by setting its deletion date
@@ -187,38 +206,114 @@ def delete_object(conn, object_id, deletion_user):
         return True
         
     except Error as e:
+        conn.rollback()
         print(f"Error deleting object: {e}")
         return False
 
 ## ACTUALIZAR UN OBJETO
-def update_object(conn, object_id, updates, modification_user):
-    """Update object and record history"""
+# Campos que se pueden modificar (tambien evita meter SQL en el SET)
+UPDATABLE_FIELDS = ('name', 'description', 'zone_id', 'category_id',
+                    'price', 'quantity', 'status', 'status_id')
+NUMERIC_FIELDS = ('zone_id', 'category_id', 'price', 'quantity', 'status_id')
+
+
+class InvalidUpdate(ValueError):
+    """Unknown fields or values the objects table does not accept"""
+
+
+class ObjectNotFound(ValueError):
+    """No object with that id"""
+
+
+class ObjectDeleted(ValueError):
+    """The object was soft deleted before the update reached it"""
+
+
+def _check_update(updates):
+    unknown = [field for field in updates if field not in UPDATABLE_FIELDS]
+    if unknown:
+        raise InvalidUpdate(f"Cannot update field(s): {', '.join(unknown)}")
+    for field, value in updates.items():
+        if field in NUMERIC_FIELDS and value is not None and (
+                isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise InvalidUpdate(f"{field} must be a number")
+    if 'name' in updates and not (isinstance(updates['name'], str) and updates['name'].strip()):
+        raise InvalidUpdate("name cannot be empty")
+
+
+def apply_object_update(conn, object_id, updates, modification_user, comment=None):
+    """
+    Update an object with one read and one UPDATE, and write the
+    field-level diff to history with a single executemany.
+    Does not commit. Raises InvalidUpdate for unknown fields or bad values,
+    ObjectNotFound / ObjectDeleted when there is no active object to update.
+
+    Returns:
+        list: (field, old_value, new_value) for every field that changed
+    """
+    _check_update(updates)
+    if not updates:
+        return []
+
+    fields = list(updates)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT zone_id, {', '.join(fields)}
+        FROM objects
+        WHERE id = ? AND deletion_date IS NULL
+    """, (object_id,))
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute("SELECT 1 FROM objects WHERE id = ?", (object_id,))
+        if cursor.fetchone() is None:
+            raise ObjectNotFound(f"Object {object_id} not found")
+        raise ObjectDeleted(f"Object {object_id} has been deleted")
+
+    zone_id = row[0]
+    changes = [
+        (field, old, updates[field])
+        for field, old in zip(fields, row[1:])
+        if old != updates[field] and str(old) != str(updates[field])
+    ]
+    if not changes:
+        return []
+
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    set_clause = ", ".join(f"{field} = ?" for field, _, _ in changes)
     try:
-        cursor = conn.cursor()
-        
-        # Get current object data for history
-        cursor.execute("SELECT zone_id FROM objects WHERE id = ?", (object_id,))
-        zone_id = cursor.fetchone()[0]
-        
-        # Record each field update separately in history
-        for field, new_value in updates.items():
-            cursor.execute(f"SELECT {field} FROM objects WHERE id = ?", (object_id,))
-            old_value = cursor.fetchone()[0]
-            
-            add_history(
-                conn, zone_id, object_id, 'UPDATE', 
-                field, str(old_value), str(new_value), 
-                modification_user
-            )
-        
-        # Perform the update
-        set_clause = ", ".join([f"{k} = ?" for k in updates.keys()])
-        sql = f"UPDATE objects SET {set_clause} WHERE id = ?"
-        cursor.execute(sql, (*updates.values(), object_id))
+        cursor.execute(f"""
+            UPDATE objects
+            SET {set_clause}, modification_date = ?, modification_user = ?
+            WHERE id = ?
+        """, (*(new for _, _, new in changes), current_time, modification_user, object_id))
+    except sqlite3.IntegrityError as e:
+        # Zona, categoria o estado que no existen (claves foraneas)
+        raise InvalidUpdate(f"Invalid value: {e}")
+
+    cursor.executemany("""
+        INSERT INTO history (
+            object_id, zone_id, action_type, field_modified, old_value,
+            new_value, modification_date, modification_user, comment
+        ) VALUES (?, ?, 'UPDATE', ?, ?, ?, ?, ?, ?)
+    """, [
+        (object_id, zone_id, field,
+         None if old is None else str(old),
+         None if new is None else str(new),
+         current_time, modification_user, comment)
+        for field, old, new in changes
+    ])
+    return changes
+
+
+@queued
+def update_object(conn, object_id, updates, modification_user, comment=None):
+    """Update object and record history in one transaction"""
+    try:
+        apply_object_update(conn, object_id, updates, modification_user, comment)
         conn.commit()
-        
         return True
-    except Error as e:
+    except (Error, ValueError) as e:
+        conn.rollback()
         print(f"Error updating object: {e}")
         return False
 
@@ -231,6 +326,7 @@ def list_zones(conn):
     return rows #return the zones
 
 ## INSERTAR UN USUARIO
+@queued
 def insert_user(conn, user):
     """Insert a new user into the users table"""
     sql = '''INSERT INTO users(name, email)
@@ -243,6 +339,7 @@ def insert_user(conn, user):
         print("Successfully inserted user")
         return cursor.lastrowid
     except Error as e:
+        conn.rollback()
         print(f"Error inserting user: {e}")
         return None
 
@@ -271,20 +368,18 @@ def get_all_objects(conn):
         conn: Database connection object
     
     Returns:
-        list: List of tuples containing object details
+        list: Object records
         Empty list: If no objects found or error occurs
     """
     try:
-        cursor = conn.cursor()
         # Select only non-deleted objects and join with status
-        cursor.execute("""
-            SELECT o.id, o.name, o.description, o.price, o.quantity, o.category_id, o.zone_id, o.status_id, s.name  as status
+        objects = records.fetch_all(conn, Object, f"""
+            SELECT {records.select_list(Object, 'o', status='s.name', zone_name='NULL')}
             FROM objects o
             JOIN statuses s ON o.status_id = s.id
             WHERE o.deletion_date IS NULL
             ORDER BY o.id
         """)
-        objects = cursor.fetchall()
         if not objects:
             print("No objects found")
         return objects
@@ -295,26 +390,20 @@ def get_all_objects(conn):
 ## OBTENER UNA ZONA POR SU ID
 def get_zone_by_id(conn, id ):
     """Get a zone by id"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM zones WHERE id = ?", (id,))
-    rows = cursor.fetchall()
-    return rows #return the zone
+    return records.fetch_all(conn, Zone, f"SELECT {records.select_list(Zone)} FROM zones WHERE id = ?",
+                             (id,))
     
 ## OBTENER TODAS LAS CATEGORIAS
 def get_all_categories(conn):
     """Get all categories"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM categories")
-    rows = cursor.fetchall()
-    return rows #return the categories
+    return records.fetch_all(conn, Category,
+                             f"SELECT {records.select_list(Category)} FROM categories")
 
 ## OBTENER TODOS LOS ESTADOS
 def get_all_statuses(conn):
     """Get all statuses"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM statuses")
-    rows = cursor.fetchall()
-    return rows #return the statuses    
+    return records.fetch_all(conn, Status,
+                             f"SELECT {records.select_list(Status)} FROM statuses")
 
 ## OBTENER TODAS LAS ZONAS
 def get_all_zones(conn):
@@ -324,21 +413,20 @@ def get_all_zones(conn):
         conn: Database connection object
         
     Returns:
-        list: List of tuples containing zone details
+        list: Zone records
     """
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, name 
+        return records.fetch_all(conn, Zone, f"""
+            SELECT {records.select_list(Zone)}
             FROM zones 
             ORDER BY id
         """)
-        return cursor.fetchall()
     except Error as e:
         print(f"Error getting zones: {e}")
         return []
 
 ## AGREGAR UNA ZONA
+@queued
 def add_zone(conn, name):
     """Add a new zone to the database"""
     try:
@@ -376,6 +464,7 @@ def get_zone_input():
         return None
 
 ## ELIMINAR UNA ZONA
+@queued
 def remove_zone(conn, zone_id):
     """Delete a zone and record in history"""
     try:
@@ -388,28 +477,10 @@ def remove_zone(conn, zone_id):
             print("Zone not found")
             return False
             
-        # Temporarily disable foreign key constraints
-        cursor.execute("PRAGMA foreign_keys = OFF")
-        
-        # Check if zone exists
-        cursor.execute("SELECT id FROM zones WHERE id = ?", (zone_id,))
-        if not cursor.fetchone():
-            print("Zone not found")
-            cursor.execute("PRAGMA foreign_keys = ON")  # Re-enable constraints
-            return False
-        
-        # Check for active objects in the zone
-        cursor.execute("""
-            SELECT COUNT(*) 
-            FROM objects 
-            WHERE zone_id = ? 
-            AND deletion_date IS NULL
-        """, (zone_id,))
-        
-        count = cursor.fetchone()[0]
+        # Check for active objects in the zone (maintained total, no scan)
+        count = zone_object_count(conn, zone_id)
         if count > 0:
             print(f"Cannot delete zone: {count} objects are still assigned to this zone")
-            cursor.execute("PRAGMA foreign_keys = ON")  # Re-enable constraints
             return False
         
         # Update any objects that reference this zone to use zone_id = 1
@@ -419,22 +490,23 @@ def remove_zone(conn, zone_id):
             WHERE zone_id = ?
         """, (zone_id,))
         
+        # Las claves foraneas estan activas (y no se pueden desactivar dentro
+        # de la transaccion del writer): la historia antigua deja de apuntar
+        # a la zona; el id y el nombre quedan en el comentario de ZONE_DELETED
+        cursor.execute("UPDATE history SET zone_id = NULL WHERE zone_id = ?", (zone_id,))
+        cursor.execute("UPDATE action_history SET zone_id = NULL WHERE zone_id = ?", (zone_id,))
+        
         # Now delete the zone
         cursor.execute("DELETE FROM zones WHERE id = ?", (zone_id,))
         
-        # Re-enable foreign key constraints
-        cursor.execute("PRAGMA foreign_keys = ON")
-        
-        # Record zone deletion in history
+        # Record zone deletion in history (raises on error: nothing is deleted)
         add_history(
             conn,
-            zone_id=zone_id,
+            zone_id=None,  # The zone no longer exists
             object_id=None,  # No specific object
             action_type='ZONE_DELETED',
-            field_modified='zone',
-            old_value=zone_name[0],
-            new_value=None,
-            modification_user='admin'  # Or pass the current user
+            modification_user='admin',  # Or pass the current user
+            comment=f"Zone {zone_id} '{zone_name[0]}' deleted"
         )
         
         conn.commit()
@@ -442,11 +514,12 @@ def remove_zone(conn, zone_id):
         return True
         
     except Error as e:
+        conn.rollback()
         print(f"Error deleting zone: {e}")
-        cursor.execute("PRAGMA foreign_keys = ON")  # Make sure to re-enable constraints
         return False
 
 ## AGREGAR UNA CATEGORIA
+@queued
 def add_category(conn, category_data):
     """Add a new category"""
     try:
@@ -468,6 +541,7 @@ def add_category(conn, category_data):
         print("Category added successfully")
         return cursor.lastrowid
     except Error as e:
+        conn.rollback()
         print(f"Error adding category: {e}")
         return None
 
@@ -475,31 +549,25 @@ def add_category(conn, category_data):
 def list_zone_items(conn, zone_id, zone_name):
     """List all items in a specific zone"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT o.id, o.name, o.description, o.price, o.quantity, s.name as status
+        # Solo columnas del indice de zona (mas s.name): no se lee la tabla
+        return records.fetch_all(conn, ZoneItem, f"""
+            SELECT {records.select_list(ZoneItem, 'o', status='s.name')}
             FROM objects o
             JOIN statuses s ON o.status_id = s.id
             WHERE o.zone_id = ? AND o.deletion_date IS NULL
             ORDER BY o.id
         """, (zone_id,))
-        return cursor.fetchall()
     except Error as e:
         print(f"Error retrieving items: {e}")
         return []
 
 ## AGREGAR UNA HISTORIA
-def add_history(conn, zone_id, object_id, action_type, modification_user='admin'):
-    """Add an entry to history with optional comment"""
+@queued
+def add_history(conn, zone_id, object_id, action_type, modification_user='admin', comment=None):
+    """Add an entry to history with an optional comment"""
     try:
         cursor = conn.cursor()
         current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Ask for optional comment
-        want_comment = input("Would you like to add a comment? (y/n): ").lower()
-        comment = None
-        if want_comment == 'y':
-            comment = input("Enter your comment: ")
 
         cursor.execute('''
             INSERT INTO action_history (
@@ -516,156 +584,122 @@ def add_history(conn, zone_id, object_id, action_type, modification_user='admin'
         return True
     except sqlite3.Error as e:
         print(f"Error adding history: {e}")
-        return False
+        # Sin historia no hay cambio: el trabajo se deshace entero
+        raise
 
 ## OBTENER LA HISTORIA DE LOS CAMBIOS
-def get_history(conn):
-    """Get history of changes"""
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM history")
-    return cursor.fetchall()
+def get_history(conn, since=None, until=None, limit=100):
+    """Get the latest history entries (last 30 days by default), newest first"""
+    entries, _ = list_history(conn, since=since, until=until, limit=limit)
+    return entries
 
 def check_admin_password(password):
     """Verify admin password for dangerous operations"""
     ADMIN_PASSWORD = "admin123"  # Default admin password
     return password == ADMIN_PASSWORD
 
-def delete_zone_objects(conn, zone_id, admin_password):
-    """Soft delete all objects in a specific zone with password protection"""
+def _print_progress(op):
+    print(f"  {op['processed']}/{op['total']} objects")
+
+
+def _bulk_delete(conn, scope, scope_id, comment):
+    """Chunked soft delete through bulk_ops; returns the operation or None"""
     try:
-        if not check_admin_password(admin_password):
-            print("Invalid admin password!")
-            return False
-            
-        cursor = conn.cursor()
-        current_time = datetime.now().strftime('%Y-%m-%d')
-        
-        # Get zone name for confirmation
-        cursor.execute("SELECT name FROM zones WHERE id = ?", (zone_id,))
-        zone_name = cursor.fetchone()
-        if not zone_name:
-            print("Zone not found")
-            return False
-            
-        # Soft delete objects
-        cursor.execute("""
-            UPDATE objects 
-            SET deletion_date = ?, 
-                deletion_user = 'admin'
-            WHERE zone_id = ? 
-            AND deletion_date IS NULL
-        """, (current_time, zone_id))
-        
-        affected = cursor.rowcount
-        conn.commit()
-        
-        print(f"All objects ({affected}) in zone '{zone_name[0]}' have been deleted")
-        return True
-    except Error as e:
-        print(f"Error deleting zone objects: {e}")
+        op = bulk_ops.bulk_delete(scope, scope_id, user='admin', comment=comment,
+                                  write=writer_for(conn), progress=_print_progress)
+        print(f"Bulk delete #{op['id']} can be undone with restore_bulk_delete")
+        return op
+    except (Error, ValueError) as e:
+        print(f"Error in bulk delete: {e}")
+        return None
+
+
+def delete_zone_objects(conn, zone_id, admin_password, comment=None):
+    """Soft delete all objects in a specific zone with password protection"""
+    if not check_admin_password(admin_password):
+        print("Invalid admin password!")
+        return False
+
+    # Get zone name for confirmation
+    zone_name = conn.execute("SELECT name FROM zones WHERE id = ?", (zone_id,)).fetchone()
+    if not zone_name:
+        print("Zone not found")
+        return False
+
+    op = _bulk_delete(conn, 'zone', zone_id, comment)
+    if op is None:
         return False
+    print(f"All objects ({op['processed']}) in zone '{zone_name[0]}' have been deleted")
+    return True
 
-def delete_category_objects(conn, category_id, admin_password):
+def delete_category_objects(conn, category_id, admin_password, comment=None):
     """Soft delete all objects in a specific category with password protection"""
-    try:
-        if not check_admin_password(admin_password):
-            print("Invalid admin password!")
-            return False
-            
-        cursor = conn.cursor()
-        current_time = datetime.now().strftime('%Y-%m-%d')
-        
-        # Get category name for confirmation
-        cursor.execute("SELECT name FROM categories WHERE id = ?", (category_id,))
-        category_name = cursor.fetchone()
-        if not category_name:
-            print("Category not found")
-            return False
-            
-        # Soft delete objects
-        cursor.execute("""
-            UPDATE objects 
-            SET deletion_date = ?, 
-                deletion_user = 'admin'
-            WHERE category_id = ? 
-            AND deletion_date IS NULL
-        """, (current_time, category_id))
-        
-        affected = cursor.rowcount
-        conn.commit()
-        
-        print(f"All objects ({affected}) in category '{category_name[0]}' have been deleted")
-        return True
-    except Error as e:
-        print(f"Error deleting category objects: {e}")
+    if not check_admin_password(admin_password):
+        print("Invalid admin password!")
         return False
 
-def delete_status_objects(conn, status_id, admin_password):
+    # Get category name for confirmation
+    category_name = conn.execute("SELECT name FROM categories WHERE id = ?",
+                                 (category_id,)).fetchone()
+    if not category_name:
+        print("Category not found")
+        return False
+
+    op = _bulk_delete(conn, 'category', category_id, comment)
+    if op is None:
+        return False
+    print(f"All objects ({op['processed']}) in category '{category_name[0]}' have been deleted")
+    return True
+
+def delete_status_objects(conn, status_id, admin_password, comment=None):
     """Soft delete all objects with a specific status with password protection"""
-    try:
-        if not check_admin_password(admin_password):
-            print("Invalid admin password!")
-            return False
-            
-        cursor = conn.cursor()
-        current_time = datetime.now().strftime('%Y-%m-%d')
-        
-        # Get status name for confirmation
-        cursor.execute("SELECT name FROM statuses WHERE id = ?", (status_id,))
-        status_name = cursor.fetchone()
-        if not status_name:
-            print("Status not found")
-            return False
-            
-        # Soft delete objects
-        cursor.execute("""
-            UPDATE objects 
-            SET deletion_date = ?, 
-                deletion_user = 'admin'
-            WHERE status_id = ? 
-            AND deletion_date IS NULL
-        """, (current_time, status_id))
-        
-        affected = cursor.rowcount
-        conn.commit()
-        
-        print(f"All objects ({affected}) with status '{status_name[0]}' have been deleted")
-        return True
-    except Error as e:
-        print(f"Error deleting status objects: {e}")
+    if not check_admin_password(admin_password):
+        print("Invalid admin password!")
+        return False
+
+    # Get status name for confirmation
+    status_name = conn.execute("SELECT name FROM statuses WHERE id = ?",
+                               (status_id,)).fetchone()
+    if not status_name:
+        print("Status not found")
+        return False
+
+    op = _bulk_delete(conn, 'status', status_id, comment)
+    if op is None:
         return False
+    print(f"All objects ({op['processed']}) with status '{status_name[0]}' have been deleted")
+    return True
 
-def delete_all_objects(conn, admin_password):
+def delete_all_objects(conn, admin_password, comment=None):
     """Soft delete all objects with password protection"""
-    try:
-        if not check_admin_password(admin_password):
-            print("Invalid admin password!")
-            return False
-            
-        # Double confirmation for dangerous operation
-        confirm = input("Are you sure you want to delete ALL objects? (yes/no): ")
-        if confirm.lower() != 'yes':
-            print("Operation cancelled")
-            return False
-            
-        cursor = conn.cursor()
-        current_time = datetime.now().strftime('%Y-%m-%d')
-        
-        # Soft delete all objects
-        cursor.execute("""
-            UPDATE objects 
-            SET deletion_date = ?, 
-                deletion_user = 'admin'
-            WHERE deletion_date IS NULL
-        """, (current_time,))
-        
-        affected = cursor.rowcount
-        conn.commit()
+    if not check_admin_password(admin_password):
+        print("Invalid admin password!")
+        return False
         
-        print(f"All objects ({affected}) have been deleted")
+    # Double confirmation for dangerous operation
+    confirm = input("Are you sure you want to delete ALL objects? (yes/no): ")
+    if confirm.lower() != 'yes':
+        print("Operation cancelled")
+        return False
+
+    op = _bulk_delete(conn, 'all', None, comment)
+    if op is None:
+        return False
+    print(f"All objects ({op['processed']}) have been deleted")
+    return True
+
+def restore_bulk_delete(conn, op_id, admin_password, comment=None):
+    """Undo a bulk delete: restore exactly the objects it deleted"""
+    if not check_admin_password(admin_password):
+        print("Invalid admin password!")
+        return False
+    try:
+        op = bulk_ops.restore_operation(op_id, user='admin', comment=comment,
+                                        write=writer_for(conn), progress=_print_progress)
+        print(f"{op['processed']} objects restored")
         return True
-    except Error as e:
-        print(f"Error deleting all objects: {e}")
+    except (Error, ValueError) as e:
+        print(f"Error restoring bulk delete: {e}")
         return False
 
 ## MAIN
@@ -690,33 +724,40 @@ def main():
     else:
         print("Error! Cannot create the database connection.")
 
-def get_history_summary(conn):
-    """Get grouped history of changes"""
+## RESUMEN DE LA HISTORIA
+def get_history_summary(conn, since=None, until=None):
+    """
+    Get grouped history of changes per day, zone, action and comment.
+    Reads the action_history_daily rollup (kept up to date by a trigger),
+    so the cost depends on the number of days asked for, not on the
+    size of action_history.
+
+    Args:
+        conn: Database connection object
+        since: First day to include ('YYYY-MM-DD'), None for no limit
+        until: Last day to include ('YYYY-MM-DD'), None for no limit
+    """
     try:
         cursor = conn.cursor()
         sql = """
         SELECT 
             z.name as zone_name,
-            ah.action_type,
-            COUNT(*) as change_count,
-            GROUP_CONCAT(o.name) as objects_modified,
-            ah.modification_date,
-            ah.modification_user,
-            ah.comment
-        FROM action_history ah
-        JOIN zones z ON ah.zone_id = z.id
-        JOIN objects o ON ah.object_id = o.id
-        GROUP BY 
-            z.id,
-            ah.action_type,
-            DATE(ah.modification_date),
-            ah.comment
+            d.action_type,
+            d.change_count,
+            d.objects_modified,
+            d.last_modification_date as modification_date,
+            d.last_modification_user as modification_user,
+            NULLIF(d.comment, '') as comment
+        FROM action_history_daily d
+        JOIN zones z ON d.zone_id = z.id
+        WHERE d.day >= ? AND d.day <= ?
         ORDER BY 
-            ah.modification_date DESC,
+            d.day DESC,
+            d.last_modification_date DESC,
             z.name,
-            ah.action_type
+            d.action_type
         """
-        cursor.execute(sql)
+        cursor.execute(sql, (since or '', until or '9999-12-31'))
         return cursor.fetchall()
     except Error as e:
         print(f"Error getting history: {e}")
@@ -766,13 +807,6 @@ def initialize_data(conn):
     except Error as e:
         print(f"Error initializing data: {e}")
 
-def get_db():
-    """Get database connection"""
-    if 'db' not in g:
-        g.db = sqlite3.connect('inventory.db')
-        g.db.row_factory = sqlite3.Row
-    return g.db
-
 def init_db(app):
     """Initialize the database."""
     try:
@@ -791,29 +825,17 @@ def init_db(app):
             ]
             cursor.executemany('INSERT INTO zones (name) VALUES (?)', default_zones)
             db.commit()
+            migrate(db)
+            close_db()
             print("Database initialized successfully with default zones")
     except Exception as e:
         print(f"Error initializing database: {e}")
         raise
 
-def close_db(e=None):
-    """Close database connection"""
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
-
 def get_zones(conn):
-    """Get all zones from the database"""
+    """Get all zones from the database as Zone records"""
     try:
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM zones')
-        zones = []
-        for row in cursor.fetchall():
-            zones.append({
-                'id': row[0],
-                'name': row[1]
-            })
-        return zones
+        return records.fetch_all(conn, Zone, f'SELECT {records.select_list(Zone)} FROM zones')
     except sqlite3.Error as e:
         print(f"Database error getting zones: {e}")
         raise Exception(f"Database error: {str(e)}")
@@ -822,25 +844,13 @@ def get_zones(conn):
         raise
 
 def get_objects(conn):
-    """Get all objects from the database with their zone names"""
+    """Get all objects from the database with their zone names, as Object records"""
     try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT o.id, o.name, o.description, o.price, o.quantity, 
-                o.status, z.name as zone_name 
+        return records.fetch_all(conn, Object, f'''
+            SELECT {records.select_list(Object, 'o', zone_name='z.name')}
             FROM objects o
             LEFT JOIN zones z ON o.zone_id = z.id
         ''')
-        rows = cursor.fetchall()
-        
-        objects = []
-        for row in rows:
-            object_dict = {}
-            for idx, column in enumerate(cursor.description):
-                object_dict[column[0]] = row[idx]
-            objects.append(object_dict)
-            
-        return objects
         
     except sqlite3.Error as e:
         print(f"Database error in get_objects: {e}")
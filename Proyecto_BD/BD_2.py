@@ -1,5 +1,6 @@
 import sqlite3
 from sqlite3 import Error
+from migrations import migrate
 
 
 def create_connection():
@@ -113,6 +114,7 @@ def create_table(conn):
         cursor.execute(create_history_table)
 
         conn.commit()
+        migrate(conn)
         print("Tables created successfully")
     except Error as e:
         print(f"Error creating table: {e}")
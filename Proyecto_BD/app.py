@@ -1,133 +1,501 @@
-from flask import Flask, request, jsonify, render_template
-import sqlite3
-from datetime import datetime
-import os
+from flask import Flask, request, jsonify, render_template, Response
+from datetime import datetime, timedelta
+from pool import get_pool, get_db, close_db
+from storage import get_write_queue
+from objects_query import list_objects, parse_list_args, search_objects, parse_search_args
+from migrations import migrate
+from cache import reference_cache
+import BD
+import bulk_import
+import export
+import stats
+import history_store
+import bulk_ops
+import jobs
+from jobs import get_job_runner
+import changes
+from changes import get_change_feed
+import metrics
+import querylog
+import records
+from records import HistoryEntry
+from logs import get_logger, SAMPLED
 
 app = Flask(__name__)
+log = get_logger('app')
+querylog.install()
+
+app.teardown_appcontext(close_db)
+
+def migrate_database():
+    """Bring the database schema up to date (runs when the app is created)"""
+    with get_pool().connection() as conn:
+        version = migrate(conn)
+    log.info("Schema version: %s", version)
+
+# Tambien con flask run / WSGI, no solo con python app.py
+migrate_database()
+
+@app.before_request
+def start_request_metrics():
+    rule = request.url_rule
+    # La plantilla de la ruta, no la URL: pocas series distintas
+    metrics.start_request(rule.rule if rule is not None else 'unmatched')
+
+@app.after_request
+def finish_request_metrics(response):
+    measured = metrics.finish_request(request.method, response.status_code)
+    if measured is not None:
+        seconds, statements, rows = measured
+        log.info("%s %s %s %.1fms %d sql %d rows", request.method, request.path,
+                 response.status_code, seconds * 1000, statements, rows, extra=SAMPLED)
+    return response
 
 def create_connection():
     try:
-        # Print current working directory and check if database exists
-        print(f"Current working directory: {os.getcwd()}")
-        db_path = 'inventory.db'
-        print(f"Database exists: {os.path.exists(db_path)}")
-        
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_db()
     except Exception as e:
-        print(f"Connection error: {e}")
+        log.error("Connection error: %s", e)
         return None
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/zones', methods=['GET'])
-def get_zones():
+def cached_reference(table):
+    """Serve a reference table from the cache, honouring If-None-Match"""
     try:
         conn = create_connection()
         if not conn:
             return jsonify({"error": "Could not connect to database"}), 500
-            
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM zones')
-        zones = cursor.fetchall()
-        print(f"Found zones: {zones}")  # Debug print
-        
-        result = [dict(row) for row in zones]
-        return jsonify(result)
+        entry = reference_cache.get(table, conn)
     except Exception as e:
-        print(f"Error getting zones: {e}")
+        log.error("Error getting %s: %s", table, e)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
+
+    if request.if_none_match.contains(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    # Browsers keep the body but revalidate every time (cheap 304)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/zones', methods=['GET'])
+def get_zones():
+    return cached_reference('zones')
+
+@app.route('/api/categories', methods=['GET'])
+def get_categories():
+    return cached_reference('categories')
+
+@app.route('/api/statuses', methods=['GET'])
+def get_statuses():
+    return cached_reference('statuses')
+
+@app.route('/api/zones', methods=['POST'])
+def add_zone():
+    try:
+        data = request.get_json()
+        zone_id = get_write_queue().run(BD.add_zone, data['name'])
+        reference_cache.invalidate('zones')
+        return jsonify({"success": True, "id": zone_id}), 201
+    except Exception as e:
+        log.error("Error adding zone: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+def _compact():
+    """?shape=rows: columns once, then one array per row"""
+    return request.args.get('shape') == 'rows'
+
+def _compact_response(columns, rows, page):
+    return Response(records.to_json(rows, columns, page=page), mimetype='application/json')
 
 @app.route('/api/objects', methods=['GET'])
 def get_objects():
+    try:
+        options = parse_list_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     try:
         conn = create_connection()
         if not conn:
             return jsonify({"error": "Could not connect to database"}), 500
             
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT o.*, z.name as zone_name 
-            FROM objects o
-            LEFT JOIN zones z ON o.zone_id = z.id
-        ''')
-        objects = cursor.fetchall()
-        print(f"Found objects: {objects}")  # Debug print
-        
-        result = [dict(row) for row in objects]
-        return jsonify(result)
+        objects, page = list_objects(conn, **options)
+
+        if _compact():
+            # sort_value es la ultima columna: fuera sin pasar por un dict
+            columns = objects[0].keys()[:-1] if objects else []
+            return _compact_response(columns, [row[:-1] for row in objects], page)
+
+        result = []
+        for row in objects:
+            item = dict(row)
+            del item['sort_value']
+            result.append(item)
+        return jsonify({"items": result, "page": page})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"Error getting objects: {e}")
+        log.error("Error getting objects: %s", e)
         return jsonify({"error": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
+
+@app.route('/api/objects/search', methods=['GET'])
+def search():
+    try:
+        options = parse_search_args(request.args)
+        conn = create_connection()
+        if not conn:
+            return jsonify({"error": "Could not connect to database"}), 500
+        rows = search_objects(conn, **options)
+        return jsonify({"items": [dict(row) for row in rows], "count": len(rows)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.error("Error searching objects: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+def _insert_object(conn, data):
+    cursor = conn.cursor()
+    zone_id = data.get('zone_id') if data.get('zone_id') != '' else None
+    
+    cursor.execute('''
+        INSERT INTO objects (name, description, zone_id, price, quantity, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        data['name'],
+        data.get('description', ''),
+        zone_id,
+        float(data.get('price', 0)),
+        int(data.get('quantity', 0)),
+        data.get('status', 'Available')
+    ))
+    
+    object_id = cursor.lastrowid
+    
+    cursor.execute('''
+        INSERT INTO history (object_id, zone_id, action_type, modification_date, comment)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (
+        object_id,
+        zone_id,
+        'CREATE',
+        datetime.now(),
+        data.get('comment', '')
+    ))
+    return object_id
 
 @app.route('/api/objects', methods=['POST'])
 def add_object():
-    conn = None
     try:
         data = request.get_json()
-        print(f"Received data: {data}")  # Debug print
+        # All writes go through the single writer thread (group commit)
+        object_id = get_write_queue().run(_insert_object, data)
+        return jsonify({"success": True, "id": object_id}), 201
         
+    except Exception as e:
+        log.error("Error adding object: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/objects/<int:object_id>', methods=['PATCH'])
+def update_object(object_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        updates = data.get('updates') or {}
+        if not isinstance(updates, dict):
+            return jsonify({"error": "updates must be an object"}), 422
+        changes = get_write_queue().run(
+            BD.apply_object_update,
+            object_id,
+            updates,
+            data.get('user', 'admin'),
+            data.get('comment'),
+        )
+        return jsonify({"success": True, "changed": [field for field, _, _ in changes]})
+    except BD.ObjectNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except BD.ObjectDeleted as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    except Exception as e:
+        log.error("Error updating object: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/objects/bulk', methods=['POST'])
+def bulk_add_objects():
+    fmt = request.args.get('format') or bulk_import.CONTENT_TYPES.get(request.mimetype)
+    if fmt not in bulk_import.FORMATS:
+        return jsonify({"error": "Send CSV, JSON or NDJSON (set Content-Type or ?format=)"}), 415
+    try:
+        chunk_size = int(request.args.get('chunk_size', bulk_import.CHUNK_SIZE))
+        rows = bulk_import.read_rows(request.stream, fmt)
+        report = bulk_import.import_objects(
+            rows,
+            write=get_write_queue().run,
+            chunk_size=max(1, chunk_size),
+            comment=request.args.get('comment', 'Bulk import'),
+        )
+        return jsonify(report)
+    except Exception as e:
+        log.error("Error in bulk import: %s", e)
+        return jsonify({"error": str(e)}), 400
+
+def _submit_job(kind, params):
+    """Queue a background job and answer 202 with where to poll it"""
+    try:
+        job_id = get_job_runner().submit(kind, params, user=params.get('user', 'admin'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.error("Error submitting %s job: %s", kind, e)
+        return jsonify({"error": str(e)}), 500
+    response = jsonify({"success": True, "job_id": job_id})
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response
+
+def _bulk_delete(scope, scope_id=None):
+    data = request.get_json(silent=True) or {}
+    if not BD.check_admin_password(data.get('password')):
+        return jsonify({"error": "Invalid admin password"}), 403
+    return _submit_job('bulk_delete', {
+        'scope': scope,
+        'scope_id': scope_id,
+        'user': data.get('user', 'admin'),
+        'comment': data.get('comment') or None,
+    })
+
+@app.route('/api/zones/<int:zone_id>/objects', methods=['DELETE'])
+def delete_zone_objects(zone_id):
+    return _bulk_delete('zone', zone_id)
+
+@app.route('/api/categories/<int:category_id>/objects', methods=['DELETE'])
+def delete_category_objects(category_id):
+    return _bulk_delete('category', category_id)
+
+@app.route('/api/statuses/<int:status_id>/objects', methods=['DELETE'])
+def delete_status_objects(status_id):
+    return _bulk_delete('status', status_id)
+
+@app.route('/api/objects/all', methods=['DELETE'])
+def delete_all_objects():
+    return _bulk_delete('all')
+
+@app.route('/api/bulk', methods=['GET'])
+def list_bulk_operations():
+    conn = create_connection()
+    if not conn:
+        return jsonify({"error": "Could not connect to database"}), 500
+    return jsonify(bulk_ops.list_operations(conn))
+
+@app.route('/api/bulk/<int:op_id>', methods=['GET'])
+def get_bulk_operation(op_id):
+    conn = create_connection()
+    if not conn:
+        return jsonify({"error": "Could not connect to database"}), 500
+    op = bulk_ops.get_operation(conn, op_id)
+    if op is None:
+        return jsonify({"error": "Bulk operation not found"}), 404
+    return jsonify(op)
+
+@app.route('/api/bulk/<int:op_id>/resume', methods=['POST'])
+def resume_bulk_operation(op_id):
+    return _submit_job('bulk_resume', {'op_id': op_id})
+
+@app.route('/api/bulk/<int:op_id>/restore', methods=['POST'])
+def restore_bulk_operation(op_id):
+    data = request.get_json(silent=True) or {}
+    if not BD.check_admin_password(data.get('password')):
+        return jsonify({"error": "Invalid admin password"}), 403
+    return _submit_job('bulk_restore', {
+        'op_id': op_id,
+        'user': data.get('user', 'admin'),
+        'comment': data.get('comment') or None,
+    })
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    conn = create_connection()
+    if not conn:
+        return jsonify({"error": "Could not connect to database"}), 500
+    return jsonify(jobs.list_jobs(conn))
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    conn = create_connection()
+    if not conn:
+        return jsonify({"error": "Could not connect to database"}), 500
+    job = jobs.get_job(conn, job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    try:
+        job = get_write_queue().run(jobs.cancel_job, job_id)
+    except jobs.JobFinished as e:
+        return jsonify({"error": str(e), "job": e.job}), 409
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    """
+    Server-Sent Events stream of the changes after ?since= (or the
+    Last-Event-ID a reconnecting browser sends). format=json returns one
+    batch instead of a stream.
+    """
+    since = request.args.get('since', request.headers.get('Last-Event-ID'))
+    try:
+        since = int(since) if since not in (None, '') else None
+    except ValueError:
+        return jsonify({"error": "since must be an integer"}), 400
+
+    if request.args.get('format') == 'json':
         conn = create_connection()
         if not conn:
             return jsonify({"error": "Could not connect to database"}), 500
-            
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO objects (name, description, zone_id, price, quantity, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            data['name'],
-            data.get('description', ''),
-            data.get('zone_id') if data.get('zone_id') != '' else None,
-            float(data.get('price', 0)),
-            int(data.get('quantity', 0)),
-            data.get('status', 'Available')
-        ))
-        
-        object_id = cursor.lastrowid
-        print(f"Created object with ID: {object_id}")  # Debug print
-        
-        cursor.execute('''
-            INSERT INTO history (object_id, zone_id, action_type, modification_date, comment)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            object_id,
-            data.get('zone_id') if data.get('zone_id') != '' else None,
-            'CREATE',
-            datetime.now(),
-            data.get('comment', '')
-        ))
-        
-        conn.commit()
-        return jsonify({"success": True, "id": object_id}), 201
-        
+        if since is None:
+            return jsonify({'last_seq': changes.current_seq(conn), 'changes': [], 'reset': False})
+        return jsonify(changes.get_changes(conn, since))
+
+    response = Response(get_change_feed().stream(since), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Sin buffer en un proxy (nginx) delante
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _invalidate_references(entities):
+    # Escrituras de otros procesos tambien llegan por el feed
+    tables = [changes.ENTITY_TABLES[e] for e in entities if e != 'object']
+    if tables:
+        reference_cache.invalidate(*tables)
+
+# Al crear la app: con flask run / WSGI no se ejecuta el bloque __main__
+get_change_feed().add_listener(_invalidate_references)
+
+@app.route('/api/objects/export', methods=['GET'])
+def export_objects():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"format must be one of {list(export.FORMATS)}"}), 400
+    use_gzip = (request.args.get('gzip') == '1'
+                or 'gzip' in request.accept_encodings)
+
+    def generate():
+        # Holds one pooled connection until the last chunk has been sent
+        with get_pool().connection() as conn:
+            chunks = export.export_objects(conn, fmt)
+            if use_gzip:
+                chunks = export.gzip_chunks(chunks)
+            yield from chunks
+
+    response = Response(generate(), mimetype=export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=inventory.{fmt}'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    try:
+        options = history_store.parse_history_args(request.args)
+        conn = create_connection()
+        if not conn:
+            return jsonify({"error": "Could not connect to database"}), 500
+        items, page = history_store.list_history(conn, **options)
+        if _compact():
+            return _compact_response(HistoryEntry._fields, items, page)
+        return jsonify({"items": records.as_dicts(items), "page": page})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"Error adding object: {e}")
-        if conn:
-            conn.rollback()
+        log.error("Error getting history: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/history/summary', methods=['GET'])
+def get_history_summary():
+    try:
+        until = request.args.get('until') or datetime.now().strftime('%Y-%m-%d')
+        since = request.args.get('since') or (
+            datetime.strptime(until, '%Y-%m-%d') - timedelta(days=30)).strftime('%Y-%m-%d')
+        conn = create_connection()
+        if not conn:
+            return jsonify({"error": "Could not connect to database"}), 500
+        rows = BD.get_history_summary(conn, since, until)
+        return jsonify({"items": [dict(row) for row in rows], "since": since, "until": until})
+    except ValueError as e:
         return jsonify({"error": str(e)}), 400
-    finally:
-        if conn:
-            conn.close()
+    except Exception as e:
+        log.error("Error getting history summary: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/history', methods=['POST'])
+def add_history():
+    try:
+        data = request.get_json()
+        entry_id = get_write_queue().run(
+            history_store.add_history_entry,
+            int(data['object_id']),
+            data.get('action_type', 'NOTE'),
+            data.get('comment'),
+            data.get('user', 'admin'),
+        )
+        return jsonify({"success": True, "id": entry_id}), 201
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.error("Error adding history: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    try:
+        conn = create_connection()
+        if not conn:
+            return jsonify({"error": "Could not connect to database"}), 500
+        return jsonify(stats.get_stats(conn))
+    except Exception as e:
+        log.error("Error getting stats: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/pool', methods=['GET'])
+def get_pool_stats():
+    pool_stats = get_pool().stats()
+    pool_stats['writer'] = dict(get_write_queue().stats)
+    pool_stats['reference_cache'] = dict(reference_cache.stats)
+    pool_stats['jobs'] = dict(get_job_runner().stats)
+    pool_stats['changes'] = dict(get_change_feed().stats)
+    return jsonify(pool_stats)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    gauges = {}
+    sources = {
+        'pool': get_pool().stats(),
+        'writer': get_write_queue().stats,
+        'reference_cache': reference_cache.stats,
+        'jobs': get_job_runner().stats,
+        'changes': get_change_feed().stats,
+    }
+    for source, values in sources.items():
+        for name, value in dict(values).items():
+            if isinstance(value, (int, float)):
+                gauges[f"inventory_{source}_{name}"] = (f"{source} {name}", value)
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     # Check database on startup
-    conn = create_connection()
-    if conn:
+    with get_pool().connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
         tables = cursor.fetchall()
-        print(f"Available tables: {tables}")
-        conn.close()
+        log.info("Available tables: %s", [row[0] for row in tables])
     
     app.run(debug=True) 
\ No newline at end of file
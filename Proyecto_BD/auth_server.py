@@ -1,9 +1,17 @@
 import socket
-import netifaces
-import xml.etree.ElementTree as ET
-from lxml import etree
 import hashlib
 import os
+import argparse
+import asyncio
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from network_auth import NetworkAuthorizer
+import protocol
+import io
+from lxml import etree
+from storage import get_write_queue
+from xml_ingest import ingest_objects
+from xml_validation import SchemaValidator
 
 # Hardcoded credentials for the single user
 ADMIN_USERNAME = "admin"
@@ -13,60 +21,48 @@ ADMIN_PASSWORD_HASH = hashlib.sha256("your_secure_password".encode()).hexdigest(
 # Load and validate XML schema
 SCHEMA_FILE = "schema.xml"
 
+# Server limits (can be changed with environment variables or arguments)
+WORKERS = int(os.environ.get('AUTH_WORKERS', '4'))
+MAX_CLIENTS = int(os.environ.get('AUTH_MAX_CLIENTS', '64'))
+CLIENT_TIMEOUT = float(os.environ.get('AUTH_CLIENT_TIMEOUT', '30'))
+# Objects a framed session may have in flight before the server stops reading
+PIPELINE_DEPTH = int(os.environ.get('AUTH_PIPELINE_DEPTH', '64'))
+# Old unframed handshake: longest credentials message, and how long to wait
+# for the rest of credentials that do not match yet
+MAX_CREDENTIALS = 1024
+CREDENTIALS_GRACE = float(os.environ.get('AUTH_CREDENTIALS_GRACE', '0.2'))
+
 ## CARGAR EL ESQUEMA
 def load_schema():
-    """Load the XML schema for validation"""
+    """Load the XML schema once; it is reloaded by itself when schema.xml changes"""
     try:
-        with open(SCHEMA_FILE, 'r') as schema_file:
-            schema_doc = etree.parse(schema_file)
-            schema = etree.XMLSchema(schema_doc)
-            return schema
+        return SchemaValidator(SCHEMA_FILE)
     except Exception as e:
         print(f"Error loading schema: {e}")
         return None
 
 ## VALIDAR EL OBJETO
-def validate_object(xml_string, schema):
-    """Validate an XML object against the schema"""
-    try:
-        root = ET.fromstring(xml_string)
-        schema.assertValid(root)
-        return True
-    except Exception as e:
-        print(f"Validation error: {e}")
-        return False
+def validate_object(xml_data, schema):
+    """Validate an XML object (bytes or str) against the schema"""
+    valid, error = schema.validate(xml_data)
+    if not valid:
+        print(f"Validation error: {error}")
+    return valid
+
+## AUTORIZADOR DE RED COMPARTIDO
+_authorizer = None
 
-## OBTENER LA SUBRED
-def get_subnet():
-    """Get the subnet of the server"""
-    interfaces = netifaces.interfaces()
-    for interface in interfaces:
-        addrs = netifaces.ifaddresses(interface)
-        if netifaces.AF_INET in addrs:
-            for addr in addrs[netifaces.AF_INET]:
-                ip = addr['addr']
-                netmask = addr['netmask']
-                # Return the first non-localhost subnet found
-                if not ip.startswith('127.'):
-                    return (ip, netmask)
-    return None
-
-## COMPROBAR SI EL CLIENTE ESTA EN LA MISMA SUBRED
+def get_authorizer():
+    """Allowed networks are computed once and refreshed on a timer/SIGHUP"""
+    global _authorizer
+    if _authorizer is None:
+        _authorizer = NetworkAuthorizer()
+    return _authorizer
+
+## COMPROBAR SI EL CLIENTE ESTA EN UNA RED PERMITIDA
 def check_client_authorization(client_address):
-    """Check if client is on the same subnet"""
-    server_subnet = get_subnet()
-    if not server_subnet:
-        return False
-    
-    server_ip, server_netmask = server_subnet
-    
-    # Convert IP addresses to integers
-    server_ip_int = int(''.join(['%02x' % int(x) for x in server_ip.split('.')]), 16)
-    client_ip_int = int(''.join(['%02x' % int(x) for x in client_address.split('.')]), 16)
-    netmask_int = int(''.join(['%02x' % int(x) for x in server_netmask.split('.')]), 16)
-    
-    # Compare network addresses
-    return (server_ip_int & netmask_int) == (client_ip_int & netmask_int)
+    """Check if client is on the server subnet or an allowed network"""
+    return get_authorizer().is_allowed(client_address)
 
 ## COMPROBAR LAS CREDENCIALES
 def check_credentials(username, password):
@@ -74,8 +70,135 @@ def check_credentials(username, password):
     password_hash = hashlib.sha256(password.encode()).hexdigest()
     return username == ADMIN_USERNAME and password_hash == ADMIN_PASSWORD_HASH
 
-## INICIAR EL SERVIDOR
-def start_server(port=5000):
+## MENSAJES SIN TRAMAS (PROTOCOLO ANTIGUO)
+# Sin longitudes: las credenciales se leen hasta que cuadran (o se agota la
+# espera) y el XML hasta que se cierra el elemento raiz o el cliente cierra
+def credentials_message_ok(data):
+    """True if data is a complete, valid "user:password" message"""
+    try:
+        credentials = bytes(data).decode().split(':')
+    except UnicodeDecodeError:
+        return False
+    return len(credentials) == 2 and check_credentials(*credentials)
+
+
+class LegacyXMLMessage:
+    """Collects an unframed XML object until its root element is closed"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.complete = False
+        self._depth = 0
+        # Solo detecta el final; la validacion usa el parser endurecido
+        self._parser = etree.XMLPullParser(events=('start', 'end'), resolve_entities=False,
+                                           no_network=True, load_dtd=False)
+
+    def feed(self, chunk):
+        if not chunk:
+            # EOF: el mensaje es lo que haya llegado
+            self.complete = True
+            return
+        self.data += chunk
+        if len(self.data) > protocol.MAX_PAYLOAD:
+            raise protocol.ProtocolError(f"XML object too large ({len(self.data)} bytes)")
+        try:
+            self._parser.feed(chunk)
+            for event, _ in self._parser.read_events():
+                self._depth += 1 if event == 'start' else -1
+                if self._depth == 0:
+                    self.complete = True
+        except etree.XMLSyntaxError:
+            # XML roto: no hace falta esperar mas, la validacion lo rechaza
+            self.complete = True
+
+
+def recv_credentials(client_socket):
+    """Read a "user:password" message that may arrive in several pieces"""
+    data = bytearray()
+    while b':' not in data and len(data) < MAX_CREDENTIALS:
+        chunk = client_socket.recv(MAX_CREDENTIALS - len(data))
+        if not chunk:
+            return bytes(data)
+        data += chunk
+    # Puede faltar el final de la contrasena: esperar un poco antes de rechazar
+    client_socket.settimeout(CREDENTIALS_GRACE)
+    try:
+        while not credentials_message_ok(data) and len(data) < MAX_CREDENTIALS:
+            chunk = client_socket.recv(MAX_CREDENTIALS - len(data))
+            if not chunk:
+                break
+            data += chunk
+    except socket.timeout:
+        pass
+    finally:
+        client_socket.settimeout(None)
+    return bytes(data)
+
+
+def recv_xml(client_socket):
+    """Read one unframed XML object"""
+    message = LegacyXMLMessage()
+    while not message.complete:
+        message.feed(client_socket.recv(65536))
+    return bytes(message.data)
+
+
+async def read_credentials(reader, data, timeout):
+    """recv_credentials for an asyncio StreamReader, starting with bytes already read"""
+    data = bytearray(data)
+    while b':' not in data and len(data) < MAX_CREDENTIALS:
+        chunk = await asyncio.wait_for(reader.read(MAX_CREDENTIALS - len(data)), timeout)
+        if not chunk:
+            return bytes(data)
+        data += chunk
+    while not credentials_message_ok(data) and len(data) < MAX_CREDENTIALS:
+        try:
+            chunk = await asyncio.wait_for(reader.read(MAX_CREDENTIALS - len(data)),
+                                           CREDENTIALS_GRACE)
+        except asyncio.TimeoutError:
+            break
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+async def read_xml(reader, timeout):
+    """recv_xml for an asyncio StreamReader"""
+    message = LegacyXMLMessage()
+    while not message.complete:
+        message.feed(await asyncio.wait_for(reader.read(65536), timeout))
+    return bytes(message.data)
+
+## ATENDER A UN CLIENTE (MODO BLOQUEANTE)
+def handle_client(client_socket, client_ip, schema):
+    """Run the credentials -> XML handshake on one accepted socket"""
+    if not check_client_authorization(client_ip):
+        client_socket.sendall("Unauthorized network".encode())
+        return
+    if not credentials_message_ok(recv_credentials(client_socket)):
+        client_socket.sendall("Invalid credentials".encode())
+        return
+    client_socket.sendall("Authorized".encode())
+
+    try:
+        xml_data = recv_xml(client_socket)
+    except protocol.ProtocolError as e:
+        print(f"Client {client_ip} error: {e}")
+        client_socket.sendall("Invalid object format".encode())
+        return
+    try:
+        valid = validate_object(xml_data, schema)
+    except Exception as e:
+        print(f"Client {client_ip} validation failed: {e}")
+        valid = False
+    if valid:
+        client_socket.sendall("Object validated successfully".encode())
+    else:
+        client_socket.sendall("Invalid object format".encode())
+
+## INICIAR EL SERVIDOR (UN CLIENTE CADA VEZ)
+def start_blocking_server(port=5000):
     schema = load_schema()
     if not schema:
         print("Failed to load schema. Server shutting down.")
@@ -85,30 +208,246 @@ def start_server(port=5000):
     server_socket.bind(('0.0.0.0', port))
     server_socket.listen(1)
     
+    authorizer = get_authorizer()
+    authorizer.install_signal_handler()
+    authorizer.start_auto_refresh()
     print(f"Server listening on port {port}")
     
     while True:
         client_socket, client_address = server_socket.accept()
-        client_ip = client_address[0]
-        
-        if check_client_authorization(client_ip):
-            credentials = client_socket.recv(1024).decode().split(':')
-            if len(credentials) == 2 and check_credentials(*credentials):
-                client_socket.send("Authorized".encode())
-                
-                # Wait for XML data
-                xml_data = client_socket.recv(4096).decode()
-                if validate_object(xml_data, schema):
-                    client_socket.send("Object validated successfully".encode())
-                    # Here you would process and store the valid object
-                else:
-                    client_socket.send("Invalid object format".encode())
+        try:
+            handle_client(client_socket, client_address[0], schema)
+        finally:
+            client_socket.close()
+
+## SESION CON TRAMAS (PROTOCOLO v1)
+async def handle_session(frames, writer, client_ip, schema, executor, timeout):
+    """
+    Framed session: one AUTH, then any number of pipelined OBJECT/BATCH frames.
+    Results are written back in request order while later objects are
+    still being read and validated.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def send(frame):
+        writer.write(frame)
+        await asyncio.wait_for(writer.drain(), timeout)
+
+    if not check_client_authorization(client_ip):
+        await send(protocol.encode_frame(protocol.AUTH_FAIL, "Unauthorized network"))
+        return
+
+    frame_type, payload = await asyncio.wait_for(frames.read_frame(), timeout)
+    if frame_type != protocol.AUTH:
+        await send(protocol.encode_frame(protocol.ERROR, "Expected AUTH frame"))
+        return
+    credentials = payload.decode().split(':')
+    if not (len(credentials) == 2 and check_credentials(*credentials)):
+        await send(protocol.encode_frame(protocol.AUTH_FAIL, "Invalid credentials"))
+        return
+    await send(protocol.encode_frame(protocol.AUTH_OK))
+
+    # Cola acotada: si el cliente envia mas rapido de lo que validamos,
+    # se deja de leer del socket (backpressure)
+    pending = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+
+    async def send_results():
+        broken = False
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            seq, job = item
+            try:
+                result = await job
+            except Exception as e:
+                # Un objeto que falla no corta la sesion: se responde su error
+                print(f"Client {client_ip} object {seq} failed: {e}")
+                result = {'valid': False, 'error': str(e)}
+            if not broken:
+                try:
+                    await send(protocol.encode_result(seq, result))
+                except (ConnectionError, asyncio.TimeoutError):
+                    broken = True
+
+    async def validate(payload):
+        valid = await loop.run_in_executor(executor, validate_object, payload, schema)
+        return {'valid': valid}
+
+    async def ingest(payload):
+        # Se guarda en la base de datos a traves del hilo escritor
+        future = get_write_queue().submit(
+            ingest_objects, io.BytesIO(payload), schema, comment=f"XML import from {client_ip}")
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception as e:
+            return {'objects': 0, 'accepted': 0, 'rejected': 0,
+                    'errors': [{'index': None, 'error': str(e)}]}
+
+    sender = asyncio.create_task(send_results())
+    error = None
+    seq = 0
+    try:
+        while not sender.done():
+            try:
+                frame_type, payload = await asyncio.wait_for(frames.read_frame(), timeout)
+            except ConnectionError:
+                break
+            if frame_type == protocol.CLOSE:
+                break
+            if frame_type == protocol.OBJECT:
+                job = asyncio.ensure_future(validate(payload))
+            elif frame_type == protocol.BATCH:
+                job = asyncio.ensure_future(ingest(payload))
             else:
-                client_socket.send("Invalid credentials".encode())
+                error = f"Unexpected frame type {frame_type}"
+                break
+            await pending.put((seq, job))
+            seq += 1
+    except protocol.ProtocolError as e:
+        error = str(e)
+    finally:
+        await pending.put(None)
+        await sender
+
+    if error:
+        await send(protocol.encode_frame(protocol.ERROR, error))
+    else:
+        await send(protocol.encode_frame(protocol.CLOSE))
+
+## ATENDER A UN CLIENTE (MODO ASYNCIO)
+async def handle_client_async(reader, writer, schema, executor, timeout):
+    """Framed session or the old one-object handshake, without blocking other clients"""
+    loop = asyncio.get_running_loop()
+    client_ip = writer.get_extra_info('peername')[0]
+
+    async def reply(message):
+        writer.write(message.encode())
+        await asyncio.wait_for(writer.drain(), timeout)
+
+    try:
+        data = await protocol.read_preamble(reader, timeout)
+        if protocol.is_framed(data):
+            frames = protocol.FrameReader(reader, data)
+            await handle_session(frames, writer, client_ip, schema, executor, timeout)
+            return
+
+        if not check_client_authorization(client_ip):
+            await reply("Unauthorized network")
+            return
+
+        if not credentials_message_ok(await read_credentials(reader, data, timeout)):
+            await reply("Invalid credentials")
+            return
+        await reply("Authorized")
+
+        try:
+            xml_data = await read_xml(reader, timeout)
+        except protocol.ProtocolError as e:
+            print(f"Client {client_ip} error: {e}")
+            await reply("Invalid object format")
+            return
+        # lxml validation is CPU work: keep it off the event loop
+        try:
+            valid = await loop.run_in_executor(executor, validate_object, xml_data, schema)
+        except Exception as e:
+            print(f"Client {client_ip} validation failed: {e}")
+            valid = False
+        if valid:
+            await reply("Object validated successfully")
         else:
-            client_socket.send("Unauthorized network".encode())
-        
-        client_socket.close()
+            await reply("Invalid object format")
+    except asyncio.TimeoutError:
+        print(f"Client {client_ip} timed out")
+    except (ConnectionError, UnicodeDecodeError) as e:
+        print(f"Client {client_ip} error: {e}")
+    except Exception as e:
+        # Nada debe llegar sin capturar a client_connected_cb
+        print(f"Client {client_ip} failed: {e}")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def serve(port=5000, workers=WORKERS, max_clients=MAX_CLIENTS,
+                timeout=CLIENT_TIMEOUT):
+    """
+    Serve many clients at once.
+
+    Args:
+        port: TCP port to listen on
+        workers: Threads used for XML validation
+        max_clients: Connections handled at the same time; later ones
+                     wait for a free slot (backpressure)
+        timeout: Seconds allowed for each read/write on a connection
+    """
+    schema = load_schema()
+    if not schema:
+        print("Failed to load schema. Server shutting down.")
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    slots = asyncio.Semaphore(max_clients)
+    active = set()
+
+    async def on_connect(reader, writer):
+        async with slots:
+            task = asyncio.current_task()
+            active.add(task)
+            try:
+                await handle_client_async(reader, writer, schema, executor, timeout)
+            finally:
+                active.discard(task)
+
+    server = await asyncio.start_server(on_connect, '0.0.0.0', port,
+                                        backlog=max_clients * 2)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    authorizer = get_authorizer()
+    authorizer.start_auto_refresh()
+    handlers = [(signal.SIGINT, stop.set), (signal.SIGTERM, stop.set)]
+    if hasattr(signal, 'SIGHUP'):
+        handlers.append((signal.SIGHUP, authorizer.refresh))
+    for sig, handler in handlers:
+        try:
+            loop.add_signal_handler(sig, handler)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows / hilos secundarios: se para con Ctrl+C
+
+    print(f"Server listening on port {port} "
+          f"({max_clients} clients, {workers} validation workers)")
+    async with server:
+        await stop.wait()
+        # Graceful shutdown: stop accepting, let open sessions finish
+        print("Shutting down, waiting for open connections...")
+        server.close()
+        await server.wait_closed()
+        if active:
+            await asyncio.wait(active, timeout=timeout)
+    executor.shutdown(wait=True)
+    authorizer.stop_auto_refresh()
+    print(f"Server stopped (network checks: {authorizer.stats})")
+
+## INICIAR EL SERVIDOR
+def start_server(port=5000, workers=WORKERS, max_clients=MAX_CLIENTS,
+                 timeout=CLIENT_TIMEOUT):
+    try:
+        asyncio.run(serve(port, workers, max_clients, timeout))
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == '__main__':
-    start_server() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="XML object validation server")
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--max-clients', type=int, default=MAX_CLIENTS)
+    parser.add_argument('--timeout', type=float, default=CLIENT_TIMEOUT)
+    parser.add_argument('--blocking', action='store_true',
+                        help="Old one-client-at-a-time mode")
+    args = parser.parse_args()
+    if args.blocking:
+        start_blocking_server(args.port)
+    else:
+        start_server(args.port, args.workers, args.max_clients, args.timeout)
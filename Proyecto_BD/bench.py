@@ -0,0 +1,299 @@
+"""
+Inventory Management System - Data Layer Benchmark
+Builds a synthetic inventory (zones, categories, statuses and objects) in a
+temporary database for every requested size, times the BD.py operations on
+it and writes the results as JSON. Pass an earlier result file with
+--compare to flag the operations that got slower.
+
+    python bench.py --sizes 1000 100000 --out bench.json
+    python bench.py --sizes 1000 100000 --compare bench.json
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import BD
+import bulk_ops
+from migrations import migrate
+from storage import configure_connection, get_write_queue, writer_for
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+ZONES = 50
+CATEGORIES = 20
+INSERT_CHUNK = 10000
+SEED = 1234
+BULK_RUNS = 3
+# Contrasena de BD.check_admin_password
+ADMIN_PASSWORD = 'admin123'
+
+# Un p95 mas lento que esto (fraccion) respecto a --compare es una regresion
+REGRESSION_THRESHOLD = 0.2
+
+
+## GENERAR LOS DATOS
+def _synthetic_objects(count, rng, status_ids, status_names):
+    for n in range(count):
+        status_id = rng.choice(status_ids)
+        yield (f"Object {n}", f"Synthetic object {n} for the benchmark",
+               rng.randint(1, ZONES), rng.randint(1, CATEGORIES),
+               round(rng.uniform(1, 500), 2), rng.randint(0, 100),
+               status_names[status_id], status_id)
+
+
+def build_database(path, size, seed=SEED):
+    """Create a migrated database at path holding size active objects"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = random.Random(seed)
+    conn = configure_connection(sqlite3.connect(path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        migrate(conn)
+    conn.executemany("INSERT INTO zones (name) VALUES (?)",
+                     [(f"Zone {n}",) for n in range(1, ZONES + 1)])
+    conn.executemany("INSERT INTO categories (name) VALUES (?)",
+                     [(f"Category {n}",) for n in range(1, CATEGORIES + 1)])
+    status_names = dict(conn.execute("SELECT id, name FROM statuses"))
+    status_ids = sorted(status_names)
+
+    rows = _synthetic_objects(size, rng, status_ids, status_names)
+    while True:
+        chunk = [row for _, row in zip(range(INSERT_CHUNK), rows)]
+        if not chunk:
+            break
+        conn.executemany("""
+            INSERT INTO objects (name, description, zone_id, category_id, price,
+                                 quantity, status, status_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, chunk)
+        conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+## MEDIR
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1,
+                       int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB, macOS en bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def measure(func, runs, before=None, after=None):
+    """
+    Call func() runs times. func returns the number of rows it handled;
+    before() and after() run around every call but are not timed.
+
+    Returns:
+        dict: latency percentiles in ms, rows/s and the process peak RSS
+    """
+    timings = []
+    rows = 0
+    # BD.py informa por pantalla; no queremos medir el print
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(runs):
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            rows += func() or 0
+            timings.append(time.perf_counter() - start)
+            if after is not None:
+                after()
+    timings.sort()
+    total = sum(timings)
+    return {
+        'runs': runs,
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'mean_ms': round(total / runs * 1000, 3),
+        'rows': rows,
+        'rows_per_sec': round(rows / total, 1) if total else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+## OPERACIONES
+def _operations(conn, size, rng, runs):
+    """(name, func, runs, before, after) for every benchmarked operation"""
+    zone_names = dict(conn.execute("SELECT id, name FROM zones"))
+    status_ids = [row[0] for row in conn.execute("SELECT id FROM statuses")]
+    max_id = conn.execute("SELECT MAX(id) FROM objects").fetchone()[0]
+    # Los listados completos de 1M filas son lentos: menos repeticiones
+    scan_runs = max(3, runs // max(1, size // 10000))
+
+    def add_object():
+        BD.add_object(conn, {
+            'name': 'Bench object', 'description': 'Added by bench.py',
+            'zone_id': rng.randint(1, ZONES), 'category_id': rng.randint(1, CATEGORIES),
+            'price': 9.99, 'quantity': 1, 'status': 'Available',
+        })
+        return 1
+
+    def update_object():
+        BD.update_object(conn, rng.randint(1, max_id),
+                         {'quantity': rng.randint(0, 100)}, 'bench')
+        return 1
+
+    def list_zone_items():
+        zone_id = rng.randint(1, ZONES)
+        return len(BD.list_zone_items(conn, zone_id, zone_names[zone_id]))
+
+    def get_all_objects():
+        return len(BD.get_all_objects(conn))
+
+    # Mismo camino que BD.py: la cola de escritura de esta base
+    write = writer_for(conn)
+
+    def last_operation():
+        return bulk_ops.list_operations(conn, 1)[0]
+
+    def restore():
+        BD.restore_bulk_delete(conn, last_operation()['id'], ADMIN_PASSWORD)
+        return last_operation()['processed']
+
+    def bulk(delete, scope_id):
+        def run():
+            delete(scope_id)
+            return last_operation()['processed']
+        return run
+
+    zone_id = rng.randint(1, ZONES)
+    delete_zone = bulk(lambda zone_id: BD.delete_zone_objects(conn, zone_id, ADMIN_PASSWORD),
+                       zone_id)
+    # (nombre, funcion, repeticiones, antes, despues); deshacer cada borrado
+    # deja la base igual para la siguiente vuelta
+    return [
+        ('add_object', add_object, runs, None, None),
+        ('update_object', update_object, runs, None, None),
+        ('list_zone_items', list_zone_items, runs, None, None),
+        ('get_all_objects', get_all_objects, scan_runs, None, None),
+        ('delete_zone_objects', delete_zone, BULK_RUNS, None, restore),
+        ('delete_category_objects', bulk(
+            lambda category_id: BD.delete_category_objects(conn, category_id, ADMIN_PASSWORD),
+            rng.randint(1, CATEGORIES)), BULK_RUNS, None, restore),
+        ('delete_status_objects', bulk(
+            lambda status_id: BD.delete_status_objects(conn, status_id, ADMIN_PASSWORD),
+            rng.choice(status_ids)), BULK_RUNS, None, restore),
+        # delete_all_objects pide confirmacion por teclado: mismo camino sin input()
+        ('delete_all_objects', bulk(
+            lambda _: bulk_ops.bulk_delete('all', write=write), None), 1, None, restore),
+        ('restore_bulk_delete', restore, BULK_RUNS, delete_zone, None),
+    ]
+
+
+def run_size(size, runs, work_dir, seed=SEED):
+    """Benchmark every operation against a fresh database with size objects"""
+    path = os.path.join(work_dir, f"bench_{size}.db")
+    start = time.perf_counter()
+    conn = build_database(path, size, seed)
+    result = {'objects': size, 'setup_seconds': round(time.perf_counter() - start, 2),
+              'operations': {}}
+    print(f"{size} objects generated in {result['setup_seconds']}s")
+    try:
+        rng = random.Random(seed)
+        for name, func, op_runs, before, after in _operations(conn, size, rng, runs):
+            stats = measure(func, op_runs, before, after)
+            result['operations'][name] = stats
+            print(f"  {name:34} p50 {stats['p50_ms']:>10.3f} ms  "
+                  f"p95 {stats['p95_ms']:>10.3f} ms  p99 {stats['p99_ms']:>10.3f} ms  "
+                  f"{stats['rows_per_sec'] or 0:>12.0f} rows/s")
+        result['database_mb'] = round(os.path.getsize(path) / (1024 * 1024), 1)
+    finally:
+        get_write_queue(path).stop()
+        conn.close()
+    return result
+
+
+## COMPARAR
+def compare(previous, current, threshold=REGRESSION_THRESHOLD):
+    """List of (size, operation, old p95, new p95) that got slower than threshold"""
+    regressions = []
+    for size, result in current['results'].items():
+        old_ops = previous.get('results', {}).get(size, {}).get('operations', {})
+        for name, stats in result['operations'].items():
+            old = old_ops.get(name)
+            if old and old['p95_ms'] and stats['p95_ms'] > old['p95_ms'] * (1 + threshold):
+                regressions.append((size, name, old['p95_ms'], stats['p95_ms']))
+    return regressions
+
+
+def run(sizes=DEFAULT_SIZES, runs=200, seed=SEED, work_dir=None):
+    """Run the whole suite. Returns the JSON-ready result document"""
+    own_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='inventory-bench-')
+    try:
+        results = {str(size): run_size(size, runs, work_dir, seed) for size in sizes}
+    finally:
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': seed,
+        'runs': runs,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the inventory data layer")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        metavar='N', help="objects in each synthetic inventory")
+    parser.add_argument('--runs', type=int, default=200,
+                        help="calls per single-row operation")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--dir', help="keep the generated databases here")
+    parser.add_argument('--out', help="write the JSON results to this file")
+    parser.add_argument('--compare', metavar='FILE', help="earlier results to compare with")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed p95 slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.dir:
+        os.makedirs(args.dir, exist_ok=True)
+    report = run(args.sizes, args.runs, args.seed, args.dir)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(json.load(f), report, args.threshold)
+        for size, name, old, new in slower:
+            print(f"REGRESSION {size} objects, {name}: p95 {old} ms -> {new} ms")
+        if slower:
+            sys.exit(1)
+        print("No regressions")
@@ -0,0 +1,194 @@
+"""
+Inventory Management System - Bulk Import
+Load many objects at once from CSV, JSON or NDJSON. Rows are validated in
+batches and inserted with executemany, one transaction per chunk, together
+with their CREATE history rows. Bad rows are reported, not fatal.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+from storage import run_write
+
+CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ('csv', 'json', 'ndjson')
+
+# Content-Type -> formato
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/json': 'json',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+}
+
+
+## LEER LAS FILAS
+def read_rows(stream, fmt):
+    """
+    Yield one dict per input row from a binary stream.
+
+    Args:
+        stream: File-like object opened in binary mode
+        fmt: 'csv', 'json' (array of objects) or 'ndjson' (one object per line)
+    """
+    if fmt == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        yield from csv.DictReader(text)
+    elif fmt == 'ndjson':
+        for line in io.TextIOWrapper(stream, encoding='utf-8'):
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield {'__error__': f"Invalid JSON: {e}"}
+    elif fmt == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError("JSON input must be an array of objects")
+        yield from data
+    else:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+
+
+def _optional_int(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+## VALIDAR UNA FILA
+def validate_row(row, zone_ids, category_ids):
+    """
+    Turn an input row into the values tuple for INSERT.
+
+    Returns:
+        tuple: (values, None) when valid, (None, error message) otherwise
+    """
+    if not isinstance(row, dict):
+        return None, "Row must be an object"
+    if '__error__' in row:
+        return None, row['__error__']
+
+    name = (row.get('name') or '').strip()
+    if not name:
+        return None, "name is required"
+
+    try:
+        zone_id = _optional_int(row.get('zone_id'))
+        category_id = _optional_int(row.get('category_id'))
+        price = float(row.get('price') or 0)
+        quantity = int(row.get('quantity') or 0)
+    except (TypeError, ValueError) as e:
+        return None, f"Invalid number: {e}"
+
+    if price < 0 or quantity < 0:
+        return None, "price and quantity must not be negative"
+    if zone_id is not None and zone_id not in zone_ids:
+        return None, f"Unknown zone_id {zone_id}"
+    if category_id is not None and category_id not in category_ids:
+        return None, f"Unknown category_id {category_id}"
+
+    values = (
+        name,
+        row.get('description') or '',
+        zone_id,
+        category_id,
+        price,
+        quantity,
+        row.get('status') or 'Available',
+    )
+    return values, None
+
+
+## INSERTAR UN BLOQUE
+def insert_rows(conn, values, comment, user):
+    """Insert a chunk of validated rows and their history in one go"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM objects")
+    last_id = cursor.fetchone()[0]
+
+    cursor.executemany("""
+        INSERT INTO objects (
+            name, description, zone_id, category_id, price, quantity, status,
+            creation_date, creation_user
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(*row, now, user) for row in values])
+
+    # Solo este bloque escribe dentro de la transaccion: los ids nuevos
+    # son exactamente los mayores que el maximo anterior
+    cursor.execute("""
+        INSERT INTO history (object_id, zone_id, action_type, modification_date,
+                             modification_user, comment)
+        SELECT id, zone_id, 'CREATE', ?, ?, ?
+        FROM objects
+        WHERE id > ?
+    """, (now, user, comment, last_id))
+    return len(values)
+
+
+def _load_reference_ids(conn):
+    zone_ids = {row[0] for row in conn.execute("SELECT id FROM zones")}
+    category_ids = {row[0] for row in conn.execute("SELECT id FROM categories")}
+    return zone_ids, category_ids
+
+
+## IMPORTAR OBJETOS
+def import_objects(rows, write=run_write, chunk_size=CHUNK_SIZE,
+                   comment='Bulk import', user='admin'):
+    """
+    Validate and insert rows in chunked transactions.
+
+    Args:
+        rows: Iterable of dicts (see read_rows)
+        write: Function that runs func(conn, ...) as one transaction,
+               storage.run_write by default
+        chunk_size: Rows per transaction
+        comment: Comment stored on every CREATE history row
+        user: creation_user / modification_user for the new rows
+
+    Returns:
+        dict: inserted/rejected counts and per-row errors (1-based row numbers)
+    """
+    report = {'inserted': 0, 'rejected': 0, 'chunks': 0, 'errors': []}
+    zone_ids, category_ids = write(_load_reference_ids)
+
+    def reject(number, message):
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': number, 'error': message})
+
+    def flush(chunk):
+        values = [item[1] for item in chunk]
+        try:
+            report['inserted'] += write(insert_rows, values, comment, user)
+            report['chunks'] += 1
+        except Exception:
+            # Aislar la fila que falla sin perder el resto del bloque
+            for number, row_values in chunk:
+                try:
+                    report['inserted'] += write(insert_rows, [row_values], comment, user)
+                except Exception as e:
+                    reject(number, str(e))
+
+    chunk = []
+    try:
+        for number, row in enumerate(rows, start=1):
+            values, error = validate_row(row, zone_ids, category_ids)
+            if error:
+                reject(number, error)
+                continue
+            chunk.append((number, values))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+    except (ValueError, csv.Error) as e:
+        report['errors'].append({'row': None, 'error': f"Could not read input: {e}"})
+    if chunk:
+        flush(chunk)
+    return report
@@ -0,0 +1,237 @@
+"""
+Inventory Management System - Bulk Operations
+Soft deletes a whole zone, category, status (or everything) in bounded
+chunks, one short write transaction per chunk, so other writers get the
+lock in between and readers are never held up. Each chunk writes its
+history rows with one INSERT ... SELECT. Progress is stored in
+bulk_operations, so an interrupted operation can be resumed, and every
+object remembers the operation that deleted it (objects.deletion_batch),
+so a delete can be undone exactly with restore_operation.
+"""
+
+import os
+import time
+from datetime import datetime
+
+from storage import run_write
+
+CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', '500'))
+# Pausa entre bloques para dejar pasar al resto de escrituras
+PAUSE_SECONDS = float(os.environ.get('BULK_PAUSE_MS', '0')) / 1000
+
+# Alcance -> condicion sobre objects (None = todos los objetos)
+SCOPES = {
+    'zone': 'zone_id = ?',
+    'category': 'category_id = ?',
+    'status': 'status_id = ?',
+    'all': None,
+}
+
+OPERATION_COLUMNS = ('id', 'kind', 'scope', 'scope_id', 'undo_of', 'state', 'total',
+                     'processed', 'last_id', 'operation_date', 'operation_user',
+                     'comment', 'finished_date', 'error')
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _scope_clause(scope, scope_id):
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown scope '{scope}', expected one of {list(SCOPES)}")
+    condition = SCOPES[scope]
+    if condition is None:
+        return '', []
+    if scope_id is None:
+        raise ValueError(f"scope '{scope}' needs an id")
+    return f" AND {condition}", [scope_id]
+
+
+## LEER EL ESTADO
+def get_operation(conn, op_id):
+    """Operation row as a dict, or None"""
+    row = conn.execute(f"""
+        SELECT {', '.join(OPERATION_COLUMNS)} FROM bulk_operations WHERE id = ?
+    """, (op_id,)).fetchone()
+    return dict(zip(OPERATION_COLUMNS, row)) if row else None
+
+
+def list_operations(conn, limit=50):
+    rows = conn.execute(f"""
+        SELECT {', '.join(OPERATION_COLUMNS)} FROM bulk_operations
+        ORDER BY id DESC LIMIT ?
+    """, (limit,)).fetchall()
+    return [dict(zip(OPERATION_COLUMNS, row)) for row in rows]
+
+
+## CREAR LA OPERACION (trabajos de escritura)
+def start_delete(conn, scope, scope_id=None, user='admin', comment=None):
+    """Register a bulk soft delete and count its objects. Returns the operation id"""
+    scope_sql, params = _scope_clause(scope, scope_id)
+    total = conn.execute(f"""
+        SELECT COUNT(*) FROM objects WHERE deletion_date IS NULL{scope_sql}
+    """, params).fetchone()[0]
+    cursor = conn.execute("""
+        INSERT INTO bulk_operations (kind, scope, scope_id, total, operation_date,
+                                     operation_user, comment)
+        VALUES ('delete', ?, ?, ?, ?, ?, ?)
+    """, (scope, scope_id, total, _now(), user, comment))
+    return cursor.lastrowid
+
+
+def start_restore(conn, op_id, user='admin', comment=None):
+    """Register the undo of a bulk delete. Returns the restore operation id"""
+    original = get_operation(conn, op_id)
+    if original is None or original['kind'] != 'delete':
+        raise ValueError(f"Bulk delete {op_id} not found")
+    total = conn.execute("""
+        SELECT COUNT(*) FROM objects WHERE deletion_batch = ?
+    """, (op_id,)).fetchone()[0]
+    cursor = conn.execute("""
+        INSERT INTO bulk_operations (kind, scope, scope_id, undo_of, total,
+                                     operation_date, operation_user, comment)
+        VALUES ('restore', ?, ?, ?, ?, ?, ?, ?)
+    """, (original['scope'], original['scope_id'], op_id, total, _now(), user, comment))
+    return cursor.lastrowid
+
+
+## UN BLOQUE (trabajos de escritura)
+def _finish_chunk(conn, op, count, last_id, done):
+    conn.execute("""
+        UPDATE bulk_operations
+        SET processed = processed + ?, last_id = ?,
+            state = CASE WHEN ? THEN 'done' ELSE state END,
+            finished_date = CASE WHEN ? THEN ? ELSE finished_date END
+        WHERE id = ?
+    """, (count, last_id, done, done, _now(), op['id']))
+    if done and op['kind'] == 'restore':
+        conn.execute("UPDATE bulk_operations SET state = 'restored' WHERE id = ?",
+                     (op['undo_of'],))
+    return count, done
+
+
+def _delete_chunk(conn, op, chunk_size):
+    scope_sql, params = _scope_clause(op['scope'], op['scope_id'])
+    ids = [row[0] for row in conn.execute(f"""
+        SELECT id FROM objects
+        WHERE deletion_date IS NULL{scope_sql} AND id > ?
+        ORDER BY id LIMIT ?
+    """, (*params, op['last_id'], chunk_size))]
+    if not ids:
+        return _finish_chunk(conn, op, 0, op['last_id'], True)
+
+    now = _now()
+    count = conn.execute(f"""
+        UPDATE objects
+        SET deletion_date = ?, deletion_user = ?, deletion_batch = ?
+        WHERE id BETWEEN ? AND ? AND deletion_date IS NULL{scope_sql}
+    """, (now, op['operation_user'], op['id'], ids[0], ids[-1], *params)).rowcount
+
+    conn.execute("""
+        INSERT INTO history (object_id, zone_id, action_type, modification_date,
+                             modification_user, comment)
+        SELECT id, zone_id, 'DELETE', ?, ?, ?
+        FROM objects
+        WHERE deletion_batch = ? AND id BETWEEN ? AND ?
+    """, (now, op['operation_user'], op['comment'] or f"Bulk delete #{op['id']}",
+          op['id'], ids[0], ids[-1]))
+    return _finish_chunk(conn, op, count, ids[-1], len(ids) < chunk_size)
+
+
+def _restore_chunk(conn, op, chunk_size):
+    batch = op['undo_of']
+    ids = [row[0] for row in conn.execute("""
+        SELECT id FROM objects
+        WHERE deletion_batch = ? AND id > ?
+        ORDER BY id LIMIT ?
+    """, (batch, op['last_id'], chunk_size))]
+    if not ids:
+        return _finish_chunk(conn, op, 0, op['last_id'], True)
+
+    now = _now()
+    # La historia primero: despues del UPDATE ya no se sabe que filas eran
+    conn.execute("""
+        INSERT INTO history (object_id, zone_id, action_type, modification_date,
+                             modification_user, comment)
+        SELECT id, zone_id, 'RESTORE', ?, ?, ?
+        FROM objects
+        WHERE deletion_batch = ? AND id BETWEEN ? AND ?
+    """, (now, op['operation_user'], op['comment'] or f"Undo of bulk delete #{batch}",
+          batch, ids[0], ids[-1]))
+    count = conn.execute("""
+        UPDATE objects
+        SET deletion_date = NULL, deletion_user = NULL, deletion_batch = NULL,
+            modification_date = ?, modification_user = ?
+        WHERE deletion_batch = ? AND id BETWEEN ? AND ?
+    """, (now, op['operation_user'], batch, ids[0], ids[-1])).rowcount
+    return _finish_chunk(conn, op, count, ids[-1], len(ids) < chunk_size)
+
+
+CHUNK_FUNCTIONS = {'delete': _delete_chunk, 'restore': _restore_chunk}
+
+
+def _run_chunk(conn, op_id, chunk_size):
+    op = get_operation(conn, op_id)
+    if op['state'] != 'running':
+        return 0, True
+    return CHUNK_FUNCTIONS[op['kind']](conn, op, chunk_size)
+
+
+def set_state(conn, op_id, state, error=None):
+    conn.execute("""
+        UPDATE bulk_operations SET state = ?, error = ?, finished_date = ?
+        WHERE id = ?
+    """, (state, error, _now() if state != 'running' else None, op_id))
+
+
+## EJECUTAR
+def run_operation(op_id, write=run_write, chunk_size=CHUNK_SIZE,
+                  pause=PAUSE_SECONDS, progress=None):
+    """
+    Process an operation chunk by chunk until it is done. Also resumes an
+    operation that was interrupted, cancelled or failed: it carries on
+    after last_id.
+
+    Args:
+        write: Function that runs func(conn, ...) as one transaction,
+               storage.run_write by default
+        progress: Optional callback, called with the operation dict after
+                  every chunk. If it raises, the operation stops where it
+                  is and can be resumed later
+
+    Returns:
+        dict: the operation after the last chunk
+    """
+    op = write(get_operation, op_id)
+    if op is None:
+        raise ValueError(f"Bulk operation {op_id} not found")
+    if op['state'] in ('failed', 'cancelled'):
+        write(set_state, op_id, 'running')
+
+    done = False
+    while not done:
+        try:
+            _, done = write(_run_chunk, op_id, chunk_size)
+        except Exception as e:
+            write(set_state, op_id, 'failed', str(e))
+            raise
+        if progress is not None:
+            progress(write(get_operation, op_id))
+        if not done and pause:
+            time.sleep(pause)
+    return write(get_operation, op_id)
+
+
+def bulk_delete(scope, scope_id=None, user='admin', comment=None, write=run_write,
+                chunk_size=CHUNK_SIZE, pause=PAUSE_SECONDS, progress=None):
+    """Soft delete every active object in scope. Returns the finished operation"""
+    op_id = write(start_delete, scope, scope_id, user, comment)
+    return run_operation(op_id, write, chunk_size, pause, progress)
+
+
+def restore_operation(op_id, user='admin', comment=None, write=run_write,
+                      chunk_size=CHUNK_SIZE, pause=PAUSE_SECONDS, progress=None):
+    """Undo a bulk delete. Returns the finished restore operation"""
+    restore_id = write(start_restore, op_id, user, comment)
+    return run_operation(restore_id, write, chunk_size, pause, progress)
+
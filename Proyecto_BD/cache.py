@@ -0,0 +1,79 @@
+"""
+Inventory Management System - Reference Data Cache
+In-process cache for the small lookup tables (zones, categories, statuses).
+Each entry keeps the serialized JSON body and a strong ETag so the API can
+answer repeated requests, and If-None-Match revalidations, without touching
+the database.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Segundos que una entrada sigue siendo valida aunque nadie la invalide.
+# Cubre las escrituras hechas por otros procesos (por ejemplo main.py).
+CACHE_TTL = float(os.environ.get('REFERENCE_CACHE_TTL', '60'))
+
+# Consulta que alimenta cada tabla de referencia
+REFERENCE_QUERIES = {
+    'zones': "SELECT * FROM zones ORDER BY id",
+    'categories': "SELECT * FROM categories ORDER BY id",
+    'statuses': "SELECT * FROM statuses ORDER BY id",
+}
+
+
+class CacheEntry:
+    __slots__ = ('body', 'etag', 'loaded_at')
+
+    def __init__(self, body, etag, loaded_at):
+        self.body = body
+        self.etag = etag
+        self.loaded_at = loaded_at
+
+
+## CACHE DE TABLAS DE REFERENCIA
+class ReferenceCache:
+    """Serialized reference tables, invalidated explicitly or by TTL"""
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, table, conn):
+        """Return the CacheEntry for table, loading it with conn if needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(table)
+            if entry is not None and now - entry.loaded_at < self.ttl:
+                self.stats['hits'] += 1
+                return entry
+            self.stats['misses'] += 1
+            generation = self._generation
+
+        rows = conn.execute(REFERENCE_QUERIES[table]).fetchall()
+        body = json.dumps([dict(row) for row in rows], separators=(',', ':')).encode()
+        entry = CacheEntry(body, hashlib.sha256(body).hexdigest()[:32], now)
+
+        with self._lock:
+            # No guardar lo leido si alguien invalido mientras tanto
+            if generation == self._generation:
+                self._entries[table] = entry
+        return entry
+
+    def invalidate(self, *tables):
+        """Drop the given tables (all of them when called without arguments)"""
+        with self._lock:
+            if not tables:
+                tables = tuple(self._entries)
+            for table in tables:
+                self._entries.pop(table, None)
+            self._generation += 1
+            self.stats['invalidations'] += 1
+
+
+reference_cache = ReferenceCache()
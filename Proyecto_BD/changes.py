@@ -0,0 +1,215 @@
+"""
+Inventory Management System - Change Feed
+Triggers (migration 10) append every insert, update and delete on objects,
+zones, categories and statuses to the changes table, whose seq only ever
+grows. Clients ask for what happened after the last seq they saw and get
+small deltas: the current row for upserts, just the id for deletes.
+
+One background thread per process watches MAX(seq), so writes made by any
+process (the API, cli.py, main.py) reach every open Server-Sent Events
+stream within CHANGES_POLL_MS.
+"""
+
+import json
+import os
+import threading
+import time
+
+from logs import get_logger
+from migrations import CHANGE_TABLES
+from pool import get_pool
+from storage import run_write
+
+log = get_logger('changes')
+
+POLL_SECONDS = float(os.environ.get('CHANGES_POLL_MS', '500')) / 1000
+HEARTBEAT_SECONDS = float(os.environ.get('CHANGES_HEARTBEAT', '15'))
+# Filas de changes que se conservan; los clientes mas atrasados recargan todo
+KEEP_CHANGES = int(os.environ.get('CHANGES_KEEP', '100000'))
+PRUNE_SECONDS = 3600
+
+BATCH_LIMIT = 500
+# Mas cambios pendientes que esto: mejor que el cliente recargue
+RESET_THRESHOLD = int(os.environ.get('CHANGES_RESET_THRESHOLD', '2000'))
+
+# entidad -> consulta de las filas actuales (mismas columnas que la API)
+ENTITY_QUERIES = {
+    'object': """
+        SELECT o.*, z.name as zone_name
+        FROM objects o
+        LEFT JOIN zones z ON o.zone_id = z.id
+        WHERE o.deletion_date IS NULL AND o.id IN ({ids})
+    """,
+    'zone': "SELECT * FROM zones WHERE id IN ({ids})",
+    'category': "SELECT * FROM categories WHERE id IN ({ids})",
+    'status': "SELECT * FROM statuses WHERE id IN ({ids})",
+}
+ENTITY_TABLES = {entity: table for table, entity in CHANGE_TABLES.items()}
+
+
+## LEER LOS CAMBIOS
+def current_seq(conn):
+    return conn.execute("SELECT IFNULL(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def _rows_by_id(conn, entity, ids):
+    if not ids:
+        return {}
+    sql = ENTITY_QUERIES[entity].format(ids=', '.join('?' * len(ids)))
+    cursor = conn.execute(sql, list(ids))
+    columns = [column[0] for column in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor}
+
+
+def get_changes(conn, since, limit=BATCH_LIMIT):
+    """
+    Changes after seq since, merged per row (only the last change of each
+    row is kept) and with the current data of every upserted row.
+
+    Returns:
+        dict: {'last_seq': n, 'changes': [...], 'reset': bool}; reset means
+              the client is too far behind (or before the oldest kept
+              change) and should reload everything from last_seq on
+    """
+    latest = current_seq(conn)
+    oldest = conn.execute("SELECT IFNULL(MIN(seq), 1) FROM changes").fetchone()[0]
+    if since < oldest - 1 or latest - since > RESET_THRESHOLD:
+        return {'last_seq': latest, 'changes': [], 'reset': True}
+
+    rows = conn.execute("""
+        SELECT seq, entity, entity_id, op FROM changes
+        WHERE seq > ? ORDER BY seq LIMIT ?
+    """, (since, limit)).fetchall()
+    if not rows:
+        return {'last_seq': since, 'changes': [], 'reset': False}
+
+    merged = {}
+    for seq, entity, entity_id, op in rows:
+        merged.pop((entity, entity_id), None)
+        merged[(entity, entity_id)] = (seq, op)
+
+    wanted = {}
+    for (entity, entity_id), (_, op) in merged.items():
+        if op == 'upsert':
+            wanted.setdefault(entity, set()).add(entity_id)
+    current = {entity: _rows_by_id(conn, entity, ids) for entity, ids in wanted.items()}
+
+    changes = []
+    for (entity, entity_id), (seq, op) in merged.items():
+        data = current.get(entity, {}).get(entity_id)
+        # Borrado (o borrado logico) despues del ultimo cambio leido
+        if op == 'upsert' and data is None:
+            op = 'delete'
+        changes.append({'seq': seq, 'entity': entity, 'id': entity_id,
+                        'op': op, 'data': data})
+    return {'last_seq': rows[-1][0], 'changes': changes, 'reset': False}
+
+
+## PODAR
+def prune_changes(conn, keep=KEEP_CHANGES):
+    """Drop all but the newest keep changes (run as a write job)"""
+    return conn.execute("""
+        DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?
+    """, (keep,)).rowcount
+
+
+## VIGILANTE DE LA SECUENCIA
+class ChangeFeed:
+    """Watches MAX(seq) and wakes the streams waiting for new changes"""
+
+    def __init__(self, poll_seconds=POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.seq = None
+        self._condition = threading.Condition()
+        self._listeners = []
+        self._thread = threading.Thread(target=self._watch, name='inventory-changes',
+                                        daemon=True)
+        self.stats = {'polls': 0, 'wakeups': 0, 'streams': 0, 'prunes': 0}
+        self._thread.start()
+
+    def add_listener(self, func):
+        """Call func(set of entities) whenever new changes appear"""
+        self._listeners.append(func)
+
+    def _watch(self):
+        next_prune = time.monotonic() + PRUNE_SECONDS
+        while True:
+            try:
+                with get_pool().connection() as conn:
+                    seq = current_seq(conn)
+                    entities = set()
+                    if self.seq is not None and seq > self.seq and self._listeners:
+                        entities = {row[0] for row in conn.execute(
+                            "SELECT DISTINCT entity FROM changes WHERE seq > ?", (self.seq,))}
+                self.stats['polls'] += 1
+                if seq != self.seq:
+                    with self._condition:
+                        self.seq = seq
+                        self._condition.notify_all()
+                    self.stats['wakeups'] += 1
+                    for listener in self._listeners:
+                        listener(entities)
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + PRUNE_SECONDS
+                    run_write(prune_changes)
+                    self.stats['prunes'] += 1
+            except Exception as e:
+                log.error("Change feed error: %s", e)
+            time.sleep(self.poll_seconds)
+
+    def wait(self, after_seq, timeout):
+        """Block until MAX(seq) > after_seq or timeout; returns the latest seq"""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.seq is not None and self.seq > after_seq, timeout)
+            return self.seq
+
+    def _fetch(self, since):
+        with get_pool().connection() as conn:
+            return get_changes(conn, since)
+
+    def stream(self, since=None, heartbeat=HEARTBEAT_SECONDS):
+        """Server-Sent Events for every change after since (or from now on)"""
+        if since is None:
+            with get_pool().connection() as conn:
+                since = current_seq(conn)
+        self.stats['streams'] += 1
+        try:
+            yield _event('hello', {'seq': since}, since)
+            while True:
+                latest = self.wait(since, heartbeat)
+                if latest is None or latest <= since:
+                    yield ': keepalive\n\n'
+                    continue
+                # Leer hasta ponerse al dia (varios lotes si hace falta)
+                while since < latest:
+                    batch = self._fetch(since)
+                    if batch['reset']:
+                        since = batch['last_seq']
+                        yield _event('reset', batch, since)
+                        break
+                    if batch['last_seq'] <= since:
+                        break
+                    since = batch['last_seq']
+                    yield _event('changes', batch, since)
+        finally:
+            self.stats['streams'] -= 1
+
+
+def _event(name, data, seq):
+    return f"id: {seq}\nevent: {name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+_change_feed = None
+_change_feed_lock = threading.Lock()
+
+
+## OBTENER EL FEED COMPARTIDO
+def get_change_feed():
+    """Return the process-wide change feed (starts its watcher thread)"""
+    global _change_feed
+    if _change_feed is None:
+        with _change_feed_lock:
+            if _change_feed is None:
+                _change_feed = ChangeFeed()
+    return _change_feed
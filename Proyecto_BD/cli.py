@@ -0,0 +1,368 @@
+"""
+Inventory Management System - Command Line Tools
+Non-interactive commands for batch work on the inventory database.
+
+Usage:
+    python cli.py import objects.csv
+    python cli.py import objects.ndjson --format ndjson --chunk-size 1000
+    python cli.py export --format csv --gzip -o inventory.csv.gz
+    python cli.py ingest-xml inventory.xml
+    python cli.py slow-queries --top 10
+    python cli.py search-index --rebuild
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from pool import DB_PATH
+from storage import WriteQueue
+from migrations import migrate
+
+
+def _migrate(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
+
+
+def _guess_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return {'jsonl': 'ndjson'}.get(extension, extension)
+
+
+## IMPORTAR
+def cmd_import(args):
+    import bulk_import
+
+    fmt = args.format or _guess_format(args.file)
+    if fmt not in bulk_import.FORMATS:
+        print(f"Cannot tell the format of {args.file}, use --format")
+        return 1
+
+    _migrate(args.db)
+    writer = WriteQueue(args.db)
+    stream = sys.stdin.buffer if args.file == '-' else open(args.file, 'rb')
+    try:
+        report = bulk_import.import_objects(
+            bulk_import.read_rows(stream, fmt), write=writer.run,
+            chunk_size=args.chunk_size, comment=args.comment)
+    finally:
+        writer.stop()
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+    print(f"Inserted {report['inserted']} objects, rejected {report['rejected']}")
+    for error in report['errors']:
+        print(f"  row {error['row']}: {error['error']}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if not report['rejected'] else 2
+
+
+## EXPORTAR
+def cmd_export(args):
+    import export
+    from storage import configure_connection
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    chunks = export.export_objects(conn, args.format, args.chunk_size)
+    try:
+        if args.gzip:
+            out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+            for data in export.gzip_chunks(chunks):
+                out.write(data)
+        else:
+            out = open(args.output, 'w', newline='') if args.output else sys.stdout
+            for text in chunks:
+                out.write(text)
+        out.flush()
+        if args.output:
+            out.close()
+    finally:
+        conn.close()
+    return 0
+
+
+## INGERIR XML
+def cmd_ingest_xml(args):
+    from lxml import etree
+    from xml_ingest import ingest_objects
+    from xml_validation import SchemaValidator
+
+    try:
+        schema = SchemaValidator(args.schema)
+    except (OSError, etree.LxmlError) as e:
+        print(f"Error loading schema: {e}")
+        return 1
+
+    _migrate(args.db)
+    writer = WriteQueue(args.db)
+    try:
+        report = writer.run(ingest_objects, args.file, schema,
+                            chunk_size=args.chunk_size, comment=args.comment)
+    except ValueError as e:
+        print(f"Nothing stored: {e}")
+        return 1
+    finally:
+        writer.stop()
+
+    print(f"{report['objects']} objects: {report['accepted']} stored, "
+          f"{report['rejected']} rejected")
+    for error in report['errors']:
+        print(f"  object {error['index']} (id {error['id']}): {error['error']}")
+    return 0 if not report['rejected'] else 2
+
+
+## TOTALES
+def cmd_stats(args):
+    import stats
+
+    _migrate(args.db)
+    if args.rebuild:
+        writer = WriteQueue(args.db)
+        try:
+            writer.run(stats.rebuild_stats)
+        finally:
+            writer.stop()
+        print("Inventory totals rebuilt")
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.check:
+            drift = stats.check_stats(conn)
+            for dimension, key_id, stored, actual in drift:
+                print(f"  {dimension} {key_id}: stored {stored}, actual {actual}")
+            print(f"{len(drift)} total(s) out of date")
+            return 2 if drift else 0
+        json.dump(stats.get_stats(conn), sys.stdout, indent=2)
+        print()
+    finally:
+        conn.close()
+    return 0
+
+
+## INDICE DE BUSQUEDA
+def cmd_search_index(args):
+    import objects_query
+    from migrations import rebuild_search_index
+
+    _migrate(args.db)
+    if args.rebuild:
+        writer = WriteQueue(args.db)
+        try:
+            writer.run(rebuild_search_index)
+        finally:
+            writer.stop()
+        print("Search index rebuilt")
+
+    conn = sqlite3.connect(args.db)
+    try:
+        error = objects_query.check_search_index(conn)
+    finally:
+        conn.close()
+    print(f"{args.db} search index: {error or 'ok'}")
+    if error:
+        print("Repair it with: python cli.py search-index --rebuild")
+    return 2 if error else 0
+
+
+## MANTENIMIENTO DE LA HISTORIA
+def cmd_history_maintenance(args):
+    import history_store
+
+    # Sin opcion: lo que diga la configuracion de history_store
+    hot_months = args.hot_months if args.hot_months is not None else history_store.HOT_MONTHS
+    retention_months = (args.retention_months if args.retention_months is not None
+                        else history_store.RETENTION_MONTHS)
+    archive_dir = args.archive_dir or history_store.ARCHIVE_DIR
+
+    _migrate(args.db)
+    archived = history_store.archive_history(
+        args.db, hot_months=hot_months, archive_dir=archive_dir)
+    for month, tables in archived.items():
+        for table, counts in tables.items():
+            print(f"{month} {table}: {counts['rows']} rows -> "
+                  f"{counts['archived']} archived")
+    retention = history_store.apply_retention(
+        args.db, retention_months=retention_months, archive_dir=archive_dir)
+    for path in retention['archives_removed']:
+        print(f"Removed {path}")
+    for table, count in retention['rows_deleted'].items():
+        if count:
+            print(f"Deleted {count} expired {table} rows")
+    return 0
+
+
+## OPERACIONES MASIVAS
+def _admin_password(args):
+    """--password, then INVENTORY_ADMIN_PASSWORD, then a prompt if there is a terminal"""
+    password = args.password or os.environ.get('INVENTORY_ADMIN_PASSWORD')
+    if password is None and sys.stdin.isatty():
+        import getpass
+        password = getpass.getpass("Admin password: ")
+    return password
+
+
+def cmd_bulk(args):
+    import bulk_ops
+    from BD import check_admin_password
+
+    if args.action != 'status' and not args.target:
+        print(f"bulk {args.action} needs a target")
+        return 1
+    # Borrar, restaurar o continuar en masa: igual que en BD.py y en la API
+    if args.action != 'status' and not check_admin_password(_admin_password(args)):
+        print("Invalid admin password!")
+        return 1
+
+    _migrate(args.db)
+    writer = WriteQueue(args.db)
+
+    def progress(op):
+        print(f"  #{op['id']} {op['kind']}: {op['processed']}/{op['total']}", file=sys.stderr)
+
+    options = {'write': writer.run, 'chunk_size': args.chunk_size, 'progress': progress}
+    try:
+        if args.action == 'status':
+            ops = ([writer.run(bulk_ops.get_operation, args.target)] if args.target
+                   else writer.run(bulk_ops.list_operations))
+            for op in ops:
+                if op:
+                    print(f"#{op['id']} {op['kind']} {op['scope']} {op['scope_id'] or ''} "
+                          f"{op['state']} {op['processed']}/{op['total']} {op['operation_date']}")
+            return 0
+        if args.action == 'delete':
+            scope, _, scope_id = args.target.partition('=')
+            op = bulk_ops.bulk_delete(scope, int(scope_id) if scope_id else None,
+                                      comment=args.comment, **options)
+        elif args.action == 'restore':
+            op = bulk_ops.restore_operation(int(args.target), comment=args.comment, **options)
+        else:
+            op = bulk_ops.run_operation(int(args.target), **options)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        writer.stop()
+
+    print(f"Bulk operation #{op['id']} ({op['kind']}): {op['processed']} objects, {op['state']}")
+    return 0
+
+
+## CONSULTAS LENTAS
+def cmd_slow_queries(args):
+    import querylog
+
+    args.log = args.log or querylog.SLOW_QUERY_LOG
+    try:
+        groups = querylog.summarize(querylog.read_log(args.log))
+    except FileNotFoundError:
+        print(f"No slow query log at {args.log}")
+        return 1
+
+    conn = None
+    if args.explain:
+        conn = sqlite3.connect(args.db)
+    try:
+        scans = 0
+        for n, group in enumerate(groups[:args.top], 1):
+            # Sin plan guardado (executemany...): explicarlo ahora con NULLs
+            if conn is not None and not group['plan'] and isinstance(group['params'], list):
+                group['plan'] = querylog.explain(conn, group['sql'], [None] * len(group['params']))
+                group['full_scans'] = querylog.full_scans(group['sql'], group['plan'])
+            flag = '  FULL SCAN ' + ', '.join(group['full_scans']) if group['full_scans'] else ''
+            scans += bool(group['full_scans'])
+            print(f"#{n} {group['slow']} slow, {group['total_ms']} ms total, "
+                  f"{group['max_ms']} ms max, ran {group['runs']} times, last {group['last']}{flag}")
+            print(f"    {group['sql'][:300]}")
+            print(f"    params: {group['params']}")
+            for detail in group['plan'] or ['(no plan captured)']:
+                print(f"    plan: {detail}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+    print(f"{len(groups)} slow statement(s), {scans} of the first {min(args.top, len(groups))} "
+          f"scan all of {' or '.join(querylog.SCAN_TABLES)}")
+    return 2 if scans else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Inventory command line tools")
+    parser.add_argument('--db', default=DB_PATH, help="SQLite database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('import', help="Bulk import objects")
+    p.add_argument('file', help="CSV, JSON or NDJSON file ('-' for stdin)")
+    p.add_argument('--format', choices=('csv', 'json', 'ndjson'))
+    p.add_argument('--chunk-size', type=int, default=500)
+    p.add_argument('--comment', default='Bulk import')
+    p.add_argument('--report', help="Write the full JSON report here")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser('export', help="Stream all objects out")
+    p.add_argument('--format', choices=('ndjson', 'csv', 'json'), default='ndjson')
+    p.add_argument('--gzip', action='store_true', help="Compress the output")
+    p.add_argument('--chunk-size', type=int, default=1000)
+    p.add_argument('-o', '--output', help="Output file (default: stdout)")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser('ingest-xml', help="Validate and store objects from XML")
+    p.add_argument('file', help="<database> document or any XML with <object> elements")
+    p.add_argument('--schema', default='schema.xml')
+    p.add_argument('--chunk-size', type=int, default=500)
+    p.add_argument('--comment', default='XML import')
+    p.set_defaults(func=cmd_ingest_xml)
+
+    p = commands.add_parser('stats', help="Show, check or rebuild the inventory totals")
+    p.add_argument('--check', action='store_true', help="Compare with a full recount")
+    p.add_argument('--rebuild', action='store_true', help="Recompute from objects")
+    p.set_defaults(func=cmd_stats)
+
+    p = commands.add_parser('search-index', help="Check or rebuild the full-text search index")
+    p.add_argument('--rebuild', action='store_true', help="Re-index every active object")
+    p.set_defaults(func=cmd_search_index)
+
+    p = commands.add_parser('history-maintenance',
+                            help="Archive old history months and apply retention")
+    p.add_argument('--hot-months', type=int, help="Months kept in the main database")
+    p.add_argument('--retention-months', type=int, help="Months kept at all (0 = forever)")
+    p.add_argument('--archive-dir')
+    p.set_defaults(func=cmd_history_maintenance)
+
+    p = commands.add_parser('bulk', help="Chunked bulk soft delete, restore and resume")
+    p.add_argument('action', choices=('delete', 'restore', 'resume', 'status'))
+    p.add_argument('target', nargs='?',
+                   help="delete: zone=ID, category=ID, status=ID or all; "
+                        "restore/resume/status: operation id")
+    p.add_argument('--chunk-size', type=int, default=500)
+    p.add_argument('--comment')
+    p.add_argument('--password',
+                   help="Admin password for delete/restore/resume "
+                        "(default: INVENTORY_ADMIN_PASSWORD, or asked for)")
+    p.set_defaults(func=cmd_bulk)
+
+    p = commands.add_parser('slow-queries',
+                            help="Summarize the slow query log and flag full table scans")
+    p.add_argument('--log', help="JSON-lines log (default: SLOW_QUERY_LOG)")
+    p.add_argument('--top', type=int, default=20)
+    p.add_argument('--explain', action='store_true',
+                   help="Explain statements logged without a plan against --db")
+    p.set_defaults(func=cmd_slow_queries)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,11 @@
 import socket
 import xml.etree.ElementTree as ET
+import argparse
+import json
+import time
+from collections import deque
+
+import protocol
 ## CREAR UN OBJETO DE PRUEBA
 def create_sample_object():
     """Create a sample object following the schema"""
@@ -24,28 +30,131 @@ def create_sample_object():
     return object_xml
 
 ## CONEXION AL SERVIDOR
-def connect_to_server(username, password, xml_data, host='localhost', port=5000):
+def connect_to_server(username, password, xml_data, host='localhost', port=5000, verbose=True):
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
         client_socket.connect((host, port))
         
         # Send credentials
         credentials = f"{username}:{password}"
-        client_socket.send(credentials.encode())
+        client_socket.sendall(credentials.encode())
         response = client_socket.recv(1024).decode()
-        print(f"Authentication response: {response}")
+        if verbose:
+            print(f"Authentication response: {response}")
         
         if response == "Authorized":
             # Send XML data
-            client_socket.send(xml_data.encode())
+            client_socket.sendall(xml_data.encode())
             validation_response = client_socket.recv(1024).decode()
-            print(f"Validation response: {validation_response}")
+            if verbose:
+                print(f"Validation response: {validation_response}")
             
     except Exception as e:
         print(f"Connection error: {e}")
     finally:
         client_socket.close()
 
+## SESION PERSISTENTE (PROTOCOLO CON TRAMAS)
+class Session:
+    """One connection, one authentication, many pipelined objects"""
+
+    def __init__(self, host='localhost', port=5000, timeout=30):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        # The server numbers every OBJECT/BATCH frame of the session
+        self.next_seq = 0
+
+    def authenticate(self, username, password):
+        protocol.send_frame(self.sock, protocol.AUTH, f"{username}:{password}")
+        frame_type, payload = protocol.recv_frame(self.sock)
+        if frame_type != protocol.AUTH_OK:
+            print(f"Authentication response: {payload.decode()}")
+            return False
+        return True
+
+    def send_objects(self, xml_objects, window=32):
+        """
+        Send objects without waiting for each answer; at most `window`
+        are unanswered at any time. Yields (seq, valid) in order.
+        """
+        in_flight = deque()
+        for xml_data in xml_objects:
+            protocol.send_frame(self.sock, protocol.OBJECT, xml_data)
+            in_flight.append(self.next_seq)
+            self.next_seq += 1
+            if len(in_flight) >= window:
+                yield self._read_result(in_flight.popleft())
+        while in_flight:
+            yield self._read_result(in_flight.popleft())
+
+    def send_batch(self, xml_document):
+        """Send a whole <database> document to be validated and stored"""
+        if isinstance(xml_document, str):
+            xml_document = xml_document.encode()
+        protocol.send_frame(self.sock, protocol.BATCH, xml_document)
+        self.next_seq += 1
+        return self._read_frame_result()
+
+    def _read_frame_result(self):
+        frame_type, payload = protocol.recv_frame(self.sock)
+        if frame_type != protocol.RESULT:
+            raise protocol.ProtocolError(f"Server error: {payload.decode()}")
+        return json.loads(payload)
+
+    def _read_result(self, expected_seq):
+        result = self._read_frame_result()
+        if result['seq'] != expected_seq:
+            raise protocol.ProtocolError("Results arrived out of order")
+        return result['seq'], result['valid']
+
+    def close(self):
+        try:
+            protocol.send_frame(self.sock, protocol.CLOSE)
+            protocol.recv_frame(self.sock)
+        except (OSError, protocol.ProtocolError):
+            pass
+        finally:
+            self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+## MEDIR EL RENDIMIENTO
+def benchmark(username, password, count, host='localhost', port=5000, window=32):
+    """Objects per second over one framed session vs. one connection per object"""
+    xml_data = create_sample_object()
+
+    start = time.perf_counter()
+    with Session(host, port) as session:
+        if not session.authenticate(username, password):
+            return
+        valid = sum(1 for _, ok in session.send_objects([xml_data] * count, window) if ok)
+    elapsed = time.perf_counter() - start
+    print(f"Framed session: {count} objects in {elapsed:.3f}s "
+          f"({count / elapsed:.0f} objects/s, {valid} valid)")
+
+    legacy_count = min(count, 200)
+    start = time.perf_counter()
+    for _ in range(legacy_count):
+        connect_to_server(username, password, xml_data, host, port, verbose=False)
+    elapsed = time.perf_counter() - start
+    print(f"One connection per object: {legacy_count} objects in {elapsed:.3f}s "
+          f"({legacy_count / elapsed:.0f} objects/s)")
+
 if __name__ == '__main__':
-    sample_object = create_sample_object()
-    connect_to_server("admin", "your_secure_password", sample_object) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Send objects to auth_server.py")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--bench', type=int, metavar='N',
+                        help="Send N objects and report objects per second")
+    parser.add_argument('--window', type=int, default=32)
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark("admin", "your_secure_password", args.bench, args.host, args.port, args.window)
+    else:
+        sample_object = create_sample_object()
+        connect_to_server("admin", "your_secure_password", sample_object, args.host, args.port)
@@ -0,0 +1,94 @@
+"""
+Inventory Management System - Streaming Export
+Write the inventory as NDJSON, CSV or a JSON array without loading it all
+into memory: the cursor is read in chunks and every chunk is turned into
+text and handed on before the next one is fetched.
+"""
+
+import csv
+import io
+import json
+import zlib
+
+CHUNK_SIZE = 1000
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'json': 'application/json',
+}
+
+EXPORT_SQL = """
+    SELECT o.id, o.name, o.description, o.zone_id, z.name as zone_name,
+           o.category_id, o.price, o.quantity, o.status,
+           o.creation_date, o.modification_date
+    FROM objects o
+    LEFT JOIN zones z ON o.zone_id = z.id
+    WHERE o.deletion_date IS NULL
+    ORDER BY o.id
+"""
+
+
+## LEER POR BLOQUES
+def iter_chunks(conn, chunk_size=CHUNK_SIZE):
+    """Yield (columns, rows) with at most chunk_size rows at a time"""
+    cursor = conn.cursor()
+    cursor.execute(EXPORT_SQL)
+    columns = [column[0] for column in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield columns, rows
+
+
+## EXPORTAR
+def export_objects(conn, fmt='ndjson', chunk_size=CHUNK_SIZE):
+    """
+    Yield the export as text pieces, one per chunk of rows.
+
+    Args:
+        conn: Database connection object
+        fmt: 'ndjson', 'csv' or 'json'
+        chunk_size: Rows fetched per step
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {list(FORMATS)}")
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header_written = False
+        for columns, rows in iter_chunks(conn, chunk_size):
+            if not header_written:
+                writer.writerow(columns)
+                header_written = True
+            writer.writerows(tuple(row) for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        return
+
+    if fmt == 'json':
+        yield '['
+    first = True
+    for columns, rows in iter_chunks(conn, chunk_size):
+        lines = [json.dumps(dict(zip(columns, row))) for row in rows]
+        if fmt == 'ndjson':
+            yield '\n'.join(lines) + '\n'
+        else:
+            yield ('' if first else ',') + ','.join(lines)
+        first = False
+    if fmt == 'json':
+        yield ']'
+
+
+## COMPRIMIR
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of text pieces incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
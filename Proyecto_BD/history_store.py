@@ -0,0 +1,368 @@
+"""
+Inventory Management System - History Store
+The history tables in the main database only keep the recent months.
+Older months are moved to one archive database per month
+(history_archive/history-YYYY-MM.db); on the way, field-level UPDATE rows
+are compacted into one SNAPSHOT row per object and day. Archives past the
+retention period are deleted, together with the matching days of the
+action_history_daily summary. Reads are paginated and time-bounded, and
+only open the archives that overlap the requested range.
+
+Maintenance (e.g. nightly from cron):
+    python cli.py history-maintenance
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from logs import get_logger
+from objects_query import encode_cursor, decode_cursor
+from records import HistoryEntry
+from storage import configure_connection
+
+log = get_logger('history_store')
+
+ARCHIVE_DIR = os.environ.get('HISTORY_ARCHIVE_DIR', 'history_archive')
+# Meses completos que se quedan en la base principal (ademas del actual)
+HOT_MONTHS = int(os.environ.get('HISTORY_HOT_MONTHS', '6'))
+# Meses que se guardan en total; 0 = para siempre
+RETENTION_MONTHS = int(os.environ.get('HISTORY_RETENTION_MONTHS', '60'))
+
+PARTITIONED_TABLES = ('history', 'action_history')
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+DEFAULT_RANGE_DAYS = 30
+
+HISTORY_COLUMNS = ('id', 'object_id', 'zone_id', 'action_type', 'field_modified',
+                   'old_value', 'new_value', 'modification_date',
+                   'modification_user', 'comment')
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+## MESES
+def month_start(value, months_back=0):
+    """First instant of the month of value, moved months_back months earlier"""
+    index = value.year * 12 + value.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def next_month(value):
+    return month_start(value, -1)
+
+
+def archive_path(month, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"history-{month:%Y-%m}.db")
+
+
+def list_archives(archive_dir=ARCHIVE_DIR):
+    """[(month, path)] of the existing archives, newest first"""
+    archives = []
+    if os.path.isdir(archive_dir):
+        for name in os.listdir(archive_dir):
+            if name.startswith('history-') and name.endswith('.db'):
+                try:
+                    month = datetime.strptime(name[8:-3], '%Y-%m')
+                except ValueError:
+                    continue
+                archives.append((month, os.path.join(archive_dir, name)))
+    return sorted(archives, reverse=True)
+
+
+## COMPACTAR
+def compact_updates(rows):
+    """
+    Collapse the UPDATE rows of one object and day into a SNAPSHOT row.
+    old_value/new_value become JSON objects {field: value} holding the first
+    old and the last new value of every field. Other rows are kept as-is.
+
+    Args:
+        rows: history rows (tuples in HISTORY_COLUMNS order) of one day,
+              ordered by id
+    """
+    groups = {}
+    result = []
+    for row in rows:
+        if row[3] == 'UPDATE' and row[4]:
+            groups.setdefault(row[1], []).append(row)
+        else:
+            result.append(row)
+
+    for updates in groups.values():
+        if len(updates) == 1:
+            result.append(updates[0])
+            continue
+        old_values, new_values = {}, {}
+        for row in updates:
+            old_values.setdefault(row[4], row[5])
+            new_values[row[4]] = row[6]
+        comments = list(dict.fromkeys(row[9] for row in updates if row[9]))
+        last = updates[-1]
+        result.append((
+            last[0], last[1], last[2], 'SNAPSHOT', ','.join(new_values),
+            json.dumps(old_values), json.dumps(new_values), last[7], last[8],
+            '; '.join(comments) or None,
+        ))
+    return sorted(result, key=lambda row: row[0])
+
+
+## ARCHIVAR
+def _table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _archive_month(conn, month, path):
+    """Move one month of every partitioned table into its archive database"""
+    start = month.strftime(DATE_FORMAT)
+    end = next_month(month).strftime(DATE_FORMAT)
+    moved = {}
+
+    # ATTACH no se puede hacer dentro de una transaccion
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for table in PARTITIONED_TABLES:
+            columns = _table_columns(conn, 'main', table)
+            if not columns:
+                continue
+            others = ', '.join(name for name in columns if name != 'id')
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS archive.{table} (
+                    id INTEGER PRIMARY KEY, {others}
+                )
+            """)
+            conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS archive.idx_{table}_date
+                ON {table} (modification_date)
+            """)
+
+            if table == 'history' and set(HISTORY_COLUMNS) <= set(columns):
+                column_list = ', '.join(HISTORY_COLUMNS)
+                days = [row[0] for row in conn.execute("""
+                    SELECT DISTINCT substr(modification_date, 1, 10) FROM main.history
+                    WHERE modification_date >= ? AND modification_date < ?
+                """, (start, end))]
+                rows_in = rows_out = 0
+                for day in days:
+                    # Un dia cada vez: la memoria no depende del tamano del mes
+                    day_end = (datetime.strptime(day, '%Y-%m-%d')
+                               + timedelta(days=1)).strftime(DATE_FORMAT)
+                    rows = conn.execute(f"""
+                        SELECT {column_list} FROM main.history
+                        WHERE modification_date >= ? AND modification_date < ?
+                        ORDER BY id
+                    """, (day, day_end)).fetchall()
+                    compacted = compact_updates(rows)
+                    conn.executemany(f"""
+                        INSERT OR IGNORE INTO archive.history ({column_list})
+                        VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})
+                    """, compacted)
+                    rows_in += len(rows)
+                    rows_out += len(compacted)
+            else:
+                column_list = ', '.join(columns)
+                rows_in = rows_out = conn.execute(f"""
+                    INSERT OR IGNORE INTO archive.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table}
+                    WHERE modification_date >= ? AND modification_date < ?
+                """, (start, end)).rowcount
+
+            conn.execute(f"""
+                DELETE FROM main.{table}
+                WHERE modification_date >= ? AND modification_date < ?
+            """, (start, end))
+            moved[table] = {'rows': rows_in, 'archived': rows_out}
+        conn.commit()
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+    return moved
+
+
+def archive_history(db_path, hot_months=HOT_MONTHS, archive_dir=ARCHIVE_DIR, now=None):
+    """
+    Move every month older than hot_months out of the main database.
+    Each month is its own transaction; the copy uses INSERT OR IGNORE, so a
+    run that stops half way can simply be repeated.
+
+    Returns:
+        dict: 'YYYY-MM' -> {table: {'rows': n, 'archived': m}}
+    """
+    cutoff = month_start(now or datetime.now(), hot_months).strftime(DATE_FORMAT)
+    conn = configure_connection(sqlite3.connect(db_path, isolation_level=None))
+    try:
+        months = set()
+        for table in PARTITIONED_TABLES:
+            if not _table_columns(conn, 'main', table):
+                continue
+            months.update(row[0] for row in conn.execute(f"""
+                SELECT DISTINCT substr(modification_date, 1, 7) FROM {table}
+                WHERE modification_date < ?
+            """, (cutoff,)) if row[0])
+
+        report = {}
+        if months:
+            os.makedirs(archive_dir, exist_ok=True)
+        for key in sorted(months):
+            try:
+                month = datetime.strptime(key, '%Y-%m')
+            except ValueError:
+                log.warning("Skipping history rows with bad date '%s'", key)
+                continue
+            report[key] = _archive_month(conn, month, archive_path(month, archive_dir))
+        return report
+    finally:
+        conn.close()
+
+
+## RETENCION
+def apply_retention(db_path, retention_months=RETENTION_MONTHS,
+                    archive_dir=ARCHIVE_DIR, now=None):
+    """
+    Delete archives (and any main-database rows) older than the retention
+    period.
+
+    Returns:
+        dict: removed archive files and deleted rows per table
+    """
+    report = {'archives_removed': [], 'rows_deleted': {}}
+    if retention_months <= 0:
+        return report
+    oldest = month_start(now or datetime.now(), retention_months)
+
+    for month, path in list_archives(archive_dir):
+        if month < oldest:
+            os.remove(path)
+            report['archives_removed'].append(path)
+
+    conn = configure_connection(sqlite3.connect(db_path))
+    try:
+        for table in PARTITIONED_TABLES:
+            if _table_columns(conn, 'main', table):
+                report['rows_deleted'][table] = conn.execute(
+                    f"DELETE FROM {table} WHERE modification_date < ?",
+                    (oldest.strftime(DATE_FORMAT),)).rowcount
+        # El resumen diario sobrevive al archivado, pero no a la retencion
+        if _table_columns(conn, 'main', 'action_history_daily'):
+            report['rows_deleted']['action_history_daily'] = conn.execute(
+                "DELETE FROM action_history_daily WHERE day < ?",
+                (oldest.strftime('%Y-%m-%d'),)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return report
+
+
+## LEER LA HISTORIA
+def parse_history_args(args):
+    """Keyword arguments for list_history from the query string"""
+    options = {}
+    for name in ('since', 'until'):
+        if args.get(name):
+            options[name] = datetime.fromisoformat(args[name])
+    for name in ('object_id', 'zone_id'):
+        if args.get(name):
+            options[name] = int(args[name])
+    if args.get('action_type'):
+        options['action_type'] = args['action_type']
+    limit = int(args.get('limit', DEFAULT_LIMIT))
+    options['limit'] = max(1, min(limit, MAX_LIMIT))
+    if args.get('cursor'):
+        options['cursor'] = args['cursor']
+    return options
+
+
+def _read_partition(conn, table_prefix, where, params, limit):
+    return conn.execute(f"""
+        SELECT {', '.join(HISTORY_COLUMNS)}
+        FROM {table_prefix}history
+        WHERE {' AND '.join(where)}
+        ORDER BY modification_date DESC, id DESC
+        LIMIT ?
+    """, (*params, limit)).fetchall()
+
+
+def list_history(conn, since=None, until=None, object_id=None, zone_id=None,
+                 action_type=None, cursor=None, limit=DEFAULT_LIMIT,
+                 archive_dir=ARCHIVE_DIR):
+    """
+    One page of history, newest first, between since and until (the last
+    DEFAULT_RANGE_DAYS days by default). Archived months are read from
+    their archive databases when the range reaches them.
+
+    Returns:
+        tuple: (list of HistoryEntry records, dict with
+               limit/count/has_more/next_cursor/since/until)
+    """
+    until = until or datetime.now() + timedelta(seconds=1)
+    since = since or until - timedelta(days=DEFAULT_RANGE_DAYS)
+    if since >= until:
+        raise ValueError("since must be earlier than until")
+
+    where = ["modification_date >= ?", "modification_date < ?"]
+    params = [since.strftime(DATE_FORMAT), until.strftime(DATE_FORMAT)]
+    for column, value in (('object_id', object_id), ('zone_id', zone_id),
+                          ('action_type', action_type)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        where.append("modification_date <= ? AND (modification_date < ? OR id < ?)")
+        params.extend([after_date, after_date, after_id])
+
+    rows = [(row, False) for row in _read_partition(conn, '', where, params, limit + 1)]
+
+    # Meses archivados que se solapan con el rango, del mas nuevo al mas viejo
+    for month, path in list_archives(archive_dir):
+        if len(rows) > limit:
+            break
+        if month >= until or next_month(month) <= since:
+            continue
+        archive = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            if _table_columns(archive, 'main', 'history'):
+                rows.extend((row, True) for row in _read_partition(
+                    archive, '', where, params, limit + 1 - len(rows)))
+        finally:
+            archive.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    zone_names = dict(conn.execute("SELECT id, name FROM zones").fetchall())
+
+    items = [HistoryEntry(*row, zone_names.get(row[2]), archived) for row, archived in rows]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(items[-1].modification_date, items[-1].id)
+    page = {
+        'limit': limit,
+        'count': len(items),
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'since': since.strftime(DATE_FORMAT),
+        'until': until.strftime(DATE_FORMAT),
+    }
+    return items, page
+
+
+## ANADIR UNA ENTRADA
+def add_history_entry(conn, object_id, action_type, comment=None, user='admin'):
+    """Append a history row for an object (run as a write job)"""
+    row = conn.execute("SELECT zone_id FROM objects WHERE id = ?", (object_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Object {object_id} not found")
+    cursor = conn.execute("""
+        INSERT INTO history (object_id, zone_id, action_type, modification_date,
+                             modification_user, comment)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (object_id, row[0], action_type, datetime.now().strftime(DATE_FORMAT),
+          user, comment))
+    return cursor.lastrowid
@@ -1,5 +1,6 @@
 import sqlite3
 from datetime import datetime
+from migrations import migrate
 
 def init_db():
     # Create a new database connection
@@ -10,6 +11,8 @@ def init_db():
     cursor.execute('DROP TABLE IF EXISTS history')
     cursor.execute('DROP TABLE IF EXISTS objects')
     cursor.execute('DROP TABLE IF EXISTS zones')
+    # Tables are recreated from scratch, so every migration must run again
+    cursor.execute('PRAGMA user_version = 0')
     
     # Create tables
     cursor.execute('''
@@ -51,8 +54,9 @@ def init_db():
     cursor.execute("INSERT INTO zones (name) VALUES ('Zona Mecanizado')")
     cursor.execute("INSERT INTO zones (name) VALUES ('Zona del laser')")
     
-    # Commit the changes and close the connection
+    # Commit the changes, apply the common schema and close the connection
     conn.commit()
+    migrate(conn)
     conn.close()
     
     print("Database initialized successfully!")
@@ -0,0 +1,236 @@
+"""
+Inventory Management System - Background Jobs
+Long-running admin operations (bulk deletes and restores) run on a small
+thread pool instead of inside the HTTP request. Every job is a row in the
+jobs table, so its state and progress can be polled from any request, a
+cancel request is seen between two chunks, and jobs that were running when
+the server stopped are marked as interrupted on the next start.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import bulk_ops
+from logs import get_logger
+from storage import run_write
+
+log = get_logger('jobs')
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+
+JOB_COLUMNS = ('id', 'kind', 'params', 'state', 'processed', 'total', 'result',
+               'error', 'cancel_requested', 'created_user', 'created_date',
+               'started_date', 'finished_date')
+
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised from a progress report once the job has been asked to stop"""
+
+
+class JobFinished(Exception):
+    """Raised when cancelling a job that is already done, failed or cancelled"""
+
+    def __init__(self, job):
+        super().__init__(f"Job {job['id']} is already {job['state']}")
+        self.job = job
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _job_dict(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    for name in ('params', 'result'):
+        job[name] = json.loads(job[name]) if job[name] else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+
+## LEER EL ESTADO
+def get_job(conn, job_id):
+    row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?",
+                       (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def list_jobs(conn, limit=50):
+    rows = conn.execute(f"""
+        SELECT {', '.join(JOB_COLUMNS)} FROM jobs ORDER BY id DESC LIMIT ?
+    """, (limit,)).fetchall()
+    return [_job_dict(row) for row in rows]
+
+
+## CAMBIOS DE ESTADO (trabajos de escritura)
+def _create_job(conn, kind, params, user):
+    return conn.execute("""
+        INSERT INTO jobs (kind, params, created_user, created_date)
+        VALUES (?, ?, ?, ?)
+    """, (kind, json.dumps(params), user, _now())).lastrowid
+
+
+def _start_job(conn, job_id):
+    """Move a queued job to running; None if it was cancelled meanwhile"""
+    started = conn.execute("""
+        UPDATE jobs SET state = 'running', started_date = ?
+        WHERE id = ? AND state = 'queued'
+    """, (_now(), job_id)).rowcount
+    return get_job(conn, job_id) if started else None
+
+
+def _report_progress(conn, job_id, processed, total):
+    """Store progress and return True if a cancel was requested"""
+    conn.execute("UPDATE jobs SET processed = ?, total = ? WHERE id = ?",
+                 (processed, total, job_id))
+    row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?",
+                       (job_id,)).fetchone()
+    return bool(row and row[0])
+
+
+def _finish_job(conn, job_id, state, result=None, error=None):
+    conn.execute("""
+        UPDATE jobs SET state = ?, result = ?, error = ?, finished_date = ?
+        WHERE id = ?
+    """, (state, json.dumps(result) if result is not None else None, error,
+          _now(), job_id))
+
+
+def cancel_job(conn, job_id):
+    """
+    Cancel a job: a queued job never starts, a running one stops after its
+    current chunk. Returns the job, or None if it does not exist; raises
+    JobFinished if it has already finished.
+    """
+    job = get_job(conn, job_id)
+    if job is None:
+        return None
+    if job['state'] in FINISHED_STATES:
+        raise JobFinished(job)
+    conn.execute("""
+        UPDATE jobs
+        SET state = CASE WHEN state = 'queued' THEN 'cancelled' ELSE state END,
+            finished_date = CASE WHEN state = 'queued' THEN ? ELSE finished_date END,
+            cancel_requested = 1
+        WHERE id = ? AND state IN ('queued', 'running')
+    """, (_now(), job_id))
+    return get_job(conn, job_id)
+
+
+def _recover_jobs(conn):
+    """After a restart: running jobs are lost, queued ones are started again"""
+    conn.execute("""
+        UPDATE jobs SET state = 'failed', error = 'Interrupted by a server restart',
+               finished_date = ?
+        WHERE state = 'running'
+    """, (_now(),))
+    return [row[0] for row in conn.execute(
+        "SELECT id FROM jobs WHERE state = 'queued' ORDER BY id")]
+
+
+## TIPOS DE TRABAJO
+def _bulk_job(start, write):
+    """Run a bulk_ops operation as a job, reporting each chunk"""
+    def handler(params, report):
+        op_id = write(start, params)
+        try:
+            return bulk_ops.run_operation(
+                op_id, write=write,
+                progress=lambda op: report(op['processed'], op['total']))
+        except JobCancelled:
+            # La operacion queda a medias y se puede reanudar o deshacer
+            write(bulk_ops.set_state, op_id, 'cancelled')
+            raise
+    return handler
+
+
+def _start_bulk_delete(conn, params):
+    return bulk_ops.start_delete(conn, params['scope'], params.get('scope_id'),
+                                 params.get('user', 'admin'), params.get('comment'))
+
+
+def _start_bulk_restore(conn, params):
+    return bulk_ops.start_restore(conn, params['op_id'],
+                                  params.get('user', 'admin'), params.get('comment'))
+
+
+def _resume_bulk(conn, params):
+    if bulk_ops.get_operation(conn, params['op_id']) is None:
+        raise ValueError(f"Bulk operation {params['op_id']} not found")
+    return params['op_id']
+
+
+# tipo -> funcion que recibe el write y devuelve handler(params, report)
+JOB_HANDLERS = {
+    'bulk_delete': lambda write: _bulk_job(_start_bulk_delete, write),
+    'bulk_restore': lambda write: _bulk_job(_start_bulk_restore, write),
+    'bulk_resume': lambda write: _bulk_job(_resume_bulk, write),
+}
+
+
+## EJECUTOR
+class JobRunner:
+    """Thread pool that runs the jobs stored in the jobs table"""
+
+    def __init__(self, workers=JOB_WORKERS, write=run_write):
+        self.write = write
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='inventory-job')
+        self.stats = {'submitted': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+        self._lock = threading.Lock()
+        for job_id in self.write(_recover_jobs):
+            self.executor.submit(self._run, job_id)
+
+    def submit(self, kind, params=None, user='admin'):
+        """Store a job and queue it. Returns the job id"""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind '{kind}', expected one of {list(JOB_HANDLERS)}")
+        job_id = self.write(_create_job, kind, params or {}, user)
+        self.executor.submit(self._run, job_id)
+        with self._lock:
+            self.stats['submitted'] += 1
+        return job_id
+
+    def _run(self, job_id):
+        job = self.write(_start_job, job_id)
+        if job is None:
+            return
+
+        def report(processed, total=None):
+            if self.write(_report_progress, job_id, processed, total):
+                raise JobCancelled()
+
+        handler = JOB_HANDLERS[job['kind']](self.write)
+        try:
+            result = handler(job['params'], report)
+            state, error = 'done', None
+        except JobCancelled:
+            result, state, error = None, 'cancelled', None
+        except Exception as e:
+            log.error("Job %s (%s) failed: %s", job_id, job['kind'], e)
+            result, state, error = None, 'failed', str(e)
+        self.write(_finish_job, job_id, state, result, error)
+        with self._lock:
+            self.stats[state] += 1
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+
+## OBTENER EL EJECUTOR COMPARTIDO
+def get_job_runner():
+    """Return the process-wide job runner"""
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                _job_runner = JobRunner()
+    return _job_runner
@@ -0,0 +1,379 @@
+"""
+Inventory Management System - HTTP Load Test
+Replays the request mix of many browsers running main.js against app.py:
+mostly object listings (first pages, next pages, searches) and zone
+lookups, plus some object creations and the occasional bulk delete.
+Reports throughput, error rate and a latency histogram per endpoint.
+
+Against an instance that is already running:
+    python loadtest.py run --url http://127.0.0.1:5000 --concurrency 32 --duration 30
+
+Or let it start a local stand-in server on a fresh synthetic database:
+    python loadtest.py run --start --objects 100000 --concurrency 32 --out load.json
+
+The stand-in server alone (threaded werkzeug, no debugger or reloader):
+    python loadtest.py serve --db /tmp/load.db --objects 100000 --port 5055
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_URL = 'http://127.0.0.1:5055'
+ADMIN_PASSWORD = 'admin123'
+LOAD_ZONE = 'Load test zone'
+SEARCH_WORDS = ('object', 'synthetic', 'bench', 'load', 'zone')
+
+# Peso de cada tipo de peticion en la mezcla (lo que hace main.js)
+REQUEST_MIX = {
+    'GET /api/objects': 45,
+    'GET /api/objects (next page)': 15,
+    'GET /api/zones': 25,
+    'GET /api/objects/search': 5,
+    'POST /api/objects': 9,
+    'DELETE /api/zones/<id>/objects': 1,
+}
+
+# Limites superiores (ms) de las barras del histograma
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+## ESTADISTICAS POR ENDPOINT
+class EndpointStats:
+    __slots__ = ('timings', 'errors', 'statuses')
+
+    def __init__(self):
+        self.timings = []
+        self.errors = 0
+        self.statuses = {}
+
+    def add(self, seconds, status):
+        self.timings.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not (isinstance(status, int) and (200 <= status < 300 or status == 304)):
+            self.errors += 1
+
+    def merge(self, other):
+        self.timings.extend(other.timings)
+        self.errors += other.errors
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def summary(self, elapsed):
+        timings = sorted(self.timings)
+        count = len(timings)
+
+        def pct(fraction):
+            if not timings:
+                return None
+            return round(timings[min(count - 1, int(fraction * count))] * 1000, 2)
+
+        histogram = {}
+        for limit in BUCKETS_MS:
+            histogram[f"<={limit}ms"] = 0
+        histogram[f">{BUCKETS_MS[-1]}ms"] = 0
+        for seconds in timings:
+            ms = seconds * 1000
+            label = next((f"<={limit}ms" for limit in BUCKETS_MS if ms <= limit),
+                         f">{BUCKETS_MS[-1]}ms")
+            histogram[label] += 1
+
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0,
+            'requests_per_sec': round(count / elapsed, 1) if elapsed else None,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+            'max_ms': round(timings[-1] * 1000, 2) if timings else None,
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+            'histogram': histogram,
+        }
+
+
+## UN NAVEGADOR SIMULADO
+class Browser:
+    """One keep-alive connection that behaves like a page running main.js"""
+
+    def __init__(self, url, rng, load_zone_id):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        self.rng = rng
+        self.load_zone_id = load_zone_id
+        self.next_cursor = None
+        self.zones_etag = None
+        self.stats = {name: EndpointStats() for name in REQUEST_MIX}
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, path, body, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.conn.close()
+            return response, data
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            raise
+
+    def _call(self, kind):
+        if kind == 'GET /api/objects':
+            response, data = self.request('GET', '/api/objects?limit=50')
+            if response.status == 200:
+                self.next_cursor = json.loads(data)['page'].get('next_cursor')
+        elif kind == 'GET /api/objects (next page)':
+            query = {'limit': 50}
+            if self.next_cursor:
+                query['cursor'] = self.next_cursor
+            response, data = self.request('GET', f"/api/objects?{urlencode(query)}")
+            if response.status == 200:
+                self.next_cursor = json.loads(data)['page'].get('next_cursor')
+        elif kind == 'GET /api/zones':
+            # El navegador revalida lo que tiene en cache (304)
+            headers = {'If-None-Match': f'"{self.zones_etag}"'} if self.zones_etag else {}
+            response, _ = self.request('GET', '/api/zones', headers=headers)
+            etag = response.getheader('ETag')
+            if etag:
+                self.zones_etag = etag.strip('"')
+        elif kind == 'GET /api/objects/search':
+            query = urlencode({'q': self.rng.choice(SEARCH_WORDS), 'limit': 20})
+            response, _ = self.request('GET', f"/api/objects/search?{query}")
+        elif kind == 'POST /api/objects':
+            response, _ = self.request('POST', '/api/objects', {
+                'name': f"Load object {self.rng.randint(1, 10 ** 6)}",
+                'description': 'Created by loadtest.py',
+                'zone_id': self.load_zone_id,
+                'price': round(self.rng.uniform(1, 100), 2),
+                'quantity': self.rng.randint(1, 10),
+                'status': 'Available',
+            })
+        else:
+            # Solo se borra lo que creo la propia prueba
+            response, _ = self.request(
+                'DELETE', f"/api/zones/{self.load_zone_id}/objects",
+                {'password': ADMIN_PASSWORD, 'user': 'loadtest', 'comment': 'Load test'})
+        return response.status
+
+    def step(self, kind):
+        start = time.perf_counter()
+        try:
+            status = self._call(kind)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            status = type(e).__name__
+        self.stats[kind].add(time.perf_counter() - start, status)
+
+
+## EJECUTAR LA PRUEBA
+def _prepare(url):
+    """Create (or find) the zone the test writes to. Returns its id"""
+    browser = Browser(url, random.Random(), None)
+    response, data = browser.request('GET', '/api/zones')
+    if response.status != 200:
+        raise RuntimeError(f"GET /api/zones answered {response.status}")
+    for zone in json.loads(data):
+        if zone['name'] == LOAD_ZONE:
+            return zone['id']
+    response, data = browser.request('POST', '/api/zones', {'name': LOAD_ZONE})
+    if response.status != 201:
+        raise RuntimeError(f"Could not create the load test zone: {data[:200]!r}")
+    return json.loads(data)['id']
+
+
+def run_load(url=DEFAULT_URL, concurrency=16, duration=30, requests=None,
+             mix=REQUEST_MIX, seed=None):
+    """
+    Run concurrency simulated browsers until duration seconds have passed
+    (or requests requests were sent in total).
+
+    Returns:
+        dict: overall and per-endpoint results, JSON-ready
+    """
+    load_zone_id = _prepare(url)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    sent = [0]
+    sent_lock = threading.Lock()
+    deadline = time.monotonic() + duration if duration else None
+
+    def more():
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        if requests is None:
+            return True
+        with sent_lock:
+            sent[0] += 1
+            return sent[0] <= requests
+
+    browsers = [Browser(url, random.Random(None if seed is None else seed + n), load_zone_id)
+                for n in range(concurrency)]
+
+    def work(browser):
+        while more():
+            browser.step(browser.rng.choices(kinds, weights)[0])
+        browser.conn.close()
+
+    threads = [threading.Thread(target=work, args=(b,), daemon=True) for b in browsers]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    per_endpoint = {kind: EndpointStats() for kind in kinds}
+    overall = EndpointStats()
+    for browser in browsers:
+        for kind, stats in browser.stats.items():
+            if kind in per_endpoint:
+                per_endpoint[kind].merge(stats)
+                overall.merge(stats)
+
+    return {
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'url': url,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 2),
+        'mix': dict(mix),
+        'overall': overall.summary(elapsed),
+        'endpoints': {kind: stats.summary(elapsed) for kind, stats in per_endpoint.items()},
+    }
+
+
+def print_report(report):
+    overall = report['overall']
+    print(f"{overall['requests']} requests in {report['seconds']}s with "
+          f"{report['concurrency']} browsers: {overall['requests_per_sec']} req/s, "
+          f"{overall['error_rate'] * 100:.2f}% errors")
+    print(f"{'endpoint':32} {'req':>7} {'req/s':>8} {'err%':>6} "
+          f"{'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for kind, stats in list(report['endpoints'].items()) + [('overall', overall)]:
+        if not stats['requests']:
+            continue
+        print(f"{kind:32} {stats['requests']:>7} {stats['requests_per_sec']:>8} "
+              f"{stats['error_rate'] * 100:>6.2f} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+              f"{stats['p99_ms']:>9} {stats['max_ms']:>9}")
+
+    print("\nLatency histogram (all endpoints)")
+    largest = max(overall['histogram'].values()) or 1
+    for label, count in overall['histogram'].items():
+        print(f"{label:>10} {count:>8} {'#' * round(40 * count / largest)}")
+
+
+## SERVIDOR LOCAL DE PRUEBA
+def serve(db, port, objects):
+    """Run app.py on db with a threaded server, seeding it first if it is new"""
+    os.environ['INVENTORY_DB'] = db
+    if not os.path.exists(db):
+        import bench
+        print(f"Generating {objects} objects in {db}...")
+        bench.build_database(db, objects).close()
+
+    from werkzeug.serving import run_simple
+    from pool import get_pool
+    from migrations import migrate
+    import app
+
+    with get_pool().connection() as conn:
+        migrate(conn)
+    # Una linea de log por peticion tambien cuesta: solo avisos y errores
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    run_simple('127.0.0.1', port, app.app, threaded=True)
+
+
+def _start_server(db, port, objects, timeout=600):
+    """Start serve() in a child process and wait until it answers"""
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), 'serve', '--db', db,
+         '--port', str(port), '--objects', str(objects)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Stand-in server exited with code {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/zones')
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Stand-in server did not start in time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the inventory web API")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('run', help="Send the request mix and report")
+    p.add_argument('--url', default=DEFAULT_URL)
+    p.add_argument('--concurrency', type=int, default=16, help="simulated browsers")
+    p.add_argument('--duration', type=float, default=30, help="seconds (0 = no limit)")
+    p.add_argument('--requests', type=int, help="stop after this many requests")
+    p.add_argument('--seed', type=int)
+    p.add_argument('--out', help="write the JSON results to this file")
+    p.add_argument('--start', action='store_true',
+                   help="start a stand-in server on a fresh database for the run")
+    p.add_argument('--db', help="database for --start (default: a temporary file)")
+    p.add_argument('--objects', type=int, default=10000,
+                   help="objects generated for a new --start database")
+
+    p = commands.add_parser('serve', help="Run the stand-in server")
+    p.add_argument('--db', required=True)
+    p.add_argument('--port', type=int, default=urlsplit(DEFAULT_URL).port)
+    p.add_argument('--objects', type=int, default=10000)
+
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        serve(args.db, args.port, args.objects)
+        return 0
+
+    if not args.duration and args.requests is None:
+        parser.error("give --duration or --requests")
+
+    server = None
+    work_dir = None
+    if args.start:
+        db = args.db
+        if db is None:
+            work_dir = tempfile.mkdtemp(prefix='inventory-load-')
+            db = os.path.join(work_dir, 'load.db')
+        server = _start_server(db, urlsplit(args.url).port or 80, args.objects)
+    try:
+        report = run_load(args.url, args.concurrency, args.duration or None,
+                          args.requests, seed=args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Inventory Management System - Logging
+Leveled logging for the web API instead of print(). The level comes from
+LOG_LEVEL. High-volume messages (one per request) are logged with
+extra=SAMPLED and only a LOG_SAMPLE_RATE fraction of them is written;
+warnings and errors are always written.
+"""
+
+import logging
+import os
+import random
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0.01'))
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# logger.info(..., extra=SAMPLED) para los mensajes que se muestrean
+SAMPLED = {'sampled': True}
+
+
+class SampleFilter(logging.Filter):
+    """Let through only a fraction of the records marked as sampled"""
+
+    def __init__(self, rate=LOG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+_root = logging.getLogger('inventory')
+if not _root.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _handler.addFilter(SampleFilter())
+    _root.addHandler(_handler)
+    _root.setLevel(LOG_LEVEL)
+    _root.propagate = False
+
+
+def get_logger(name):
+    """Logger under the shared 'inventory' configuration"""
+    return logging.getLogger(f'inventory.{name}')
@@ -29,26 +29,20 @@ from BD import (
 )
 import sqlite3
 from datetime import datetime
+from storage import configure_connection, run_write
+from pool import DB_PATH
+from metrics import connection_factory
+import records
+from records import Zone, Object
 
 def create_connection():
-    return sqlite3.connect('inventory.db')
+    return configure_connection(sqlite3.connect(DB_PATH, factory=connection_factory()))
 
 def get_zones():
     conn = None
     try:
         conn = create_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT id, name FROM zones')
-        
-        zones = []
-        for row in cursor.fetchall():
-            zones.append({
-                'id': row[0],
-                'name': row[1]
-            })
-            
-        return zones
+        return records.fetch_all(conn, Zone, f'SELECT {records.select_list(Zone)} FROM zones')
         
     except Exception as e:
         print(f"Error in get_zones: {e}")
@@ -103,65 +97,44 @@ def init_db():
     conn.commit()
     conn.close()
 
+def _insert_object(conn, name, description, zone_id, price, quantity, status, comment):
+    cursor = conn.cursor()
+    
+    # Insert object
+    cursor.execute('''
+        INSERT INTO objects (name, description, zone_id, price, quantity, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (name, description, zone_id, price, quantity, status))
+    
+    object_id = cursor.lastrowid
+    
+    # Add history entry
+    cursor.execute('''
+        INSERT INTO history (object_id, zone_id, action_type, modification_date, comment)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (object_id, zone_id, 'CREATE', datetime.now(), comment))
+    return object_id
+
 def add_object(name, description, zone_id, price, quantity, status, comment=None):
-    conn = None
     try:
-        conn = create_connection()
-        cursor = conn.cursor()
-        
-        # Insert object
-        cursor.execute('''
-            INSERT INTO objects (name, description, zone_id, price, quantity, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (name, description, zone_id, price, quantity, status))
-        
-        object_id = cursor.lastrowid
-        
-        # Add history entry
-        cursor.execute('''
-            INSERT INTO history (object_id, zone_id, action_type, modification_date, comment)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (object_id, zone_id, 'CREATE', datetime.now(), comment))
-        
-        conn.commit()
-        return object_id
-        
+        # Runs on the shared writer thread, committed with any other pending writes
+        return run_write(_insert_object, name, description, zone_id,
+                         price, quantity, status, comment)
     except Exception as e:
         print(f"Error in add_object: {e}")
-        if conn:
-            conn.rollback()
         return None
-    finally:
-        if conn:
-            conn.close()
 
 def get_objects():
     conn = None
     try:
         conn = create_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT o.*, z.name as zone_name 
+        # Por nombre de columna: en las bases migradas o.* no sigue este orden
+        return records.fetch_all(conn, Object, f'''
+            SELECT {records.select_list(Object, 'o', zone_name='z.name')}
             FROM objects o
             LEFT JOIN zones z ON o.zone_id = z.id
         ''')
         
-        objects = []
-        for row in cursor.fetchall():
-            objects.append({
-                'id': row[0],
-                'name': row[1],
-                'description': row[2],
-                'zone_id': row[3],
-                'price': row[4],
-                'quantity': row[5],
-                'status': row[6],
-                'zone_name': row[7] if len(row) > 7 else ''
-            })
-            
-        return objects
-        
     except Exception as e:
         print(f"Error in get_objects: {e}")
         return []
@@ -0,0 +1,273 @@
+"""
+Inventory Management System - Metrics
+Counters and histograms kept in memory and rendered in the Prometheus text
+format for /metrics. SQL is measured by the connection class the pool and
+the writer thread open their connections with: every execute is timed and
+counted, and the rows fetched are added to the request that fetched them.
+Write jobs run on the writer thread are counted for the request that
+queued them.
+Other observers (slow query log, ...) can subscribe to every statement
+with add_sql_observer.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+SQL_METRICS = os.environ.get('SQL_METRICS', '1') != '0'
+
+# Limites (segundos) de los histogramas de tiempo
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+## TIPOS DE METRICA
+class Counter:
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # labels -> [cuenta por barra..., +Inf, suma]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for n, limit in enumerate(self.buckets):
+                if value <= limit:
+                    counts[n] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in values:
+            total = 0
+            for limit, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                le = f'le="{limit}"'
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {total}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {counts[-1]:.6f}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {total}"
+
+
+REQUEST_SECONDS = Histogram(
+    'inventory_http_request_duration_seconds', "Time spent answering a request",
+    ('method', 'endpoint'))
+REQUESTS = Counter(
+    'inventory_http_requests_total', "Requests answered", ('method', 'endpoint', 'status'))
+REQUEST_SQL = Histogram(
+    'inventory_http_request_sql_statements', "SQL statements run by one request",
+    ('endpoint',), COUNT_BUCKETS)
+REQUEST_ROWS = Histogram(
+    'inventory_http_request_rows', "Rows fetched from the database by one request",
+    ('endpoint',), COUNT_BUCKETS)
+SQL_SECONDS = Histogram(
+    'inventory_sql_statement_duration_seconds', "Time spent in execute()",
+    ('statement',), SQL_BUCKETS)
+SQL_STATEMENTS = Counter(
+    'inventory_sql_statements_total', "SQL statements run", ('endpoint', 'statement'))
+
+METRICS = [REQUEST_SECONDS, REQUESTS, REQUEST_SQL, REQUEST_ROWS, SQL_SECONDS, SQL_STATEMENTS]
+
+
+## CONTEXTO DE LA PETICION
+# Lo que lleva gastado la peticion que atiende este hilo
+_context = threading.local()
+BACKGROUND = 'background'
+
+
+def start_request(endpoint):
+    _context.endpoint = endpoint
+    _context.statements = 0
+    _context.rows = 0
+    _context.start = time.perf_counter()
+
+
+def finish_request(method, status):
+    """Record the request started on this thread. Returns (seconds, statements, rows)"""
+    endpoint = getattr(_context, 'endpoint', None)
+    if endpoint is None:
+        return None
+    seconds = time.perf_counter() - _context.start
+    statements, rows = _context.statements, _context.rows
+    _context.endpoint = None
+    REQUEST_SECONDS.observe(seconds, method, endpoint)
+    REQUESTS.inc(method, endpoint, str(status))
+    REQUEST_SQL.observe(statements, endpoint)
+    REQUEST_ROWS.observe(rows, endpoint)
+    return seconds, statements, rows
+
+
+def current_endpoint():
+    """Endpoint of the request this thread is answering (None outside a request)"""
+    return getattr(_context, 'endpoint', None)
+
+
+def add_usage(statements, rows):
+    """Add SQL run on another thread on behalf of this thread's request"""
+    if getattr(_context, 'endpoint', None) is not None:
+        _context.statements += statements
+        _context.rows += rows
+
+
+## TRABAJOS DE ESCRITURA (HILO ESCRITOR)
+def start_write_job(endpoint):
+    """Count the SQL this thread runs next for the request on endpoint (None: background)"""
+    _context.endpoint = endpoint
+    _context.statements = 0
+    _context.rows = 0
+
+
+def finish_write_job():
+    """Stop counting the job started with start_write_job. Returns (statements, rows)"""
+    _context.endpoint = None
+    return _context.statements, _context.rows
+
+
+## SQL
+_sql_observers = []
+
+
+def add_sql_observer(func):
+    """Call func(connection, sql, parameters, seconds) after every instrumented execute"""
+    _sql_observers.append(func)
+
+
+def statement_kind(sql):
+    words = sql.split(None, 1)
+    return words[0].upper() if words else ''
+
+
+def _record_sql(connection, sql, parameters, seconds):
+    endpoint = getattr(_context, 'endpoint', None)
+    if endpoint is not None:
+        _context.statements += 1
+    kind = statement_kind(sql)
+    SQL_SECONDS.observe(seconds, kind)
+    SQL_STATEMENTS.inc(endpoint or BACKGROUND, kind)
+    for observer in _sql_observers:
+        observer(connection, sql, parameters, seconds)
+
+
+def _record_rows(count):
+    if getattr(_context, 'endpoint', None) is not None:
+        _context.rows += count
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that times execute() and counts the rows fetched with fetch*().
+    Rows read by iterating the cursor are not counted: that loop stays in C.
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(self.connection, sql, None, time.perf_counter() - start)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            _record_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _record_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _record_rows(len(rows))
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors are TimedCursors (pass as factory=)"""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or TimedCursor)
+
+    # Connection.execute no pasa por cursor(): hay que redirigirlo
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    """factory= argument for sqlite3.connect (plain connections when disabled)"""
+    return InstrumentedConnection if SQL_METRICS else sqlite3.Connection
+
+
+## SALIDA PROMETHEUS
+def render(gauges=None):
+    """
+    All metrics in the Prometheus text format.
+
+    Args:
+        gauges: Optional {name: (description, value)} of point-in-time values
+                (pool, writer, cache counters) to add to the output
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, (description, value) in sorted((gauges or {}).items()):
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
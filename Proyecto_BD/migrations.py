@@ -0,0 +1,617 @@
+"""
+Inventory Management System - Schema Migrations
+Brings any of the historical schemas (init_db.py, BD.create_table,
+BD_2.create_table, schema.sql) up to one common schema. The applied
+version is stored in PRAGMA user_version, so already-migrated
+databases skip straight through on startup.
+"""
+
+import sqlite3
+from sqlite3 import Error
+
+
+# Esquema comun: columnas que debe tener cada tabla.
+# ALTER TABLE ADD COLUMN no admite NOT NULL sin valor por defecto,
+# por eso las restricciones solo aparecen en las tablas nuevas.
+CANONICAL_COLUMNS = {
+    'zones': [
+        ('description', 'TEXT'),
+        ('creation_date', 'DATETIME'),
+        ('modification_date', 'DATETIME'),
+        ('deletion_date', 'DATETIME'),
+    ],
+    'categories': [
+        ('description', 'TEXT'),
+        ('creation_date', 'DATETIME'),
+        ('creation_user', 'TEXT'),
+        ('modification_date', 'DATETIME'),
+        ('deletion_date', 'DATETIME'),
+    ],
+    'statuses': [
+        ('description', 'TEXT'),
+        ('creation_date', 'DATETIME'),
+        ('modification_date', 'DATETIME'),
+        ('deletion_date', 'DATETIME'),
+    ],
+    'objects': [
+        ('description', 'TEXT'),
+        ('price', 'REAL DEFAULT 0'),
+        ('quantity', 'INTEGER DEFAULT 0'),
+        ('category_id', 'INTEGER REFERENCES categories (id)'),
+        ('zone_id', 'INTEGER REFERENCES zones (id)'),
+        ('status_id', 'INTEGER REFERENCES statuses (id)'),
+        ('status', "TEXT DEFAULT 'Available'"),
+        ('creation_user', 'TEXT'),
+        ('modification_user', 'TEXT'),
+        ('creation_date', 'DATETIME'),
+        ('modification_date', 'DATETIME'),
+        ('deletion_date', 'DATETIME'),
+        ('deletion_user', 'TEXT'),
+    ],
+    'history': [
+        ('zone_id', 'INTEGER REFERENCES zones (id)'),
+        ('object_id', 'INTEGER REFERENCES objects (id)'),
+        ('action_type', 'TEXT'),
+        ('field_modified', 'TEXT'),
+        ('old_value', 'TEXT'),
+        ('new_value', 'TEXT'),
+        ('modification_date', 'DATETIME'),
+        ('modification_user', 'TEXT'),
+        ('comment', 'TEXT'),
+    ],
+    'action_history': [
+        ('zone_id', 'INTEGER REFERENCES zones (id)'),
+        ('object_id', 'INTEGER REFERENCES objects (id)'),
+        ('action_type', 'TEXT'),
+        ('modification_user', 'TEXT'),
+        ('comment', 'TEXT'),
+        ('modification_date', 'DATETIME'),
+    ],
+    'users': [
+        ('email', 'TEXT'),
+    ],
+}
+
+DEFAULT_STATUSES = ['Available', 'In Use', 'Maintenance', 'Retired']
+
+
+## 1 - TABLAS BASE
+def _create_base_tables(conn):
+    """Create any table that is missing entirely"""
+    for table in CANONICAL_COLUMNS:
+        if table == 'objects':
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL
+                )
+            """)
+        elif table in ('history', 'action_history'):
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT
+                )
+            """)
+        else:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL
+                )
+            """)
+
+
+## 2 - RECONCILIAR COLUMNAS
+def _reconcile_columns(conn):
+    """Add the columns each historical schema is missing"""
+    for table, columns in CANONICAL_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, definition in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    # Los estados se buscan por nombre: algunas bases ya tienen otros ids
+    for name in DEFAULT_STATUSES:
+        conn.execute("""
+            INSERT INTO statuses (name)
+            SELECT ? WHERE NOT EXISTS (SELECT 1 FROM statuses WHERE name = ?)
+        """, (name, name))
+    conn.execute("""
+        INSERT INTO statuses (name)
+        SELECT DISTINCT status FROM objects
+        WHERE status IS NOT NULL
+        AND status NOT IN (SELECT name FROM statuses)
+    """)
+
+    # app.py guarda el estado como texto y BD.py como status_id: rellenar ambos
+    conn.execute("""
+        UPDATE objects
+        SET status_id = (SELECT s.id FROM statuses s WHERE s.name = objects.status)
+        WHERE status_id IS NULL AND status IS NOT NULL
+    """)
+    conn.execute("""
+        UPDATE objects
+        SET status = (SELECT s.name FROM statuses s WHERE s.id = objects.status_id)
+        WHERE status_id IS NOT NULL
+    """)
+
+
+## 3 - SINCRONIZAR status / status_id
+STATUS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_objects_status_insert
+    AFTER INSERT ON objects
+    BEGIN
+        UPDATE objects
+        SET status_id = COALESCE(NEW.status_id,
+                (SELECT id FROM statuses WHERE name = NEW.status)),
+            status = COALESCE(
+                (SELECT name FROM statuses WHERE id = NEW.status_id),
+                NEW.status)
+        WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_objects_status_name
+    AFTER UPDATE OF status ON objects
+    WHEN NEW.status IS NOT OLD.status
+    BEGIN
+        UPDATE objects
+        SET status_id = (SELECT id FROM statuses WHERE name = NEW.status)
+        WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_objects_status_id
+    AFTER UPDATE OF status_id ON objects
+    WHEN NEW.status_id IS NOT OLD.status_id AND NEW.status_id IS NOT NULL
+    BEGIN
+        UPDATE objects
+        SET status = (SELECT name FROM statuses WHERE id = NEW.status_id)
+        WHERE id = NEW.id;
+    END
+    """,
+)
+
+
+def _status_triggers(conn):
+    """Keep the status name and status_id columns in step on every write"""
+    for sql in STATUS_TRIGGERS:
+        conn.execute(sql)
+
+
+## 4 - INDICES
+# Casi todos son parciales: las consultas solo miran objetos no borrados
+INDEXES = (
+    # Listado paginado de objetos activos (objects_query.py)
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_id "
+    "ON objects (id) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_status "
+    "ON objects (status, id) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_status_id "
+    "ON objects (status_id, id) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_category "
+    "ON objects (category_id, id) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_name "
+    "ON objects (name, id) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_price "
+    "ON objects (IFNULL(price, 0), id) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_quantity "
+    "ON objects (IFNULL(quantity, 0), id) WHERE deletion_date IS NULL",
+    # list_zone_items / remove_zone / filtro por zona: cubre la consulta entera
+    "CREATE INDEX IF NOT EXISTS idx_objects_active_zone_cover "
+    "ON objects (zone_id, id, name, description, price, quantity, status_id, "
+    "deletion_date) WHERE deletion_date IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_history_object "
+    "ON history (object_id, modification_date)",
+    "CREATE INDEX IF NOT EXISTS idx_history_date "
+    "ON history (modification_date)",
+    "CREATE INDEX IF NOT EXISTS idx_action_history_zone_date "
+    "ON action_history (zone_id, modification_date)",
+    "CREATE INDEX IF NOT EXISTS idx_action_history_object "
+    "ON action_history (object_id)",
+)
+
+# Indices sin filtro que creaba objects_query.ensure_indexes
+OLD_INDEXES = ('idx_objects_zone', 'idx_objects_status', 'idx_objects_category',
+               'idx_objects_name', 'idx_objects_price', 'idx_objects_quantity')
+
+
+def _create_indexes(conn):
+    """Secondary, covering and partial indexes for the hot queries"""
+    for name in OLD_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for sql in INDEXES:
+        conn.execute(sql)
+    conn.execute("ANALYZE")
+
+
+## 5 - TOTALES POR ZONA / CATEGORIA / ESTADO
+# Una fila por (dimension, id); key_id 0 = sin zona/categoria/estado.
+# Solo cuentan los objetos no borrados.
+STATS_DIMENSIONS = (('zone', 'zone_id'), ('category', 'category_id'), ('status', 'status_id'))
+
+
+def _stats_delta(row, sign):
+    """VALUES rows adding (sign=+1) or removing (sign=-1) one object"""
+    return ",\n".join(
+        f"('{dimension}', IFNULL({row}.{column}, 0), {sign}, "
+        f"{sign} * IFNULL({row}.quantity, 0), "
+        f"{sign} * IFNULL({row}.price, 0) * IFNULL({row}.quantity, 0))"
+        for dimension, column in STATS_DIMENSIONS
+    )
+
+
+def _stats_upsert(row, sign):
+    return f"""
+        INSERT INTO inventory_stats (dimension, key_id, objects, total_quantity, total_value)
+        VALUES {_stats_delta(row, sign)}
+        ON CONFLICT (dimension, key_id) DO UPDATE SET
+            objects = objects + excluded.objects,
+            total_quantity = total_quantity + excluded.total_quantity,
+            total_value = total_value + excluded.total_value;
+    """
+
+
+STATS_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_objects_stats_insert
+    AFTER INSERT ON objects
+    WHEN NEW.deletion_date IS NULL
+    BEGIN
+        {_stats_upsert('NEW', 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_objects_stats_delete
+    AFTER DELETE ON objects
+    WHEN OLD.deletion_date IS NULL
+    BEGIN
+        {_stats_upsert('OLD', -1)}
+    END
+    """,
+    # Restar la fila vieja y sumar la nueva; el borrado logico es un UPDATE
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_objects_stats_remove
+    AFTER UPDATE OF zone_id, category_id, status_id, price, quantity, deletion_date ON objects
+    WHEN OLD.deletion_date IS NULL
+    BEGIN
+        {_stats_upsert('OLD', -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_objects_stats_add
+    AFTER UPDATE OF zone_id, category_id, status_id, price, quantity, deletion_date ON objects
+    WHEN NEW.deletion_date IS NULL
+    BEGIN
+        {_stats_upsert('NEW', 1)}
+    END
+    """,
+)
+
+
+def rebuild_inventory_stats(conn):
+    """Recompute inventory_stats from objects (also used by stats.py to repair it)"""
+    conn.execute("DELETE FROM inventory_stats")
+    for dimension, column in STATS_DIMENSIONS:
+        conn.execute(f"""
+            INSERT INTO inventory_stats (dimension, key_id, objects, total_quantity, total_value)
+            SELECT ?, IFNULL({column}, 0), COUNT(*), SUM(IFNULL(quantity, 0)),
+                   SUM(IFNULL(price, 0) * IFNULL(quantity, 0))
+            FROM objects
+            WHERE deletion_date IS NULL
+            GROUP BY IFNULL({column}, 0)
+        """, (dimension,))
+
+
+def _inventory_stats(conn):
+    """Summary table kept up to date by triggers on objects"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_stats (
+            dimension TEXT NOT NULL,
+            key_id INTEGER NOT NULL,
+            objects INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_value REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key_id)
+        ) WITHOUT ROWID
+    """)
+    for sql in STATS_TRIGGERS:
+        conn.execute(sql)
+    rebuild_inventory_stats(conn)
+
+
+## 6 - BUSQUEDA DE TEXTO (FTS5)
+# Indice externo sobre objects(name, description): solo guarda el indice,
+# el texto se lee de objects. Los objetos borrados no estan indexados.
+SEARCH_TOKENIZE = 'unicode61 remove_diacritics 2'
+
+SEARCH_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_objects_fts_insert
+    AFTER INSERT ON objects
+    WHEN NEW.deletion_date IS NULL
+    BEGIN
+        INSERT INTO objects_fts (rowid, name, description)
+        VALUES (NEW.id, NEW.name, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_objects_fts_delete
+    AFTER DELETE ON objects
+    WHEN OLD.deletion_date IS NULL
+    BEGIN
+        INSERT INTO objects_fts (objects_fts, rowid, name, description)
+        VALUES ('delete', OLD.id, OLD.name, OLD.description);
+    END
+    """,
+    # Un solo trigger: primero el 'delete' de OLD y luego el alta de NEW. Con
+    # dos triggers SQLite ejecuta antes el ultimo creado y el indice se rompe
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_objects_fts_update
+    AFTER UPDATE OF name, description, deletion_date ON objects
+    BEGIN
+        INSERT INTO objects_fts (objects_fts, rowid, name, description)
+        SELECT 'delete', OLD.id, OLD.name, OLD.description
+        WHERE OLD.deletion_date IS NULL;
+        INSERT INTO objects_fts (rowid, name, description)
+        SELECT NEW.id, NEW.name, NEW.description
+        WHERE NEW.deletion_date IS NULL;
+    END
+    """,
+)
+
+
+def rebuild_search_index(conn):
+    """Re-index every active object (repairs objects_fts)"""
+    conn.execute("INSERT INTO objects_fts (objects_fts) VALUES ('delete-all')")
+    conn.execute("""
+        INSERT INTO objects_fts (rowid, name, description)
+        SELECT id, name, description FROM objects
+        WHERE deletion_date IS NULL
+    """)
+
+
+def _search_index(conn):
+    """FTS5 index over object names and descriptions, kept in sync by triggers"""
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5 (
+            name, description,
+            content='objects', content_rowid='id',
+            tokenize='{SEARCH_TOKENIZE}',
+            prefix='2 3'
+        )
+    """)
+    for sql in SEARCH_TRIGGERS:
+        conn.execute(sql)
+    rebuild_search_index(conn)
+
+
+## 7 - RESUMEN DIARIO DE action_history
+# Un cubo por (dia, zona, accion, comentario), igual que el GROUP BY que
+# hacia BD.get_history_summary; comment '' = sin comentario.
+MAX_SUMMARY_OBJECTS = 2000  # caracteres de objects_modified por cubo
+
+HISTORY_DAILY_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS trg_action_history_daily
+    AFTER INSERT ON action_history
+    WHEN NEW.zone_id IS NOT NULL AND NEW.object_id IS NOT NULL
+         AND NEW.action_type IS NOT NULL AND DATE(NEW.modification_date) IS NOT NULL
+    BEGIN
+        INSERT INTO action_history_daily (
+            day, zone_id, action_type, comment, change_count, objects_modified,
+            last_modification_date, last_modification_user
+        )
+        SELECT DATE(NEW.modification_date), NEW.zone_id, NEW.action_type,
+               IFNULL(NEW.comment, ''), 1, o.name,
+               NEW.modification_date, NEW.modification_user
+        FROM objects o
+        WHERE o.id = NEW.object_id
+        ON CONFLICT (day, zone_id, action_type, comment) DO UPDATE SET
+            change_count = change_count + 1,
+            objects_modified = CASE
+                WHEN length(objects_modified) < {MAX_SUMMARY_OBJECTS}
+                THEN objects_modified || ',' || excluded.objects_modified
+                ELSE objects_modified END,
+            last_modification_date = MAX(last_modification_date,
+                                         excluded.last_modification_date),
+            last_modification_user = CASE
+                WHEN excluded.last_modification_date >= last_modification_date
+                THEN excluded.last_modification_user
+                ELSE last_modification_user END;
+    END
+"""
+
+
+def _history_daily_rollup(conn):
+    """Daily action_history buckets, updated by a trigger as rows arrive"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS action_history_daily (
+            day TEXT NOT NULL,
+            zone_id INTEGER NOT NULL,
+            action_type TEXT NOT NULL,
+            comment TEXT NOT NULL DEFAULT '',
+            change_count INTEGER NOT NULL DEFAULT 0,
+            objects_modified TEXT,
+            last_modification_date DATETIME,
+            last_modification_user TEXT,
+            PRIMARY KEY (day, zone_id, action_type, comment)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(HISTORY_DAILY_TRIGGER)
+    conn.execute("DELETE FROM action_history_daily")
+    conn.execute(f"""
+        INSERT INTO action_history_daily (
+            day, zone_id, action_type, comment, change_count, objects_modified,
+            last_modification_date, last_modification_user
+        )
+        SELECT DATE(ah.modification_date), ah.zone_id, ah.action_type,
+               IFNULL(ah.comment, ''), COUNT(*),
+               substr(GROUP_CONCAT(o.name), 1, {MAX_SUMMARY_OBJECTS}),
+               MAX(ah.modification_date), ah.modification_user
+        FROM action_history ah
+        JOIN objects o ON ah.object_id = o.id
+        WHERE ah.zone_id IS NOT NULL AND ah.action_type IS NOT NULL
+        AND DATE(ah.modification_date) IS NOT NULL
+        GROUP BY DATE(ah.modification_date), ah.zone_id, ah.action_type,
+                 IFNULL(ah.comment, '')
+    """)
+
+
+## 8 - OPERACIONES MASIVAS (bulk_ops.py)
+def _bulk_operations(conn):
+    """Progress of chunked bulk deletes/restores, and which batch deleted each object"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(objects)")}
+    if 'deletion_batch' not in existing:
+        conn.execute("ALTER TABLE objects ADD COLUMN deletion_batch INTEGER")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_objects_deletion_batch
+        ON objects (deletion_batch, id) WHERE deletion_batch IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_operations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            scope_id INTEGER,
+            undo_of INTEGER REFERENCES bulk_operations (id),
+            state TEXT NOT NULL DEFAULT 'running',
+            total INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            operation_date DATETIME NOT NULL,
+            operation_user TEXT,
+            comment TEXT,
+            finished_date DATETIME,
+            error TEXT
+        )
+    """)
+
+
+## 9 - TRABAJOS EN SEGUNDO PLANO (jobs.py)
+def _jobs(conn):
+    """Background jobs submitted through the web API"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT,
+            state TEXT NOT NULL DEFAULT 'queued',
+            processed INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_user TEXT,
+            created_date DATETIME NOT NULL,
+            started_date DATETIME,
+            finished_date DATETIME
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_active
+        ON jobs (state) WHERE state IN ('queued', 'running')
+    """)
+
+
+## 10 - SECUENCIA DE CAMBIOS (changes.py)
+# tabla -> nombre de la entidad en el feed
+CHANGE_TABLES = {'objects': 'object', 'zones': 'zone',
+                 'categories': 'category', 'statuses': 'status'}
+
+
+def _change_triggers():
+    for table, entity in CHANGE_TABLES.items():
+        # Un objeto borrado logicamente es un 'delete' para el feed
+        op = ("CASE WHEN NEW.deletion_date IS NULL THEN 'upsert' ELSE 'delete' END"
+              if table == 'objects' else "'upsert'")
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            yield f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_changes_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO changes (entity, entity_id, op, change_date)
+                    VALUES ('{entity}', {row}.id,
+                            {"'delete'" if event == 'DELETE' else op},
+                            strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+                END
+            """
+
+
+def _change_feed(conn):
+    """Monotonic sequence of changed rows, written by triggers on every write path"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            change_date DATETIME NOT NULL
+        )
+    """)
+    for sql in _change_triggers():
+        conn.execute(sql)
+
+
+# (version, descripcion, funcion). Anadir siempre al final.
+MIGRATIONS = [
+    (1, "create base tables", _create_base_tables),
+    (2, "reconcile columns across schemas", _reconcile_columns),
+    (3, "keep status and status_id in sync", _status_triggers),
+    (4, "secondary and partial indexes", _create_indexes),
+    (5, "materialized inventory totals", _inventory_stats),
+    (6, "full-text search index", _search_index),
+    (7, "daily action history rollup", _history_daily_rollup),
+    (8, "resumable bulk operations", _bulk_operations),
+    (9, "background jobs", _jobs),
+    (10, "change feed sequence", _change_feed),
+]
+
+
+## VERSION ACTUAL
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+## APLICAR LAS MIGRACIONES PENDIENTES
+def migrate(conn):
+    """
+    Apply every migration newer than the stored schema version.
+
+    Args:
+        conn: Database connection object
+
+    Returns:
+        int: Schema version after migrating
+    """
+    version = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if m[0] > version]
+    if not pending:
+        return version
+
+    # Cada migracion se confirma junto con su numero de version
+    if conn.in_transaction:
+        conn.commit()
+    for number, description, func in pending:
+        try:
+            conn.execute("BEGIN")
+            func(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+            print(f"Applied migration {number}: {description}")
+        except Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            print(f"Migration {number} failed: {e}")
+            raise
+    return number
+
+
+if __name__ == '__main__':
+    import sys
+    from pool import DB_PATH
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    connection = sqlite3.connect(path)
+    print(f"{path}: schema version {migrate(connection)}")
+    connection.close()
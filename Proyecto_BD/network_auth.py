@@ -0,0 +1,145 @@
+"""
+Network authorization for auth_server.py
+Works out the allowed networks once (local subnets plus a configurable CIDR
+allowlist) and answers "is this client allowed?" with a few set lookups.
+"""
+
+import ipaddress
+import os
+import signal
+import threading
+
+try:
+    import netifaces
+except ImportError:  # Sin netifaces solo cuenta AUTH_ALLOWED_NETWORKS
+    netifaces = None
+
+# Configuracion (variables de entorno)
+# AUTH_ALLOWED_NETWORKS: lista de CIDR separados por comas, p. ej. "10.0.0.0/8,192.168.1.0/24"
+ALLOWED_NETWORKS = os.environ.get('AUTH_ALLOWED_NETWORKS', '')
+INCLUDE_LOCAL_SUBNETS = os.environ.get('AUTH_INCLUDE_LOCAL_SUBNETS', '1') == '1'
+REFRESH_SECONDS = float(os.environ.get('AUTH_REFRESH_SECONDS', '300'))
+
+
+## SUBREDES LOCALES
+def local_networks():
+    """Networks of every non-loopback IPv4 interface on this machine"""
+    networks = []
+    if netifaces is None:
+        print("netifaces is not installed: local subnets are not allowed automatically")
+        return networks
+    for interface in netifaces.interfaces():
+        addrs = netifaces.ifaddresses(interface)
+        for addr in addrs.get(netifaces.AF_INET, []):
+            if 'netmask' not in addr:
+                continue
+            network = ipaddress.ip_interface(f"{addr['addr']}/{addr['netmask']}").network
+            if not network.is_loopback:
+                networks.append(network)
+    return networks
+
+
+def parse_networks(text):
+    """Parse a comma separated CIDR list; bad entries are reported and skipped"""
+    networks = []
+    for item in text.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError as e:
+            print(f"Ignoring allowed network '{item}': {e}")
+    return networks
+
+
+## AUTORIZADOR
+class NetworkAuthorizer:
+    """Membership test for client IPs against a set of allowed networks"""
+
+    def __init__(self, allowed=ALLOWED_NETWORKS, include_local=INCLUDE_LOCAL_SUBNETS,
+                 refresh_seconds=REFRESH_SECONDS):
+        self.allowed = parse_networks(allowed) if isinstance(allowed, str) else list(allowed)
+        self.include_local = include_local
+        self.refresh_seconds = refresh_seconds
+        self.networks = []
+        # prefixlen -> set(network address as int), one dict per IP version
+        self._table = {4: {}, 6: {}}
+        self._lock = threading.Lock()
+        self._timer = None
+        self.stats = {'allowed': 0, 'denied': 0, 'refreshes': 0}
+        self.refresh()
+
+    def refresh(self, *args):
+        """Recompute the allowed networks (also usable as a signal handler)"""
+        networks = list(self.allowed)
+        if self.include_local:
+            try:
+                networks.extend(local_networks())
+            except (OSError, ValueError) as e:
+                print(f"Could not read local interfaces: {e}")
+
+        table = {4: {}, 6: {}}
+        for network in networks:
+            prefixes = table[network.version]
+            prefixes.setdefault(network.prefixlen, set()).add(int(network.network_address))
+
+        # Sustituir de golpe: los lectores nunca ven una tabla a medias
+        self.networks = networks
+        self._table = {
+            version: [(self._mask(version, prefixlen), addresses)
+                      for prefixlen, addresses in prefixes.items()]
+            for version, prefixes in table.items()
+        }
+        with self._lock:
+            self.stats['refreshes'] += 1
+
+    @staticmethod
+    def _mask(version, prefixlen):
+        bits = 32 if version == 4 else 128
+        return ((1 << bits) - 1) ^ ((1 << (bits - prefixlen)) - 1)
+
+    def is_allowed(self, client_ip):
+        """True if client_ip is inside any allowed network"""
+        try:
+            address = ipaddress.ip_address(client_ip)
+        except ValueError:
+            address = None
+
+        allowed = False
+        if address is not None:
+            if address.version == 6 and address.ipv4_mapped:
+                address = address.ipv4_mapped
+            value = int(address)
+            # Una busqueda en un set por cada longitud de prefijo distinta
+            for mask, addresses in self._table[address.version]:
+                if value & mask in addresses:
+                    allowed = True
+                    break
+
+        with self._lock:
+            self.stats['allowed' if allowed else 'denied'] += 1
+        return allowed
+
+    def start_auto_refresh(self):
+        """Refresh every refresh_seconds in a background timer"""
+        if self.refresh_seconds <= 0:
+            return
+
+        def tick():
+            self.refresh()
+            self.start_auto_refresh()
+
+        self._timer = threading.Timer(self.refresh_seconds, tick)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop_auto_refresh(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def install_signal_handler(self):
+        """Refresh on SIGHUP where the platform has it (main thread only)"""
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.refresh)
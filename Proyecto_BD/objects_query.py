@@ -0,0 +1,240 @@
+"""
+Inventory Management System - Object Listing
+Keyset (cursor) pagination, filtering and sorting for the objects table,
+and ranked full-text search over the objects_fts index.
+"""
+
+import base64
+import json
+import re
+import sqlite3
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Peso de cada columna de objects_fts en bm25 (name, description)
+SEARCH_WEIGHTS = (10.0, 1.0)
+
+# Columnas por las que se puede ordenar -> expresion SQL.
+# Las expresiones coinciden con los indices parciales de migrations.py
+# para que SQLite los use.
+SORT_COLUMNS = {
+    'id': 'o.id',
+    'name': 'o.name',
+    'price': 'IFNULL(o.price, 0)',
+    'quantity': 'IFNULL(o.quantity, 0)',
+}
+
+## CODIFICAR / DECODIFICAR EL CURSOR
+def encode_cursor(sort_value, object_id):
+    """Opaque cursor pointing just after (sort_value, object_id)"""
+    raw = json.dumps([sort_value, object_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, object_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(object_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+## LEER LOS PARAMETROS DE LA PETICION
+def parse_list_args(args):
+    """
+    Turn query-string arguments into keyword arguments for list_objects.
+    Raises ValueError on bad input.
+    """
+    options = {}
+    for name in ('zone_id', 'category_id'):
+        if args.get(name):
+            options[name] = int(args[name])
+    if args.get('status'):
+        options['status'] = args['status']
+    for name in ('min_price', 'max_price'):
+        if args.get(name):
+            options[name] = float(args[name])
+
+    options['sort'] = args.get('sort', 'id')
+    if options['sort'] not in SORT_COLUMNS:
+        raise ValueError(f"Cannot sort by '{options['sort']}'")
+    options['order'] = args.get('order', 'asc').lower()
+    if options['order'] not in ('asc', 'desc'):
+        raise ValueError("order must be 'asc' or 'desc'")
+
+    limit = int(args.get('limit', DEFAULT_LIMIT))
+    options['limit'] = max(1, min(limit, MAX_LIMIT))
+    if args.get('cursor'):
+        options['cursor'] = args['cursor']
+    return options
+
+
+## LISTAR OBJETOS POR PAGINAS
+def list_objects(conn, zone_id=None, status=None, category_id=None,
+                 min_price=None, max_price=None, sort='id', order='asc',
+                 cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Return one page of non-deleted objects and the page metadata.
+
+    Returns:
+        tuple: (list of rows, dict with limit/count/has_more/next_cursor)
+    """
+    sort_expr = SORT_COLUMNS[sort]
+    where = ["o.deletion_date IS NULL"]
+    params = []
+
+    if zone_id is not None:
+        where.append("o.zone_id = ?")
+        params.append(zone_id)
+    if status is not None:
+        where.append("o.status = ?")
+        params.append(status)
+    if category_id is not None:
+        where.append("o.category_id = ?")
+        params.append(category_id)
+    if min_price is not None:
+        where.append("IFNULL(o.price, 0) >= ?")
+        params.append(min_price)
+    if max_price is not None:
+        where.append("IFNULL(o.price, 0) <= ?")
+        params.append(max_price)
+
+    if cursor:
+        after_value, after_id = decode_cursor(cursor)
+        comparison = '>' if order == 'asc' else '<'
+        if sort == 'id':
+            where.append(f"o.id {comparison} ?")
+            params.append(after_id)
+        else:
+            # Written out (instead of a row-value comparison) so SQLite
+            # can seek the (sort, id) index instead of scanning it
+            bound = '>=' if order == 'asc' else '<='
+            where.append(f"{sort_expr} {bound} ? AND "
+                         f"({sort_expr} {comparison} ? OR o.id {comparison} ?)")
+            params.extend([after_value, after_value, after_id])
+
+    sql = f"""
+        SELECT o.*, z.name as zone_name, {sort_expr} as sort_value
+        FROM objects o
+        LEFT JOIN zones z ON o.zone_id = z.id
+        WHERE {' AND '.join(where)}
+        ORDER BY {sort_expr} {order.upper()}, o.id {order.upper()}
+        LIMIT ?
+    """
+    params.append(limit + 1)
+
+    rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last['sort_value'], last['id'])
+
+    page = {
+        'limit': limit,
+        'count': len(rows),
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'sort': sort,
+        'order': order,
+    }
+    return rows, page
+
+
+## BUSQUEDA DE TEXTO
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+    Quoting each word keeps FTS5 operators in the input from being parsed.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        raise ValueError("Search text must contain at least one word")
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def parse_search_args(args):
+    """Keyword arguments for search_objects from the query string"""
+    options = {'text': args.get('q', '')}
+    if args.get('zone_id'):
+        options['zone_id'] = int(args['zone_id'])
+    limit = int(args.get('limit', DEFAULT_SEARCH_LIMIT))
+    options['limit'] = max(1, min(limit, MAX_SEARCH_LIMIT))
+    return options
+
+
+def search_objects(conn, text, zone_id=None, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Best matches for text among the non-deleted objects, best first.
+
+    Returns:
+        list: rows with the object columns, zone_name, rank and a
+              snippet of the description with the matches in [brackets]
+    """
+    where = ["objects_fts MATCH ?"]
+    params = [build_match_query(text)]
+    if zone_id is not None:
+        where.append("o.zone_id = ?")
+        params.append(zone_id)
+    params.append(limit)
+
+    return conn.execute(f"""
+        SELECT o.*, z.name as zone_name,
+               bm25(objects_fts, {SEARCH_WEIGHTS[0]}, {SEARCH_WEIGHTS[1]}) as rank,
+               snippet(objects_fts, 1, '[', ']', '...', 12) as snippet
+        FROM objects_fts
+        JOIN objects o ON o.id = objects_fts.rowid
+        LEFT JOIN zones z ON o.zone_id = z.id
+        WHERE {' AND '.join(where)}
+        ORDER BY rank
+        LIMIT ?
+    """, params).fetchall()
+
+
+## COMPROBAR EL INDICE DE BUSQUEDA
+def check_search_index(conn):
+    """
+    Compare objects_fts with a fresh index of the active objects, built in
+    temporary tables (FTS5's own integrity-check cannot tell the deleted
+    objects left out on purpose from missing ones).
+
+    Returns:
+        str: what is wrong, or None if the index matches the objects
+    """
+    from migrations import SEARCH_TOKENIZE
+
+    try:
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE temp.objects_fts_check
+            USING fts5 (name, description, tokenize='{SEARCH_TOKENIZE}')
+        """)
+        conn.execute("""
+            INSERT INTO temp.objects_fts_check (rowid, name, description)
+            SELECT id, name, description FROM objects WHERE deletion_date IS NULL
+        """)
+        conn.execute("CREATE VIRTUAL TABLE temp.objects_fts_terms "
+                     "USING fts5vocab(main, objects_fts, 'col')")
+        conn.execute("CREATE VIRTUAL TABLE temp.objects_fts_check_terms "
+                     "USING fts5vocab(temp, objects_fts_check, 'col')")
+        stale, missing = conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM (SELECT term, col, doc, cnt FROM objects_fts_terms
+                                       EXCEPT
+                                       SELECT term, col, doc, cnt FROM objects_fts_check_terms)),
+                (SELECT COUNT(*) FROM (SELECT term, col, doc, cnt FROM objects_fts_check_terms
+                                       EXCEPT
+                                       SELECT term, col, doc, cnt FROM objects_fts_terms))
+        """).fetchone()
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        for table in ('objects_fts_check_terms', 'objects_fts_terms', 'objects_fts_check'):
+            conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+    if stale or missing:
+        return f"{stale} stale and {missing} missing term counts"
+    return None
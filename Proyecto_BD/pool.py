@@ -0,0 +1,181 @@
+"""
+Inventory Management System - Connection Pool
+Shared pool of long-lived SQLite connections for the web API and BD.py.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from storage import configure_connection
+from metrics import connection_factory
+
+# Configuracion (se puede cambiar con variables de entorno)
+DB_PATH = os.environ.get('INVENTORY_DB', 'inventory.db')
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the pool timeout"""
+
+
+## POOL DE CONEXIONES
+class ConnectionPool:
+    """Bounded pool of SQLite connections shared between threads"""
+
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'replaced': 0,
+        }
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               factory=connection_factory())
+        conn.row_factory = sqlite3.Row
+        return configure_connection(conn)
+
+    def _is_healthy(self, conn):
+        """Cheap liveness check before handing a connection out"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return not conn.in_transaction
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if there is room"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                with self._lock:
+                    self._stats['waits'] += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout}s")
+
+        if not self._is_healthy(conn):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            conn = self._connect()
+            with self._lock:
+                self._stats['replaced'] += 1
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding uncommitted work"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put_nowait(conn)
+
+    def connection(self):
+        """Context manager: with pool.connection() as conn: ..."""
+        return _PooledConnection(self)
+
+    def stats(self):
+        """Current pool counters"""
+        with self._lock:
+            result = dict(self._stats)
+            result['size'] = self.size
+            result['open'] = self._created
+        result['idle'] = self._idle.qsize()
+        result['in_use'] = result['open'] - result['idle']
+        return result
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class _PooledConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.conn)
+        self.conn = None
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+## OBTENER EL POOL COMPARTIDO
+def get_pool():
+    """Return the process-wide pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+## CONEXION POR PETICION (FLASK)
+def get_db():
+    """Get the pooled connection bound to the current Flask app context"""
+    from flask import g
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(e=None):
+    """Give the request connection back to the pool"""
+    from flask import g
+    db = g.pop('db', None)
+    if db is not None:
+        get_pool().release(db)
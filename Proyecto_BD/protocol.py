@@ -0,0 +1,139 @@
+"""
+Wire protocol shared by auth_server.py and client.py
+
+Every message is a frame:
+
+    magic (4 bytes, b'INVP') | version (1) | type (1) | length (4, big endian) | payload
+
+A session authenticates once (AUTH) and then sends any number of OBJECT
+(validate one object) or BATCH (validate and store a whole document)
+frames without waiting; the server answers each one with a RESULT frame,
+in the same order. Clients that send plain "user:password" text are still
+served by the old one-object-per-connection exchange.
+"""
+
+import asyncio
+import json
+import struct
+
+MAGIC = b'INVP'
+VERSION = 1
+HEADER = struct.Struct('!4sBBI')
+MAX_PAYLOAD = 16 * 1024 * 1024
+
+# Tipos de trama
+AUTH = 1        # cliente -> servidor: b"usuario:contrasena"
+AUTH_OK = 2     # servidor -> cliente
+AUTH_FAIL = 3   # servidor -> cliente: motivo en texto
+OBJECT = 4      # cliente -> servidor: XML de un objeto
+RESULT = 5      # servidor -> cliente: JSON {"seq": n, ...resultado}
+CLOSE = 6       # cualquiera de los dos: fin de la sesion
+ERROR = 7       # servidor -> cliente: error de protocolo en texto
+BATCH = 8       # cliente -> servidor: documento <database> completo a guardar
+
+
+class ProtocolError(Exception):
+    """Malformed, oversized or unexpected frame"""
+
+
+## CODIFICAR UNA TRAMA
+def encode_frame(frame_type, payload=b''):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"Payload too large ({len(payload)} bytes)")
+    return HEADER.pack(MAGIC, VERSION, frame_type, len(payload)) + payload
+
+
+def decode_header(header):
+    """Return (type, length) or raise ProtocolError"""
+    magic, version, frame_type, length = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ProtocolError("Bad frame magic")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"Frame too large ({length} bytes)")
+    return frame_type, length
+
+
+def encode_result(seq, result):
+    """RESULT frame: {"valid": bool} for OBJECT, the ingestion report for BATCH"""
+    return encode_frame(RESULT, json.dumps({'seq': seq, **result}))
+
+
+def is_framed(data):
+    """
+    True if the first bytes received start a framed session. Needs at least
+    len(MAGIC) bytes (see read_preamble) to tell a short read apart.
+    """
+    return data[:len(MAGIC)] == MAGIC
+
+
+def could_be_framed(data):
+    """True while data is too short to decide and still matches MAGIC so far"""
+    return len(data) < len(MAGIC) and MAGIC.startswith(data)
+
+
+async def read_preamble(reader, timeout, size=1024):
+    """
+    First bytes of a connection, read until is_framed can decide: at least
+    len(MAGIC) bytes, EOF, or bytes that already differ from MAGIC (an old
+    text client that sent a short message and is waiting for the answer).
+    """
+    data = b''
+    while could_be_framed(data):
+        chunk = await asyncio.wait_for(reader.read(size), timeout)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+## LECTURA ASINCRONA (SERVIDOR)
+class FrameReader:
+    """Reads frames from an asyncio StreamReader, starting with bytes already read"""
+
+    def __init__(self, reader, initial=b''):
+        self.reader = reader
+        self.buffer = bytearray(initial)
+
+    async def _read_exactly(self, size):
+        while len(self.buffer) < size:
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                raise ConnectionError("Connection closed mid-frame")
+            self.buffer += chunk
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def read_frame(self):
+        """Return (type, payload); raises ConnectionError on clean EOF"""
+        if not self.buffer:
+            chunk = await self.reader.read(65536)
+            if not chunk:
+                raise ConnectionError("Connection closed")
+            self.buffer += chunk
+        frame_type, length = decode_header(await self._read_exactly(HEADER.size))
+        return frame_type, await self._read_exactly(length)
+
+
+## LECTURA / ESCRITURA CON SOCKETS (CLIENTE)
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed mid-frame")
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock):
+    frame_type, length = decode_header(_recv_exactly(sock, HEADER.size))
+    return frame_type, _recv_exactly(sock, length)
+
+
+def send_frame(sock, frame_type, payload=b''):
+    sock.sendall(encode_frame(frame_type, payload))
@@ -0,0 +1,181 @@
+"""
+Inventory Management System - Slow Query Log
+Watches every statement run on an instrumented connection (see metrics.py)
+and appends the ones slower than SLOW_QUERY_MS to a JSON-lines file, with
+the shape of their parameters, their EXPLAIN QUERY PLAN and how many times
+the statement had run so far. `python cli.py slow-queries` summarizes the
+file and flags the plans that scan the whole objects or history table.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import metrics
+from logs import get_logger
+
+log = get_logger('querylog')
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'slow_queries.jsonl')
+# Tablas grandes en las que un SCAN completo es un problema
+SCAN_TABLES = ('objects', 'history')
+# Sentencias distintas que se cuentan (las demas solo se miden)
+MAX_TRACKED = 5000
+
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_runs = {}
+_plans = {}
+_lock = threading.Lock()
+_installed = False
+
+
+def _normalize(sql):
+    return ' '.join(sql.split())
+
+
+def parameter_shape(parameters):
+    """Types of the bound parameters, not their values: [int, str] or {name: type}"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    shape = [type(value).__name__ for value in list(parameters)[:20]]
+    if len(parameters) > 20:
+        shape.append(f"... {len(parameters)} total")
+    return shape
+
+
+def explain(conn, sql, parameters=()):
+    """EXPLAIN QUERY PLAN detail lines for sql, or None if it cannot be explained"""
+    if metrics.statement_kind(sql) not in EXPLAINABLE or parameters is None:
+        return None
+    try:
+        # Cursor normal: el EXPLAIN no debe medirse ni registrarse a si mismo
+        rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[3] for row in rows]
+
+
+## OBSERVADOR
+def _observe(conn, sql, parameters, seconds):
+    with _lock:
+        runs = _runs.get(sql)
+        if runs is not None or len(_runs) < MAX_TRACKED:
+            runs = _runs[sql] = (runs or 0) + 1
+    if seconds * 1000 < SLOW_QUERY_MS:
+        return
+
+    key = _normalize(sql)
+    with _lock:
+        cached = key in _plans
+        plan = _plans.get(key)
+    if not cached:
+        # EXPLAIN fuera del cerrojo; si dos hilos lo calculan a la vez gana el primero
+        plan = explain(conn, sql, parameters)
+        with _lock:
+            if key in _plans or len(_plans) < MAX_TRACKED:
+                plan = _plans.setdefault(key, plan)
+    entry = {
+        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'ms': round(seconds * 1000, 2),
+        'sql': key,
+        'params': parameter_shape(parameters),
+        'plan': plan,
+        'runs': runs,
+    }
+    try:
+        with _lock, open(SLOW_QUERY_LOG, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        log.warning("Could not write the slow query log: %s", e)
+
+
+def install():
+    """Start logging slow statements (once per process; SLOW_QUERY_MS < 0 disables it)"""
+    global _installed
+    with _lock:
+        if _installed or SLOW_QUERY_MS < 0:
+            return
+        _installed = True
+    metrics.add_sql_observer(_observe)
+
+
+def run_counts():
+    """{statement: times run} for this process"""
+    with _lock:
+        return dict(_runs)
+
+
+## INFORME
+_ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NOT_ALIAS = {'where', 'join', 'left', 'inner', 'cross', 'on', 'order', 'group',
+              'limit', 'using', 'natural', 'set', 'values', 'union', 'having'}
+
+
+def table_aliases(sql):
+    """{name used in the plan: table} for the tables in FROM / JOIN"""
+    aliases = {}
+    for table, alias in _ALIAS.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _NOT_ALIAS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+
+def full_scans(sql, plan, tables=SCAN_TABLES):
+    """
+    Plan lines that read every row of one of tables: a plain SCAN, or a
+    SCAN through an index when no LIMIT stops the walk early.
+    """
+    if not plan:
+        return []
+    aliases = table_aliases(sql)
+    limited = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) is not None
+    found = []
+    for detail in plan:
+        match = re.match(r'SCAN (\w+)', detail)
+        if not match or 'VIRTUAL TABLE' in detail:
+            continue
+        if limited and 'USING INDEX' in detail:
+            continue
+        table = aliases.get(match.group(1).lower(), match.group(1).lower())
+        if table in tables:
+            found.append(f"{table}: {detail}")
+    return found
+
+
+def read_log(path=SLOW_QUERY_LOG):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def summarize(entries):
+    """Group log entries by statement, slowest total first"""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry['sql'])
+        if group is None:
+            group = groups[entry['sql']] = {
+                'sql': entry['sql'], 'slow': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'runs': 0, 'params': entry.get('params'), 'plan': entry.get('plan'),
+                'last': entry['date'],
+            }
+        group['slow'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        group['runs'] = max(group['runs'], entry.get('runs') or 0)
+        group['plan'] = entry.get('plan') or group['plan']
+        group['last'] = max(group['last'], entry['date'])
+    for group in groups.values():
+        group['total_ms'] = round(group['total_ms'], 2)
+        group['full_scans'] = full_scans(group['sql'], group['plan'])
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
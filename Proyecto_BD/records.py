@@ -0,0 +1,102 @@
+"""
+Inventory Management System - Row Records
+Typed rows for the data layer. Every record is a namedtuple: named fields,
+no per-row __dict__, and built straight from the tuples sqlite3 returns
+(tuple.__new__ through functools.partial, so no Python call per row).
+Records are still tuples, so code that reads row[0], row[1] keeps working.
+
+For the API, to_json writes {"columns": [...], "items": [[...], ...]}: the
+json encoder writes each record as an array without building a dict for
+it. as_dicts gives the usual list of objects when a caller needs one.
+"""
+
+import json
+from collections import namedtuple
+from functools import partial
+
+
+class Zone(namedtuple('Zone', 'id name')):
+    __slots__ = ()
+
+
+class Category(namedtuple('Category', 'id name description')):
+    __slots__ = ()
+
+
+class Status(namedtuple('Status', 'id name description')):
+    __slots__ = ()
+
+
+# Mismo orden que las tuplas que devolvia get_all_objects; zone_name solo
+# lo rellenan las consultas que hacen JOIN con zones
+class Object(namedtuple('Object', 'id name description price quantity category_id '
+                                  'zone_id status_id status zone_name')):
+    __slots__ = ()
+
+
+# Mismo orden que las tuplas que devolvia list_zone_items; todas salen del
+# indice idx_objects_active_zone_cover salvo status (JOIN con statuses)
+class ZoneItem(namedtuple('ZoneItem', 'id name description price quantity status')):
+    __slots__ = ()
+
+
+# Columnas de history (history_store.HISTORY_COLUMNS) + zona y si viene de un archivo
+class HistoryEntry(namedtuple('HistoryEntry', 'id object_id zone_id action_type '
+                                              'field_modified old_value new_value '
+                                              'modification_date modification_user '
+                                              'comment zone_name archived')):
+    __slots__ = ()
+
+
+_MAKERS = {cls: partial(tuple.__new__, cls)
+           for cls in (Zone, Category, Status, Object, ZoneItem, HistoryEntry)}
+
+
+## CONSTRUIR LOS REGISTROS
+def select_list(cls, alias=None, **expressions):
+    """
+    SELECT column list in the field order of cls.
+
+    Args:
+        alias: Table alias put in front of every plain column ('o' -> o.name)
+        expressions: SQL for fields that are not plain columns,
+                     e.g. status='s.name' or zone_name='NULL'
+    """
+    prefix = f"{alias}." if alias else ''
+    columns = []
+    for field in cls._fields:
+        if field in expressions:
+            columns.append(f"{expressions[field]} AS {field}")
+        else:
+            columns.append(f"{prefix}{field}")
+    return ', '.join(columns)
+
+
+def make(cls, rows):
+    """Records of cls from an iterable of tuples in field order"""
+    return list(map(_MAKERS[cls], rows))
+
+
+def fetch_all(conn, cls, sql, params=()):
+    """Run a query that selects select_list(cls) and return its rows as cls records"""
+    cursor = conn.cursor()
+    # Tuplas simples aunque la conexion use sqlite3.Row
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    return make(cls, cursor.fetchall())
+
+
+## SALIDA
+def to_json(records, columns=None, **extra):
+    """
+    Compact JSON: {"columns": [...], "items": [[...], ...], **extra}.
+    columns defaults to the fields of the records.
+    """
+    if columns is None:
+        columns = records[0]._fields if records else ()
+    return json.dumps({'columns': list(columns), 'items': records, **extra},
+                      separators=(',', ':'), default=str)
+
+
+def as_dicts(records):
+    return [record._asdict() for record in records]
@@ -1,3 +1,6 @@
+-- Tables are recreated, so migrations.py must run again afterwards
+PRAGMA user_version = 0;
+
 DROP TABLE IF EXISTS objects;
 DROP TABLE IF EXISTS zones;
 DROP TABLE IF EXISTS categories;
@@ -7,6 +7,17 @@ let statuses = [];
 let zonesCache = null;
 let objectsCache = null;
 
+// Pagination state for the objects table
+let objectsCursor = null;
+let objectsFilters = {};
+
+// Pagination state for the history table
+let historyCursor = null;
+
+// Full-text search state (empty = normal paginated listing)
+let objectsSearch = '';
+let searchTimer = null;
+
 // Initialize when page loads
 document.addEventListener('DOMContentLoaded', async function() {
     try {
@@ -23,6 +34,7 @@ document.addEventListener('DOMContentLoaded', async function() {
         
         // Load objects after loading the supporting data
         await loadObjects();
+        startChangeFeed();
         
     } catch (error) {
         console.error('Error loading initial data:', error);
@@ -46,11 +58,28 @@ async function fetchAPI(endpoint, method = 'GET', data = null) {
 }
 
 // Data Loading Functions
-async function loadObjects() {
+// Loads the first page of objects; pass append=true to load the next page
+async function loadObjects(append = false) {
     try {
-        const response = await fetch('/api/objects');
+        const params = new URLSearchParams(objectsFilters);
+        let url = `/api/objects?${params}`;
+        if (objectsSearch) {
+            // Search results are ranked, not paginated
+            params.set('q', objectsSearch);
+            url = `/api/objects/search?${params}`;
+        } else {
+            if (append && objectsCursor) {
+                params.set('cursor', objectsCursor);
+            }
+            // Compact listing: column names once, one array per object
+            params.set('shape', 'rows');
+            url = `/api/objects?${params}`;
+        }
+        const response = await fetch(url);
         if (!response.ok) throw new Error('Failed to fetch objects');
-        const objects = await response.json();
+        const data = await response.json();
+        const objects = data.columns ? rowsToObjects(data.columns, data.items) : data.items;
+        objectsCursor = objectsSearch ? null : data.page.next_cursor;
         
         const tableBody = document.querySelector('#objectsTable tbody');
         if (!tableBody) {
@@ -58,41 +87,136 @@ async function loadObjects() {
             return;
         }
         
-        tableBody.innerHTML = '';
+        if (!append) {
+            tableBody.innerHTML = '';
+        }
         
-        if (objects.length === 0) {
+        if (objects.length === 0 && !append) {
             tableBody.innerHTML = '<tr><td colspan="9" class="text-center">No objects found</td></tr>';
+            updateLoadMoreButton();
             return;
         }
         
-        objects.forEach(obj => {
-            const row = document.createElement('tr');
-            row.innerHTML = `
-                <td>${obj.id}</td>
-                <td>${obj.name}</td>
-                <td>${obj.description || ''}</td>
-                <td>${obj.zone_name || ''}</td>
-                <td>${obj.category || ''}</td>
-                <td>${obj.price || 0}</td>
-                <td>${obj.quantity || 0}</td>
-                <td>${obj.status || 'Available'}</td>
-                <td>
-                    <button class="btn btn-primary btn-sm" onclick="editObject(${obj.id})">
-                        <i class="fas fa-edit"></i> Edit
-                    </button>
-                    <button class="btn btn-danger btn-sm" onclick="deleteObject(${obj.id})">
-                        <i class="fas fa-trash"></i> Delete
-                    </button>
-                </td>
-            `;
-            tableBody.appendChild(row);
-        });
+        objects.forEach(obj => tableBody.appendChild(renderObjectRow(obj)));
+        updateLoadMoreButton();
     } catch (error) {
         console.error('Error loading objects:', error);
         showAlert('Error loading objects: ' + error.message, 'danger');
     }
 }
 
+function rowsToObjects(columns, rows) {
+    return rows.map(row => {
+        const obj = {};
+        columns.forEach((column, i) => { obj[column] = row[i]; });
+        return obj;
+    });
+}
+
+function renderObjectRow(obj) {
+    const row = document.createElement('tr');
+    row.dataset.objectId = obj.id;
+    row.innerHTML = `
+        <td>${obj.id}</td>
+        <td>${obj.name}</td>
+        <td>${obj.description || ''}</td>
+        <td>${obj.zone_name || ''}</td>
+        <td>${obj.category || ''}</td>
+        <td>${obj.price || 0}</td>
+        <td>${obj.quantity || 0}</td>
+        <td>${obj.status || 'Available'}</td>
+        <td>
+            <button class="btn btn-primary btn-sm" onclick="editObject(${obj.id})">
+                <i class="fas fa-edit"></i> Edit
+            </button>
+            <button class="btn btn-danger btn-sm" onclick="deleteObject(${obj.id})">
+                <i class="fas fa-trash"></i> Delete
+            </button>
+        </td>
+    `;
+    return row;
+}
+
+// Change feed: apply other writers' changes as small deltas instead of refetching
+let changeFeed = null;
+let changeFeedConnected = false;
+
+function startChangeFeed() {
+    if (!window.EventSource || changeFeed) return;
+    changeFeed = new EventSource('/api/changes');
+    changeFeed.addEventListener('hello', () => { changeFeedConnected = true; });
+    changeFeed.addEventListener('changes', event => {
+        JSON.parse(event.data).changes.forEach(applyChange);
+    });
+    // Too far behind: reload everything
+    changeFeed.addEventListener('reset', () => {
+        objectsCursor = null;
+        loadObjects();
+        loadZones();
+    });
+    // The browser reconnects by itself (sending Last-Event-ID)
+    changeFeed.onerror = () => { changeFeedConnected = false; };
+}
+
+function applyChange(change) {
+    if (change.entity === 'zone') {
+        loadZones();
+        return;
+    }
+    if (change.entity !== 'object') return;
+
+    const tableBody = document.querySelector('#objectsTable tbody');
+    if (!tableBody) return;
+    const existing = tableBody.querySelector(`tr[data-object-id="${change.id}"]`);
+    if (change.op === 'delete') {
+        if (existing) existing.remove();
+    } else if (existing) {
+        existing.replaceWith(renderObjectRow(change.data));
+    } else if (!objectsSearch && !objectsCursor && Object.keys(objectsFilters).length === 0) {
+        // New rows only fit an unfiltered list that is fully loaded
+        const empty = tableBody.querySelector('td[colspan]');
+        if (empty) tableBody.innerHTML = '';
+        tableBody.appendChild(renderObjectRow(change.data));
+    }
+}
+
+// After a change made from this page: the feed brings it unless it is down
+function refreshObjects() {
+    return changeFeedConnected ? Promise.resolve() : loadObjects();
+}
+
+function refreshZones() {
+    return changeFeedConnected ? Promise.resolve() : loadZones();
+}
+
+function loadMoreObjects() {
+    return loadObjects(true);
+}
+
+// Apply filters/sorting (zone_id, status, category_id, min_price, max_price, sort, order)
+function filterObjects(filters) {
+    objectsFilters = filters || {};
+    objectsCursor = null;
+    return loadObjects();
+}
+
+// Search names and descriptions on the server, waiting for the user to stop typing
+function searchObjects(text) {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => {
+        objectsSearch = text.trim();
+        objectsCursor = null;
+        loadObjects();
+    }, 250);
+}
+
+function updateLoadMoreButton() {
+    const button = document.getElementById('loadMoreObjectsBtn');
+    if (button) {
+        button.style.display = objectsCursor ? '' : 'none';
+    }
+}
+
 async function loadZones() {
     try {
         const response = await fetch('/api/zones');
@@ -362,7 +486,7 @@ async function addObject() {
                 throw new Error(error.error || 'Failed to add object');
             }
 
-            await loadObjects();
+            await refreshObjects();
             showAlert('Object added successfully', 'success');
         }
     } catch (error) {
@@ -430,7 +554,7 @@ async function deleteObject(objectId) {
         }
 
         clearCache();
-        await loadObjects();
+        await refreshObjects();
         showAlert('Object deleted successfully', 'success');
     } catch (error) {
         console.error('Error:', error);
@@ -496,7 +620,7 @@ async function deleteZone(zoneId) {
             });
         }
 
-        await loadZones();
+        await refreshZones();
         showAlert('Zone deleted successfully', 'success');
     } catch (error) {
         console.error('Error:', error);
@@ -515,6 +639,54 @@ function showAlert(message, type) {
     document.querySelector('.container').insertBefore(alertDiv, document.querySelector('.container').firstChild);
 }
 
+// Follow a background job (bulk deletes, restores) until it finishes.
+// Shows one progress alert that is updated in place; resolves with the job.
+async function followJob(jobId, label) {
+    const alertDiv = document.createElement('div');
+    alertDiv.className = 'alert alert-info';
+    document.querySelector('.container').insertBefore(alertDiv, document.querySelector('.container').firstChild);
+
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const job = await response.json();
+        if (!response.ok) {
+            alertDiv.remove();
+            throw new Error(job.error || 'Failed to read job status');
+        }
+        const total = job.total != null ? `/${job.total}` : '';
+        alertDiv.innerHTML = `
+            ${label}: ${job.processed}${total} objects (${job.state})
+            <button class="btn btn-sm btn-outline-secondary ms-2" onclick="cancelJob(${job.id})">Cancel</button>
+        `;
+        if (['done', 'failed', 'cancelled'].includes(job.state)) {
+            alertDiv.remove();
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+async function cancelJob(jobId) {
+    await fetch(`/api/jobs/${jobId}/cancel`, { method: 'POST' });
+}
+
+// Wait for the job started by a 202 response and report how it ended
+async function finishBulkJob(response, label) {
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || `${label} failed`);
+    }
+    const job = await followJob(data.job_id, label);
+    await refreshObjects();
+    if (job.state === 'done') {
+        showAlert(`${label}: ${job.result.processed} objects (bulk operation #${job.result.id})`, 'success');
+    } else if (job.state === 'cancelled') {
+        showAlert(`${label} cancelled after ${job.processed} objects; it can be resumed or undone`, 'warning');
+    } else {
+        throw new Error(job.error || `${label} failed`);
+    }
+}
+
 function populateDropdowns() {
     console.log('Populating dropdowns');
     console.log('Zones:', zones);
@@ -603,7 +775,7 @@ async function addZone(event) {
         form.reset();
         const modal = bootstrap.Modal.getInstance(document.getElementById('addZoneModal'));
         modal.hide();
-        await loadZones();
+        await refreshZones();
         showAlert('Zone added successfully', 'success');
     } catch (error) {
         console.error('Error:', error);
@@ -644,44 +816,70 @@ function addZoneModalHtml() {
     }
 }
 
+// PATCH /api/objects/<id> with the new values. Errors carry the HTTP status:
+// 404/409 = the object no longer exists, 422 = a field or value was rejected
+async function patchObject(objectId, updates, comment = null, user = null) {
+    const body = { updates, comment: comment || null };
+    if (user) {
+        body.user = user;
+    }
+    const response = await fetch(`/api/objects/${objectId}`, {
+        method: 'PATCH',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body)
+    });
+    const result = await response.json().catch(() => ({}));
+    if (!response.ok) {
+        const error = new Error(result.error || `HTTP error! status: ${response.status}`);
+        error.status = response.status;
+        throw error;
+    }
+    return result;
+}
+
+function showUpdateError(error) {
+    if (error.status === 404 || error.status === 409) {
+        // Borrado por otro usuario: quitarlo de la tabla
+        showAlert('The object no longer exists: ' + error.message, 'warning');
+        refreshObjects();
+    } else if (error.status === 422) {
+        showAlert('Invalid value: ' + error.message, 'warning');
+    } else {
+        showAlert('Error updating object: ' + error.message, 'danger');
+    }
+}
+
 // Function to update object
 async function updateObject(event) {
     event.preventDefault();
     const form = event.target;
     const objectId = form.dataset.objectId;
     
-    const data = {
-        updates: {
-            name: form.name.value,
-            description: form.description.value,
-            price: parseFloat(form.price.value),
-            quantity: parseInt(form.quantity.value),
-            category_id: parseInt(form.category.value),
-            zone_id: parseInt(form.zone.value),
-            status_id: parseInt(form.status.value)
-        },
-        modification_user: 'web_user'
+    const updates = {
+        name: form.name.value,
+        description: form.description.value,
+        price: parseFloat(form.price.value),
+        quantity: parseInt(form.quantity.value),
+        category_id: parseInt(form.category.value),
+        zone_id: parseInt(form.zone.value),
+        status_id: parseInt(form.status.value)
     };
+    const comment = form.comment ? form.comment.value : null;
     
     try {
-        const response = await fetch(`/api/objects/${objectId}`, {
-            method: 'PUT',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(data)
-        });
-
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        await loadObjects();
+        await patchObject(objectId, updates, comment, 'web_user');
+        await refreshObjects();
         bootstrap.Modal.getInstance(document.getElementById('editObjectModal')).hide();
         showAlert('Object updated successfully', 'success');
     } catch (error) {
         console.error('Error:', error);
-        showAlert('Error updating object: ' + error.message, 'danger');
+        // 422: el formulario sigue abierto para corregir el valor
+        if (error.status !== 422) {
+            bootstrap.Modal.getInstance(document.getElementById('editObjectModal')).hide();
+        }
+        showUpdateError(error);
     }
 }
 
@@ -853,16 +1051,25 @@ async function addHistoryEntry(objectId, actionType, comment) {
 // Call loadZones when the page loads
 document.addEventListener('DOMContentLoaded', loadZones); 
 
-async function loadHistory() {
+// Loads the latest history page; pass append=true to load older entries
+async function loadHistory(append = false) {
     try {
-        const response = await fetch('/api/history');
+        const params = new URLSearchParams();
+        if (append && historyCursor) {
+            params.set('cursor', historyCursor);
+        }
+        const response = await fetch(`/api/history?${params}`);
         if (!response.ok) throw new Error('Failed to fetch history');
-        const history = await response.json();
+        const data = await response.json();
+        const history = data.items;
+        historyCursor = data.page.next_cursor;
         
         const tableBody = document.querySelector('#historyTable tbody');
         if (!tableBody) return;
         
-        tableBody.innerHTML = '';
+        if (!append) {
+            tableBody.innerHTML = '';
+        }
         history.forEach(entry => {
             const row = document.createElement('tr');
             const date = new Date(entry.modification_date).toLocaleString();
@@ -874,6 +1081,10 @@ async function loadHistory() {
             `;
             tableBody.appendChild(row);
         });
+        const button = document.getElementById('loadMoreHistoryBtn');
+        if (button) {
+            button.style.display = historyCursor ? '' : 'none';
+        }
     } catch (error) {
         console.error('Error:', error);
         showAlert('Error loading history', 'danger');
@@ -926,11 +1137,6 @@ async function deleteZoneObjects() {
         });
 
         if (formValues) {
-            console.log('Sending data:', {  // Debug log
-                password: formValues.password,
-                comment: formValues.comment
-            });
-            
             const response = await fetch(`/api/zones/${formValues.zoneId}/objects`, {
                 method: 'DELETE',
                 headers: {
@@ -942,13 +1148,7 @@ async function deleteZoneObjects() {
                 })
             });
 
-            if (!response.ok) {
-                const error = await response.json();
-                throw new Error(error.error || 'Failed to delete zone objects');
-            }
-
-            await loadObjects();
-            showAlert('Zone objects deleted successfully', 'success');
+            await finishBulkJob(response, 'Deleting zone objects');
         }
     } catch (error) {
         console.error('Error:', error);
@@ -989,14 +1189,59 @@ async function deleteAllObjects() {
                     body: JSON.stringify({ password })
                 });
 
-                if (!response.ok) {
-                    const error = await response.json();
-                    throw new Error(error.error || 'Failed to delete all objects');
-                }
+                await finishBulkJob(response, 'Deleting all objects');
+            }
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        showAlert('Error: ' + error.message, 'danger');
+    }
+}
 
-                showAlert('All objects deleted successfully', 'success');
-                loadObjects();
+// Soft delete every object of a category/status (background job, undoable)
+async function bulkDeleteBy(label, endpoint, items) {
+    try {
+        const { value: formValues } = await Swal.fire({
+            title: `Delete ${label} Objects`,
+            html: `
+                <select id="bulkSelect" class="form-control mb-3">
+                    <option value="">Select a ${label.toLowerCase()}</option>
+                    ${items.map(i => `<option value="${i.id}">${i.name}</option>`).join('')}
+                </select>
+                <input id="comment" class="form-control mb-3" placeholder="Add a comment (optional)">
+                <input id="password" type="password" class="form-control" placeholder="Enter admin password">
+            `,
+            focusConfirm: false,
+            showCancelButton: true,
+            confirmButtonText: 'Delete',
+            preConfirm: () => {
+                const id = document.getElementById('bulkSelect').value;
+                const comment = document.getElementById('comment').value;
+                const password = document.getElementById('password').value;
+                if (!id) {
+                    Swal.showValidationMessage(`Please select a ${label.toLowerCase()}`);
+                    return false;
+                }
+                if (!password) {
+                    Swal.showValidationMessage('Please enter the password');
+                    return false;
+                }
+                return { id, comment, password };
             }
+        });
+
+        if (formValues) {
+            const response = await fetch(`/api/${endpoint}/${formValues.id}/objects`, {
+                method: 'DELETE',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    password: formValues.password,
+                    comment: formValues.comment
+                })
+            });
+            await finishBulkJob(response, `Deleting ${label.toLowerCase()} objects`);
         }
     } catch (error) {
         console.error('Error:', error);
@@ -1004,13 +1249,14 @@ async function deleteAllObjects() {
     }
 }
 
-// Similar implementations for deleteCategoryObjects and deleteStatusObjects
 async function deleteCategoryObjects() {
-    // Implementation similar to deleteZoneObjects but with categories
+    const categories = await fetch('/api/categories').then(r => r.json());
+    return bulkDeleteBy('Category', 'categories', categories);
 }
 
 async function deleteStatusObjects() {
-    // Implementation similar to deleteZoneObjects but with statuses
+    const statuses = await fetch('/api/statuses').then(r => r.json());
+    return bulkDeleteBy('Status', 'statuses', statuses);
 }
 
 // Update tab handling to include bulk operations
@@ -1131,6 +1377,10 @@ async function editObject(objectId) {
                             <option value="Maintenance" ${object.status === 'Maintenance' ? 'selected' : ''}>Maintenance</option>
                         </select>
                     </div>
+                    <div class="mb-3">
+                        <label class="form-label">Comment</label>
+                        <input type="text" class="form-control" id="editComment" placeholder="Add a comment (optional)">
+                    </div>
                 </form>
             `,
             focusConfirm: false,
@@ -1138,37 +1388,27 @@ async function editObject(objectId) {
             confirmButtonText: 'Save',
             preConfirm: () => {
                 return {
-                    name: document.getElementById('editName').value,
-                    description: document.getElementById('editDescription').value,
-                    zone_id: parseInt(document.getElementById('editZone').value),
-                    price: parseFloat(document.getElementById('editPrice').value),
-                    quantity: parseInt(document.getElementById('editQuantity').value),
-                    status: document.getElementById('editStatus').value
+                    updates: {
+                        name: document.getElementById('editName').value,
+                        description: document.getElementById('editDescription').value,
+                        zone_id: parseInt(document.getElementById('editZone').value),
+                        price: parseFloat(document.getElementById('editPrice').value),
+                        quantity: parseInt(document.getElementById('editQuantity').value),
+                        status: document.getElementById('editStatus').value
+                    },
+                    comment: document.getElementById('editComment').value
                 };
             }
         });
 
         if (formValues) {
-            console.log('Sending update:', formValues); // Debug log
-            const updateResponse = await fetch(`/api/objects/${objectId}`, {
-                method: 'PUT',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(formValues)
-            });
-
-            if (!updateResponse.ok) {
-                const errorData = await updateResponse.json();
-                throw new Error(errorData.error || 'Failed to update object');
-            }
-
-            await loadObjects();
+            await patchObject(objectId, formValues.updates, formValues.comment);
+            await refreshObjects();
             showAlert('Object updated successfully', 'success');
         }
     } catch (error) {
         console.error('Error:', error);
-        showAlert('Error updating object: ' + error.message, 'danger');
+        showUpdateError(error);
     }
 } 
 
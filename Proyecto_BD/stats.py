@@ -0,0 +1,100 @@
+"""
+Inventory Management System - Inventory Totals
+Reads the inventory_stats summary table (migration 5). Triggers on objects
+keep it current, so the totals per zone, category and status cost a
+lookup of a few rows instead of a scan of the whole inventory.
+"""
+
+from migrations import STATS_DIMENSIONS, rebuild_inventory_stats
+
+# dimension -> (tabla de nombres, clave en la respuesta)
+DIMENSION_TABLES = {
+    'zone': ('zones', 'zones'),
+    'category': ('categories', 'categories'),
+    'status': ('statuses', 'statuses'),
+}
+
+
+## LEER LOS TOTALES
+def get_stats(conn):
+    """
+    Totals of active objects per zone, category and status.
+
+    Returns:
+        dict: {'totals': {...}, 'zones': [...], 'categories': [...], 'statuses': [...]}
+              each entry has id, name, objects, total_quantity and total_value
+              (id None groups the objects without a zone/category/status)
+    """
+    result = {}
+    for dimension, _ in STATS_DIMENSIONS:
+        table, key = DIMENSION_TABLES[dimension]
+        rows = conn.execute(f"""
+            SELECT s.key_id, t.name, s.objects, s.total_quantity, s.total_value
+            FROM inventory_stats s
+            LEFT JOIN {table} t ON t.id = s.key_id
+            WHERE s.dimension = ? AND s.objects > 0
+            ORDER BY s.key_id
+        """, (dimension,)).fetchall()
+        result[key] = [
+            {
+                'id': row[0] or None,
+                'name': row[1] if row[0] else 'Unassigned',
+                'objects': row[2],
+                'total_quantity': row[3],
+                'total_value': round(row[4], 2),
+            }
+            for row in rows
+        ]
+
+    # Cada dimension reparte todos los objetos: basta con sumar una
+    zones = result['zones']
+    result['totals'] = {
+        'objects': sum(item['objects'] for item in zones),
+        'total_quantity': sum(item['total_quantity'] for item in zones),
+        'total_value': round(sum(item['total_value'] for item in zones), 2),
+    }
+    return result
+
+
+def zone_object_count(conn, zone_id):
+    """Active objects in a zone, read from the summary table"""
+    row = conn.execute("""
+        SELECT objects FROM inventory_stats
+        WHERE dimension = 'zone' AND key_id = ?
+    """, (zone_id,)).fetchone()
+    return row[0] if row else 0
+
+
+## COMPROBAR / RECONSTRUIR
+def check_stats(conn):
+    """
+    Compare inventory_stats with a full recount.
+
+    Returns:
+        list: (dimension, key_id, stored, actual) for every row that differs
+    """
+    stored = {
+        (row[0], row[1]): (row[2], row[3], round(row[4], 2))
+        for row in conn.execute("SELECT * FROM inventory_stats WHERE objects != 0")
+    }
+    actual = {}
+    for dimension, column in STATS_DIMENSIONS:
+        for row in conn.execute(f"""
+            SELECT IFNULL({column}, 0), COUNT(*), SUM(IFNULL(quantity, 0)),
+                   SUM(IFNULL(price, 0) * IFNULL(quantity, 0))
+            FROM objects
+            WHERE deletion_date IS NULL
+            GROUP BY IFNULL({column}, 0)
+        """):
+            actual[(dimension, row[0])] = (row[1], row[2], round(row[3], 2))
+
+    return [
+        (*key, stored.get(key), actual.get(key))
+        for key in sorted(stored.keys() | actual.keys())
+        if stored.get(key) != actual.get(key)
+    ]
+
+
+def rebuild_stats(conn):
+    """Recompute inventory_stats from scratch (run as one write job)"""
+    rebuild_inventory_stats(conn)
@@ -0,0 +1,237 @@
+"""
+Inventory Management System - Storage Configuration
+WAL mode, tuned PRAGMAs and a single writer thread with group commit.
+"""
+
+import functools
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+from metrics import (add_usage, connection_factory, current_endpoint,
+                     finish_write_job, start_write_job)
+
+# Configuracion de SQLite (se puede cambiar con variables de entorno)
+JOURNAL_MODE = os.environ.get('DB_JOURNAL_MODE', 'WAL')
+SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')
+CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', '20000'))
+MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+
+# Numero maximo de escrituras agrupadas en un mismo COMMIT
+MAX_BATCH = int(os.environ.get('DB_WRITE_BATCH', '64'))
+JOB_SAVEPOINT = 'job'
+
+
+## CONFIGURAR UNA CONEXION
+def configure_connection(conn):
+    """Apply the storage PRAGMAs to a freshly opened connection"""
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+## CONEXION DENTRO DE UN LOTE
+class _BatchConnection:
+    """
+    Connection handed to write jobs. The writer owns the transaction, so
+    commit() from the job is a no-op; rollback() undoes everything the job
+    wrote (back to its own savepoint) and a job that raises is rolled back
+    the same way.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        # El savepoint sigue abierto: el writer lo libera al acabar el trabajo
+        self._conn.execute(f"ROLLBACK TO {JOB_SAVEPOINT}")
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+## COLA DE ESCRITURA
+class WriteQueue:
+    """Serialize every write through one thread and commit them in groups"""
+
+    def __init__(self, db_path, max_batch=MAX_BATCH):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'commits': 0, 'failed': 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue func(conn, *args, **kwargs); returns a Future with its result.
+        The SQL the job runs is counted for the request submitting it, and
+        left in future.sql_usage as (statements, rows).
+        """
+        self.start()
+        future = Future()
+        future.sql_usage = (0, 0)
+        self._jobs.put((future, func, args, kwargs, current_endpoint()))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """Queue a write and wait for it to be committed"""
+        future = self.submit(func, *args, **kwargs)
+        try:
+            return future.result()
+        finally:
+            # Lo que ejecuto el hilo escritor cuenta para esta peticion
+            add_usage(*future.sql_usage)
+
+    def stop(self):
+        """Finish the queued writes and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None,
+                               check_same_thread=False, factory=connection_factory())
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn)
+        job_conn = _BatchConnection(conn)
+        running = True
+
+        while running:
+            batch = [self._jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [job for job in batch if job is not None]
+                if not batch:
+                    break
+
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for future, func, args, kwargs, endpoint in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    start_write_job(endpoint)
+                    conn.execute(f"SAVEPOINT {JOB_SAVEPOINT}")
+                    try:
+                        value = func(job_conn, *args, **kwargs)
+                        conn.execute(f"RELEASE {JOB_SAVEPOINT}")
+                        results.append((future, value, None))
+                    except Exception as e:
+                        conn.execute(f"ROLLBACK TO {JOB_SAVEPOINT}")
+                        conn.execute(f"RELEASE {JOB_SAVEPOINT}")
+                        results.append((future, None, e))
+                    finally:
+                        future.sql_usage = finish_write_job()
+                conn.execute("COMMIT")
+                self.stats['commits'] += 1
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Tambien los que no llegaron a empezar (fallo el BEGIN)
+                results = [(future, None, e) for future, *_ in batch
+                           if not future.done()]
+
+            for future, value, error in results:
+                self.stats['jobs'] += 1
+                if error is not None:
+                    self.stats['failed'] += 1
+                    future.set_exception(error)
+                else:
+                    future.set_result(value)
+
+        conn.close()
+
+
+_write_queues = {}
+_write_queue_lock = threading.Lock()
+
+
+## OBTENER LA COLA DE ESCRITURA COMPARTIDA
+def get_write_queue(db_path=None):
+    """Return the process-wide write queue for db_path (pool.DB_PATH by default)"""
+    if db_path is None:
+        from pool import DB_PATH
+        db_path = DB_PATH
+    db_path = os.path.abspath(db_path)
+    write_queue = _write_queues.get(db_path)
+    if write_queue is None:
+        with _write_queue_lock:
+            write_queue = _write_queues.get(db_path)
+            if write_queue is None:
+                write_queue = _write_queues[db_path] = WriteQueue(db_path)
+    return write_queue
+
+
+def run_write(func, *args, **kwargs):
+    """Run func(conn, ...) on the writer thread and return its result"""
+    return get_write_queue().run(func, *args, **kwargs)
+
+
+def database_path(conn):
+    """File behind the main database of conn ('' for in-memory databases)"""
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == 'main':
+            return path
+    return ''
+
+
+def writer_for(conn):
+    """
+    write(func, ...) for the database behind conn: its shared write queue,
+    or a plain commit on conn itself for in-memory databases.
+    """
+    path = database_path(conn)
+    if path:
+        return get_write_queue(path).run
+
+    def write(func, *args, **kwargs):
+        try:
+            result = func(conn, *args, **kwargs)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+    return write
+
+
+def queued(func):
+    """
+    Decorator for writers that take the connection as first argument (BD.py).
+    Called from a write job they run as they are; called with any other
+    connection they are queued on the writer thread of that connection's
+    database and committed there, so they never race the web API for the
+    write lock.
+    """
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        if isinstance(conn, _BatchConnection):
+            return func(conn, *args, **kwargs)
+        return writer_for(conn)(func, *args, **kwargs)
+    return wrapper
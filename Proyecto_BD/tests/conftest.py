@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los modulos de Proyecto_BD se importan por nombre (import migrations, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+"""Regression tests for the objects_fts triggers: search after every kind of update"""
+
+import sqlite3
+
+import pytest
+
+from migrations import migrate
+from objects_query import check_search_index, search_objects
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    migrate(conn)
+    conn.execute("INSERT INTO zones (name) VALUES ('Test zone')")
+    conn.executemany("""
+        INSERT INTO objects (name, description, zone_id, status) VALUES (?, ?, 1, 'Available')
+    """, [('Hammer', 'steel claw hammer'), ('Saw', 'wood saw')])
+    yield conn
+    conn.close()
+
+
+def found(conn, text):
+    return [row['id'] for row in search_objects(conn, text)]
+
+
+# (cambio, {busqueda: ids esperados}); cada paso parte del anterior
+STEPS = [
+    ("UPDATE objects SET name = 'Mallet' WHERE id = 1",
+     {'mallet': [1], 'hammer': [1], 'claw': [1], 'saw': [2]}),
+    ("UPDATE objects SET description = 'rubber head' WHERE id = 1",
+     {'rubber': [1], 'claw': [], 'mallet': [1]}),
+    ("UPDATE objects SET deletion_date = '2024-01-01' WHERE id = 1",
+     {'mallet': [], 'rubber': []}),
+    ("UPDATE objects SET deletion_date = NULL WHERE id = 1",
+     {'mallet': [1], 'rubber': [1]}),
+]
+
+
+def test_search_follows_updates(conn):
+    for sql, expected in STEPS:
+        conn.execute(sql)
+        for text, ids in expected.items():
+            assert found(conn, text) == ids, f"after {sql!r}: search {text!r}"
+        assert check_search_index(conn) is None, f"after {sql!r}"
+
+
+def test_check_search_index_detects_stale_terms(conn):
+    # Un cambio que no pasa por los triggers deja el indice desfasado
+    conn.execute("DROP TRIGGER trg_objects_fts_update")
+    conn.execute("UPDATE objects SET name = 'Mallet' WHERE id = 1")
+    assert check_search_index(conn) is not None
@@ -0,0 +1,119 @@
+"""
+Inventory Management System - XML Batch Ingestion
+Validate a <database> document (or any document holding <object> elements)
+one object at a time with lxml iterparse, and store the valid objects in a
+single transaction. Parsed objects are dropped as soon as they have been
+handled, so large documents never sit fully in memory.
+"""
+
+from lxml import etree
+
+from bulk_import import insert_rows, CHUNK_SIZE
+
+MAX_REPORTED_ERRORS = 1000
+
+
+def _zone_key(name):
+    return name.replace('_', ' ').strip().lower()
+
+
+## CONVERTIR UN <object> EN FILA
+def object_to_row(element, zones, categories):
+    """
+    Map a validated <object> element to the values tuple used by insert_rows.
+
+    Returns:
+        tuple: (values, None) or (None, error message)
+    """
+    zone_name = element.findtext('zone') or ''
+    zone_id = zones.get(_zone_key(zone_name))
+    if zone_id is None:
+        # Objetos dentro de <Zona_de_...>: la tabla indica la zona
+        parent = element.getparent()
+        if parent is not None:
+            zone_id = zones.get(_zone_key(parent.tag))
+    if zone_id is None:
+        return None, f"Unknown zone '{zone_name}'"
+
+    category = (element.findtext('category') or '').strip().lower()
+    values = (
+        element.findtext('name'),
+        element.findtext('description') or '',
+        zone_id,
+        categories.get(category),
+        float(element.findtext('price')),
+        int(element.findtext('quantity')),
+        element.findtext('status') or 'Available',
+    )
+    return values, None
+
+
+## INGERIR UN DOCUMENTO
+def ingest_objects(conn, source, schema, chunk_size=CHUNK_SIZE,
+                   comment='XML import', user='admin'):
+    """
+    Validate and insert every <object> in source. Meant to run as one write
+    job (storage.run_write), so everything commits or nothing does.
+
+    Args:
+        conn: Database connection object
+        source: File name or binary file-like object with the XML
+        schema: xml_validation.SchemaValidator for a schema with a global <object>
+        chunk_size: Rows per executemany call
+
+    Returns:
+        dict: objects/accepted/rejected counts and the rejected objects
+    """
+    zones = {_zone_key(row[1]): row[0]
+             for row in conn.execute("SELECT id, name FROM zones")}
+    categories = {row[1].strip().lower(): row[0]
+                  for row in conn.execute("SELECT id, name FROM categories")}
+
+    report = {'objects': 0, 'accepted': 0, 'rejected': 0, 'errors': []}
+    chunk = []
+
+    def reject(index, element, message):
+        report['rejected'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({
+                'index': index,
+                'id': element.findtext('id'),
+                'name': element.findtext('name'),
+                'error': message,
+            })
+
+    context = etree.iterparse(
+        source, events=('end',), tag='object',
+        resolve_entities=False, no_network=True, load_dtd=False,
+    )
+    try:
+        for _, element in context:
+            index = report['objects']
+            report['objects'] += 1
+
+            valid, error = schema.validate_element(element)
+            if valid:
+                values, error = object_to_row(element, zones, categories)
+
+            if error:
+                reject(index, element, error)
+            else:
+                chunk.append(values)
+                if len(chunk) >= chunk_size:
+                    report['accepted'] += insert_rows(conn, chunk, comment, user)
+                    chunk = []
+
+            # Liberar el objeto y los hermanos ya procesados
+            element.clear()
+            parent = element.getparent()
+            while parent is not None and element.getprevious() is not None:
+                del parent[0]
+    except etree.XMLSyntaxError as e:
+        # Documento roto: se deshace todo (la transaccion la lleva quien llama)
+        raise ValueError(f"Malformed XML: {e}")
+    finally:
+        del context
+
+    if chunk:
+        report['accepted'] += insert_rows(conn, chunk, comment, user)
+    return report
@@ -0,0 +1,160 @@
+"""
+XML validation engine for auth_server.py and xml_ingest.py
+The XSD is parsed once and compiled once per worker thread, documents are
+parsed straight from bytes with a hardened parser that each thread reuses,
+and schema.xml is reloaded automatically when the file changes.
+
+Benchmark:
+    python xml_validation.py --bench 10000
+"""
+
+import os
+import threading
+import time
+
+from lxml import etree
+
+SCHEMA_FILE = "schema.xml"
+# Cada cuantos segundos como mucho se mira si schema.xml ha cambiado
+RELOAD_CHECK_SECONDS = float(os.environ.get('SCHEMA_RELOAD_CHECK', '1'))
+
+
+def hardened_parser():
+    """Parser that never resolves entities, loads DTDs or touches the network"""
+    return etree.XMLParser(
+        resolve_entities=False,
+        no_network=True,
+        load_dtd=False,
+        dtd_validation=False,
+        huge_tree=False,
+    )
+
+
+## VALIDADOR
+class SchemaValidator:
+    """Compiled schema + reusable parser per thread, with hot reload"""
+
+    def __init__(self, path=SCHEMA_FILE, check_interval=RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # Un solo hilo recarga a la vez; los demas siguen con el esquema actual
+        self._reload_lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_doc = None
+        self._mtime = None
+        self._generation = 0
+        self._next_check = 0.0
+        self.stats = {'validations': 0, 'invalid': 0, 'reloads': 0}
+        self._load()
+
+    def _load(self):
+        """Parse the XSD and check that it compiles; raises on error"""
+        mtime = os.stat(self.path).st_mtime
+        schema_doc = etree.parse(self.path, hardened_parser())
+        etree.XMLSchema(schema_doc)
+        with self._lock:
+            self._schema_doc = schema_doc
+            self._mtime = mtime
+            self._generation += 1
+            self.stats['reloads'] += 1
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            if os.stat(self.path).st_mtime != self._mtime:
+                self._load()
+                print(f"Reloaded schema from {self.path}")
+        except (OSError, etree.LxmlError) as e:
+            # Un schema.xml roto no tumba el servidor: se sigue con el anterior
+            print(f"Keeping previous schema, reload failed: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def _count(self, valid):
+        with self._lock:
+            self.stats['validations'] += 1
+            if not valid:
+                self.stats['invalid'] += 1
+
+    def schema(self):
+        """XMLSchema compiled for the calling thread (recompiled after a reload)"""
+        self._maybe_reload()
+        local = self._local
+        if getattr(local, 'generation', None) != self._generation:
+            with self._lock:
+                local.schema = etree.XMLSchema(self._schema_doc)
+                local.generation = self._generation
+        return local.schema
+
+    def parser(self):
+        """Hardened parser owned by the calling thread"""
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = hardened_parser()
+        return parser
+
+    def validate_element(self, element):
+        """Validate an already parsed element. Returns (valid, error message)"""
+        schema = self.schema()
+        try:
+            valid = schema.validate(element)
+        except etree.XMLSchemaValidateError as e:
+            # p. ej. una entidad que el parser no resolvio (&e; de un DOCTYPE)
+            self._count(False)
+            return False, f"Invalid XML: {e}"
+        self._count(valid)
+        if valid:
+            return True, None
+        return False, str(schema.error_log.last_error)
+
+    def validate(self, data):
+        """Parse bytes (or str) and validate them. Returns (valid, error message)"""
+        if isinstance(data, str):
+            data = data.encode()
+        try:
+            root = etree.fromstring(data, self.parser())
+        except etree.XMLSyntaxError as e:
+            self._count(False)
+            return False, f"Malformed XML: {e}"
+        return self.validate_element(root)
+
+
+## MEDIR EL RENDIMIENTO
+def benchmark(count, path=SCHEMA_FILE, threads=1):
+    """Validations per second for the sample object from client.py"""
+    from concurrent.futures import ThreadPoolExecutor
+    from client import create_sample_object
+
+    validator = SchemaValidator(path)
+    data = create_sample_object().encode()
+
+    def run(n):
+        for _ in range(n):
+            validator.validate(data)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(run, [count // threads] * threads):
+            pass
+    elapsed = time.perf_counter() - start
+    done = (count // threads) * threads
+    print(f"{done} validations in {elapsed:.3f}s "
+          f"({done / elapsed:.0f} validations/s, {threads} thread(s))")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="XML schema validation")
+    parser.add_argument('--schema', default=SCHEMA_FILE)
+    parser.add_argument('--bench', type=int, default=10000, metavar='N')
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+    benchmark(args.bench, args.schema, args.threads)